@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Access Data Layer
+Gemeinsamer Loader für MSPCalculator.accdb Tabellen (tblUsage, tblProduct, tblKunden)
+
+Jede Tabelle wird einmal per mdb-export exportiert und als Feather-Snapshot
+abgelegt. Der Snapshot ist an mtime und Größe der .accdb gebunden; solange
+sich die Datenbank nicht ändert, wird er per Memory-Map gelesen statt erneut
+mdb-export und CSV-Parsing auszuführen.
+
+tblUsage kann mit Jahr/Monat/IDProductclass-Prädikaten gelesen werden
+(load_usage); dabei werden nur die passenden Zeilen materialisiert.
+
+Statt einer .accdb kann ein Verzeichnis mit <Tabelle>.csv-Dateien (gleiches
+Format wie mdb-export) angegeben werden, z.B. synthetische Testdaten;
+MSPGENIE_ACCESS_DB setzt die Standardquelle.
+"""
+
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+
+from instrumentation import stage
+from schemas import ACCESS_SCHEMAS, SCHEMA_VERSION, apply_schema
+
+ACCESS_DB = os.environ.get('MSPGENIE_ACCESS_DB', 'MSPCalculator.accdb')
+CACHE_DIR = Path(os.environ.get('MSPGENIE_CACHE_DIR', '.mspgenie_cache'))
+
+ALSO_PRODUCTCLASS = 2
+
+ACCESS_ODBC_DRIVER = 'Microsoft Access Driver (*.mdb, *.accdb)'
+USAGE_CHUNK_SIZE = 200_000
+
+
+def _csv_export_path(table_name, db_path):
+    """CSV-Datei einer Tabelle in einem Export-Verzeichnis"""
+    return os.path.join(db_path, f"{table_name}.csv")
+
+
+def export_table(table_name, db_path=ACCESS_DB):
+    """Export Access table using mdb-export"""
+    with stage(f"mdb-export {table_name}"):
+        if os.path.isdir(db_path):
+            with open(_csv_export_path(table_name, db_path), encoding='utf-8') as f:
+                return f.read().strip()
+        result = subprocess.run(['mdb-export', str(db_path), table_name], 
+                              capture_output=True, text=True)
+        return result.stdout.strip()
+
+
+def database_fingerprint(db_path=ACCESS_DB):
+    """Fingerprint der Datenbank aus mtime und Größe"""
+    if os.path.isdir(db_path):
+        stats = [os.stat(path) for path in sorted(Path(db_path).glob('*.csv'))]
+        mtime = max((stat.st_mtime_ns for stat in stats), default=0)
+        size = sum(stat.st_size for stat in stats)
+        return f"{mtime:x}-{size:x}"
+    stat = os.stat(db_path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def snapshot_path(table_name, db_path=ACCESS_DB):
+    """Pfad des Snapshots für den aktuellen Stand der Datenbank"""
+    version = f"{database_fingerprint(db_path)}-s{SCHEMA_VERSION}"
+    return CACHE_DIR / f"{Path(db_path).stem}.{table_name}.{version}.feather"
+
+
+def _write_snapshot(df, path):
+    """Snapshot atomar schreiben und veraltete Stände derselben Tabelle entfernen"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    prefix = path.name.rsplit('.', 2)[0]
+    for stale in path.parent.glob(f"{prefix}.*.feather"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+    # Eindeutige Temp-Datei: parallele Loader schreiben sich nicht gegenseitig dazwischen
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    os.close(fd)
+    df.reset_index(drop=True).to_feather(tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+
+def _parse_export(table_name, db_path):
+    """mdb-export-Ausgabe einer Tabelle als DataFrame (mit deklariertem Schema)"""
+    text = export_table(table_name, db_path)
+    with stage(f"csv parse {table_name}") as s:
+        df = apply_schema(pd.read_csv(StringIO(text)), ACCESS_SCHEMAS.get(table_name))
+        s['rows'] = len(df)
+    return df
+
+
+def load_table(table_name, db_path=ACCESS_DB, use_cache=True):
+    """Access-Tabelle als DataFrame laden (Snapshot falls aktuell, sonst mdb-export)"""
+    if not use_cache:
+        return _parse_export(table_name, db_path)
+
+    path = snapshot_path(table_name, db_path)
+    if path.exists():
+        from pyarrow import feather
+
+        # Unkomprimierte Feather-Dateien werden ohne Kopie gemappt
+        with stage(f"snapshot {table_name}") as s:
+            df = feather.read_table(path, memory_map=True).to_pandas()
+            s['rows'] = len(df)
+        return df
+
+    df = _parse_export(table_name, db_path)
+    _write_snapshot(df, path)
+    return df
+
+
+def load_tables(table_names, db_path=ACCESS_DB):
+    """Mehrere Tabellen gleichzeitig laden (je ein mdb-export pro Thread)"""
+    with ThreadPoolExecutor(max_workers=len(table_names) or 1) as pool:
+        frames = pool.map(lambda name: load_table(name, db_path), table_names)
+        return dict(zip(table_names, frames))
+
+
+def clear_cache(db_path=ACCESS_DB):
+    """Alle Snapshots dieser Datenbank löschen"""
+    removed = 0
+    for path in CACHE_DIR.glob(f"{Path(db_path).stem}.*.feather"):
+        path.unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+
+def usage_with_names(usage, customers_df, products_df):
+    """KundenName und Productname an Usage-Zeilen anfügen"""
+    return usage.merge(
+        customers_df[['IDKunden', 'KundenName']],
+        on='IDKunden', how='left'
+    ).merge(
+        products_df[['IDProduct', 'Productname']],
+        on='IDProduct', how='left'
+    )
+
+
+def _odbc_connection(db_path=ACCESS_DB):
+    """pyodbc-Verbindung zur Datenbank, falls Treiber vorhanden (sonst None)"""
+    if os.path.isdir(db_path):
+        return None
+    try:
+        import pyodbc
+    except ImportError:
+        return None
+
+    if ACCESS_ODBC_DRIVER not in pyodbc.drivers():
+        return None
+
+    db_path = os.path.abspath(db_path)
+    return pyodbc.connect(f"DRIVER={{{ACCESS_ODBC_DRIVER}}};DBQ={db_path};", readonly=True)
+
+
+def _product_ids(productclass, db_path=ACCESS_DB):
+    """IDProduct-Liste einer Produktklasse"""
+    products_df = load_table('tblProduct', db_path)
+    return products_df.loc[products_df['IDProductclass'] == productclass, 'IDProduct'].tolist()
+
+
+def _usage_mask(df, jahr, monat, product_ids):
+    """Boolesche Maske für die Usage-Prädikate"""
+    mask = pd.Series(True, index=df.index)
+    if jahr is not None:
+        mask &= df['Jahr'] == jahr
+    if monat is not None:
+        mask &= df['Monat'] == monat
+    if product_ids is not None:
+        mask &= df['IDProduct'].isin(product_ids)
+    return mask
+
+
+def _query_usage_odbc(conn, jahr, monat, productclass):
+    """Parametrisierte Abfrage direkt gegen Access"""
+    sql = "SELECT u.* FROM tblUsage AS u"
+    where, params = [], []
+    if productclass is not None:
+        sql += " INNER JOIN tblProduct AS p ON u.IDProduct = p.IDProduct"
+        where.append("p.IDProductclass = ?")
+        params.append(productclass)
+    if jahr is not None:
+        where.append("u.Jahr = ?")
+        params.append(jahr)
+    if monat is not None:
+        where.append("u.Monat = ?")
+        params.append(monat)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    columns = [col[0] for col in cursor.description]
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+
+def _read_usage_snapshot(path, jahr, monat, product_ids):
+    """Prädikate auf den gemappten Snapshot anwenden, bevor pandas-Objekte entstehen"""
+    import pyarrow.dataset as ds
+
+    expr = None
+    for column, value in (('Jahr', jahr), ('Monat', monat)):
+        if value is not None:
+            term = ds.field(column) == value
+            expr = term if expr is None else expr & term
+    if product_ids is not None:
+        term = ds.field('IDProduct').isin(product_ids)
+        expr = term if expr is None else expr & term
+
+    return ds.dataset(path, format='feather').to_table(filter=expr).to_pandas()
+
+
+def _stream_usage(db_path, jahr, monat, product_ids, chunksize=USAGE_CHUNK_SIZE):
+    """mdb-export-Ausgabe blockweise lesen und früh filtern"""
+    if os.path.isdir(db_path):
+        chunks = [
+            chunk[_usage_mask(chunk, jahr, monat, product_ids)]
+            for chunk in pd.read_csv(_csv_export_path('tblUsage', db_path), chunksize=chunksize)
+        ]
+        return pd.concat(chunks, ignore_index=True)
+
+    proc = subprocess.Popen(['mdb-export', str(db_path), 'tblUsage'],
+                            stdout=subprocess.PIPE, text=True)
+    try:
+        chunks = [
+            chunk[_usage_mask(chunk, jahr, monat, product_ids)]
+            for chunk in pd.read_csv(proc.stdout, chunksize=chunksize)
+        ]
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def load_usage(jahr=None, monat=None, productclass=None, db_path=ACCESS_DB, use_cache=True):
+    """tblUsage nur für die angegebenen Prädikate laden
+
+    Reihenfolge der Quellen: pyodbc (Access-Treiber vorhanden), Snapshot
+    (fehlt er, wird er einmalig per load_table erzeugt), gestreamter
+    mdb-export nur bei use_cache=False. Gefiltert wird beim Lesen, Speicher
+    und Laufzeit skalieren mit dem ausgewählten Zeitraum statt mit der
+    Gesamthistorie.
+    """
+    with stage('load_usage') as s:
+        usage = apply_schema(_load_usage(jahr, monat, productclass, db_path, use_cache, s),
+                             ACCESS_SCHEMAS['tblUsage'])
+        s['rows'] = len(usage)
+    return usage
+
+
+def _load_usage(jahr, monat, productclass, db_path, use_cache, record):
+    """Quelle wählen und Usage lesen; die Quelle wird im Stage-Record vermerkt"""
+    conn = _odbc_connection(db_path)
+    if conn is not None:
+        record['source'] = 'odbc'
+        try:
+            return _query_usage_odbc(conn, jahr, monat, productclass)
+        finally:
+            conn.close()
+
+    product_ids = _product_ids(productclass, db_path) if productclass is not None else None
+
+    if not use_cache:
+        record['source'] = 'mdb-export stream'
+        return _stream_usage(db_path, jahr, monat, product_ids)
+
+    path = snapshot_path('tblUsage', db_path)
+    if path.exists():
+        record['source'] = 'snapshot'
+    else:
+        # Erster Lauf: komplette Tabelle einmal exportieren und als Snapshot
+        # ablegen, danach filtern alle Läufe (auch dieser) auf dem Snapshot
+        record['source'] = 'mdb-export -> snapshot'
+        load_table('tblUsage', db_path)
+    return _read_usage_snapshot(path, jahr, monat, product_ids)
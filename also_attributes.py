@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+ALSO Attributes Parser
+Vektorisierte Extraktion von Quantity, Billing Type, Commitment und Prepaid
+
+Die Attributes-Spalte der Raw Charges hat die Form
+    Billing Type=Monthly (with 1-year commitment) - P1Y Quantity=1
+    Billing Type=Prepaid (with 1-year commitment) - P1Y Quantity=-3
+Ein kompilierter Regex mit Lookaheads liefert alle Felder in einem
+str.extract-Durchlauf statt mehrerer .apply-Aufrufe pro Zeile. Da eine
+Abrechnung nur wenige verschiedene Attributes-Texte enthält, wird nur über
+die eindeutigen Werte geparst und das Ergebnis per Code-Array verteilt.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+MONTHLY = 'monthly'
+YEARLY_MONTHLY = 'yearly_monthly'
+YEARLY_PREPAID = 'yearly_prepaid'
+UNKNOWN = 'unknown'
+
+BILLING_TYPES = pd.CategoricalDtype([MONTHLY, YEARLY_MONTHLY, YEARLY_PREPAID, UNKNOWN])
+COMMITMENTS = pd.CategoricalDtype(['P1M', 'P1Y'])
+
+# Lookaheads prüfen die Marker unabhängig von ihrer Position; Quantity ist
+# die ganze Zahl nach dem letzten '=' (wie VBA), inklusive Vorzeichen
+ATTRIBUTES_PATTERN = re.compile(
+    r'^(?=(?:.*?(?P<p1m>P1M))?)'
+    r'(?=(?:.*?(?P<p1y>P1Y))?)'
+    r'(?=(?:.*?(?P<prepaid>Prepaid))?)'
+    r'(?=(?:.*?(?P<monthly>Monthly))?)'
+    r'(?:.*=\s*(?P<quantity>[+-]?\d+)\s*$)?',
+    re.DOTALL
+)
+
+
+def parse_attributes(attributes):
+    """Attributes-Spalte in typisierte Spalten zerlegen
+
+    Liefert (Index wie die Eingabe) Quantity (int64, 0 falls nicht
+    erkennbar), billing_type, commitment (kategorisch) und prepaid (bool).
+    """
+    codes, uniques = pd.factorize(attributes)
+    parts = pd.Series(uniques, dtype='string').str.extract(ATTRIBUTES_PATTERN)
+
+    # Fehlende Attributes (Code -1) landen auf dem angehängten Leerwert
+    def spread(values, empty):
+        return np.append(values, empty)[codes]
+
+    p1m = spread(parts['p1m'].notna().to_numpy(), False)
+    p1y = spread(parts['p1y'].notna().to_numpy(), False)
+    prepaid = spread(parts['prepaid'].notna().to_numpy(), False)
+    monthly = spread(parts['monthly'].notna().to_numpy(), False)
+    quantity = spread(pd.to_numeric(parts['quantity']).fillna(0).to_numpy(np.int64), 0)
+
+    # Reihenfolge wie MicrosoftParser.classify_billing_type im Pflichtenheft
+    types = BILLING_TYPES.categories
+    billing_type = np.select(
+        [p1m, p1y & prepaid, p1y & monthly],
+        [types.get_loc(MONTHLY), types.get_loc(YEARLY_PREPAID), types.get_loc(YEARLY_MONTHLY)],
+        default=types.get_loc(UNKNOWN)
+    )
+    commitment = np.select([p1m, p1y], [0, 1], default=-1)
+
+    return pd.DataFrame({
+        'Quantity': quantity,
+        'billing_type': pd.Categorical.from_codes(billing_type, dtype=BILLING_TYPES),
+        'commitment': pd.Categorical.from_codes(commitment, dtype=COMMITMENTS),
+        'prepaid': prepaid,
+    }, index=attributes.index)
+
+
+def classify_billing_type(attributes):
+    """Billing Type einer einzelnen Zeile (Referenz aus dem Pflichtenheft)"""
+    attr_str = str(attributes) if pd.notna(attributes) else ''
+    if 'P1M' in attr_str:
+        return MONTHLY
+    elif 'P1Y' in attr_str and 'Prepaid' in attr_str:
+        return YEARLY_PREPAID
+    elif 'P1Y' in attr_str and 'Monthly' in attr_str:
+        return YEARLY_MONTHLY
+    return UNKNOWN
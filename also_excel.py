@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+ALSO Excel Workbooks
+Auffinden und Laden der monatlichen ALSO Abrechnungsdateien (Raw Charges)
+
+Dateinamenmuster laut Pflichtenheft:
+- MB_NETWORKS_GmbH_MM-YYYY.xlsx (ab 2023)
+- MB_NETWORKS_GmbH_(MM.YYYY).xlsx (2020-2022, im finish/ Ordner)
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from schemas import RAW_CHARGES_SCHEMA, apply_schema
+
+ALSO_DATA_DIR = 'data/Also'
+RAW_CHARGES_SHEET = 'Raw Charges'
+
+# Einzige Spalten, die die Analysen aus Raw Charges verwenden (von 14)
+RAW_CHARGES_COLUMNS = ['Company', 'Product name', 'Attributes', 'Interval', 'Charge', 'VendorReference']
+
+# Platzhalter, die pd.read_excel standardmäßig als fehlend liest (z.B. "N/A")
+MONTH_NAMES = ['Januar', 'Februar', 'März', 'April', 'Mai', 'Juni', 'Juli',
+               'August', 'September', 'Oktober', 'November', 'Dezember']
+
+NA_STRINGS = ['', '#N/A', '#NA', 'N/A', 'NA', 'n/a', 'NULL', 'null', 'NaN', 'nan', 'None', '<NA>']
+
+WORKBOOK_PATTERNS = [
+    re.compile(r'_(?P<monat>\d{2})-(?P<jahr>\d{4})\.xlsx$', re.IGNORECASE),
+    re.compile(r'_\((?P<monat>\d{2})\.(?P<jahr>\d{4})\)\.xlsx$', re.IGNORECASE),
+]
+
+
+def parse_workbook_period(filename):
+    """(Jahr, Monat) aus dem Dateinamen, None falls kein ALSO-Muster"""
+    for pattern in WORKBOOK_PATTERNS:
+        match = pattern.search(filename)
+        if match:
+            return int(match.group('jahr')), int(match.group('monat'))
+    return None
+
+
+def workbook_period(path):
+    """(Jahr, Monat) eines Workbook-Pfads; ValueError, falls der Name kein ALSO-Muster hat"""
+    period = parse_workbook_period(os.path.basename(path))
+    if period is None:
+        raise ValueError(f"{path}: Abrechnungsmonat nicht aus dem Dateinamen ableitbar")
+    return period
+
+
+def period_label(jahr, monat):
+    """'November 2024'"""
+    return f"{MONTH_NAMES[monat - 1]} {jahr}"
+
+
+def find_workbooks(base_path=ALSO_DATA_DIR):
+    """Alle ALSO Workbooks unterhalb von base_path, sortiert nach Periode
+
+    Liefert eine Liste von (Jahr, Monat, Pfad).
+    """
+    workbooks = []
+    for root, dirs, filenames in os.walk(base_path):
+        for filename in filenames:
+            if filename.startswith('~$'):
+                continue  # Excel-Lockdateien
+            period = parse_workbook_period(filename)
+            if period:
+                workbooks.append((*period, os.path.join(root, filename)))
+    workbooks.sort()
+    return workbooks
+
+
+def read_raw_charges(path, columns=RAW_CHARGES_COLUMNS):
+    """Raw Charges Sheet eines Workbooks streamend laden
+
+    Öffnet das Workbook read-only, sodass "Pivot Charges" und "Grouped By
+    Service" nie geparst werden, und materialisiert nur die angeforderten
+    Spalten (columns=None: alle) im Schema RAW_CHARGES_SCHEMA: Textspalten
+    als Categorical, Charge als Decimal.
+    """
+    from openpyxl import load_workbook
+
+    with stage('openpyxl Raw Charges') as s:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook[RAW_CHARGES_SHEET]
+            sheet.reset_dimensions()
+            rows = sheet.iter_rows(values_only=True)
+
+            header = next(rows, None) or ()
+            if columns is None:
+                columns = [name for name in header if name is not None]
+            missing = [name for name in columns if name not in header]
+            if missing:
+                raise KeyError(f"{path}: Spalten fehlen in '{RAW_CHARGES_SHEET}': {missing}")
+
+            positions = [header.index(name) for name in columns]
+            values = [[] for _ in columns]
+            for row in rows:
+                if not any(cell is not None for cell in row):
+                    continue
+                for target, pos in zip(values, positions):
+                    target.append(row[pos] if pos < len(row) else None)
+        finally:
+            workbook.close()
+        s['rows'] = len(values[0]) if values else 0
+
+    data = {}
+    for name, column in zip(columns, values):
+        series = pd.Series(column, dtype=object)
+        data[name] = series.mask(series.isna() | series.isin(NA_STRINGS), np.nan)
+    return apply_schema(pd.DataFrame(data), RAW_CHARGES_SCHEMA)
+
+
+def extract_quantity(attr_str):
+    """Quantity aus Attributes: alles nach dem letzten '=' (wie VBA)"""
+    if pd.isna(attr_str):
+        return 0
+    last_equal_pos = attr_str.rfind('=')
+    if last_equal_pos != -1:
+        quantity_str = attr_str[last_equal_pos + 1:]
+        try:
+            return int(quantity_str)
+        except ValueError:
+            return 0
+    return 0
+
+
+def aggregate_raw_charges(raw_charges):
+    """Korrekte Aggregierung: MAX Quantity pro Company + Product"""
+    return raw_charges.groupby(['Company', 'Product name'], observed=True).agg({
+        'Quantity': 'max',  # Maximum quantity für dieses Produkt
+        'Charge': 'sum',
+        'Interval': 'first',
+        'VendorReference': 'first'
+    }).reset_index()
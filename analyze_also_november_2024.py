@@ -4,95 +4,99 @@ ALSO November 2024 Billing Analysis
 Analyzes the billing interval bug in the VBA ALSO import
 """
 
-import subprocess
-import csv
-from io import StringIO
-import pandas as pd
+from access_data import ALSO_PRODUCTCLASS, load_table, load_usage
+from customer_resolver import CustomerResolver
+from instrumentation import stage, trace_run
+from product_catalog import ProductCatalog
+from usage_anomalies import is_fractional
 
-def export_table(table_name):
-    """Export Access table using mdb-export"""
-    result = subprocess.run(['mdb-export', 'MSPCalculator.accdb', table_name], 
-                          capture_output=True, text=True)
-    return result.stdout.strip()
+def aggregate_customer_usage(usage, customers_df, products_df):
+    """Max usage per customer/product with one join and one groupby-max
+    
+    Returns one row per (IDKunden, IDProduct), ordered by customer total
+    max usage (descending) and first appearance within each customer.
+    """
+    resolver = CustomerResolver(customers_df)
+    catalog = ProductCatalog(products_df)
+    
+    usage = usage[['IDKunden', 'IDProduct', 'Usage', 'Detail']].assign(
+        Detail=usage['Detail'].astype(object).where(usage['Detail'].notna(), "")
+    )
+    per_product = usage.groupby(['IDKunden', 'IDProduct'], sort=False).agg(
+        max_usage=('Usage', 'max'),
+        usage_count=('Usage', 'size'),
+        details=('Detail', list)
+    ).reset_index()
+    
+    customer_ids = per_product['IDKunden']
+    product_ids = per_product['IDProduct']
+    per_product['customer_name'] = resolver.names_for_ids(customer_ids)
+    per_product['product_name'] = catalog.names_for_ids(product_ids)
+    by_customer = per_product.groupby('IDKunden', sort=False)
+    per_product['total_max_usage'] = by_customer['max_usage'].transform('sum')
+    per_product['customer_order'] = by_customer.ngroup()
+    
+    # Customers with equal totals keep their first-appearance order
+    per_product = per_product.sort_values(['total_max_usage', 'customer_order'],
+                                          ascending=[False, True], kind='stable')
+    return per_product.drop(columns='customer_order').reset_index(drop=True)
+
+def build_customer_analysis(per_product):
+    """Nest the per-product frame into the customer_analysis list structure"""
+    customer_analysis = []
+    current = None
+    for row in per_product.itertuples(index=False):
+        if current is None or current['customer_id'] != row.IDKunden:
+            current = {
+                'customer_id': row.IDKunden,
+                'customer_name': row.customer_name,
+                'total_max_usage': row.total_max_usage,
+                'product_count': 0,
+                'products': []
+            }
+            customer_analysis.append(current)
+        current['products'].append({
+            'product_id': row.IDProduct,
+            'product_name': row.product_name,
+            'max_usage': row.max_usage,
+            'usage_count': row.usage_count,
+            'details': row.details
+        })
+        current['product_count'] += 1
+    return customer_analysis
 
 def analyze_november_2024_also():
     """Analyze ALSO data for November 2024"""
     print("=== ALSO November 2024 Billing Analysis ===\n")
     
     # 1. Get ALSO products (IDProductclass = 2)
-    products_csv = export_table('tblProduct')
-    products_df = pd.read_csv(StringIO(products_csv))
-    also_products = products_df[products_df['IDProductclass'] == 2]
+    with stage('1. ALSO products') as s:
+        products_df = load_table('tblProduct')
+        also_products = products_df[products_df['IDProductclass'] == ALSO_PRODUCTCLASS]
+        s['rows'] = len(also_products)
     
     print(f"ALSO Products (IDProductclass=2): {len(also_products)}")
     print("Top ALSO Products:")
     print(also_products[['IDProduct', 'Productname']].head(10).to_string())
     print()
     
-    # 2. Get November 2024 usage data
-    usage_csv = export_table('tblUsage')
-    usage_df = pd.read_csv(StringIO(usage_csv))
-    
-    # Filter November 2024 ALSO data
-    also_usage = usage_df[
-        (usage_df['Monat'] == 11) & 
-        (usage_df['Jahr'] == 2024) &
-        (usage_df['IDProduct'].isin(also_products['IDProduct']))
-    ]
+    # 2. Get November 2024 ALSO usage data (filtered at the source)
+    with stage('2. November usage') as s:
+        also_usage = load_usage(jahr=2024, monat=11, productclass=ALSO_PRODUCTCLASS)
+        s['rows'] = len(also_usage)
     
     print(f"November 2024 ALSO Usage Records: {len(also_usage)}")
     
     # 3. Get customer info
-    customers_csv = export_table('tblKunden')
-    customers_df = pd.read_csv(StringIO(customers_csv))
+    with stage('3. customer lookup') as s:
+        customers_df = load_table('tblKunden')
+        s['rows'] = len(customers_df)
     
-    # 4. Detailed analysis per customer
-    customer_analysis = []
-    for customer_id in also_usage['IDKunden'].unique():
-        customer_data = also_usage[also_usage['IDKunden'] == customer_id]
-        customer_name = customers_df[customers_df['IDKunden'] == customer_id]['KundenName'].iloc[0] if not customers_df[customers_df['IDKunden'] == customer_id].empty else f"Unknown-{customer_id}"
-        
-        # Group by product
-        product_summary = {}
-        for _, row in customer_data.iterrows():
-            product_id = row['IDProduct']
-            product_name = also_products[also_products['IDProduct'] == product_id]['Productname'].iloc[0] if not also_products[also_products['IDProduct'] == product_id].empty else f"Product-{product_id}"
-            usage = row['Usage']
-            detail = row['Detail'] if pd.notna(row['Detail']) else ""
-            
-            if product_id not in product_summary:
-                product_summary[product_id] = {
-                    'name': product_name,
-                    'usages': [],
-                    'details': []
-                }
-            product_summary[product_id]['usages'].append(usage)
-            product_summary[product_id]['details'].append(detail)
-        
-        # Calculate max usage per product (as VBA does)
-        total_max_usage = 0
-        products_info = []
-        for product_id, info in product_summary.items():
-            max_usage = max(info['usages'])
-            total_max_usage += max_usage
-            products_info.append({
-                'product_id': product_id,
-                'product_name': info['name'],
-                'max_usage': max_usage,
-                'usage_count': len(info['usages']),
-                'details': info['details']
-            })
-        
-        customer_analysis.append({
-            'customer_id': customer_id,
-            'customer_name': customer_name,
-            'total_max_usage': total_max_usage,
-            'product_count': len(product_summary),
-            'products': products_info
-        })
-    
-    # Sort by total usage desc
-    customer_analysis.sort(key=lambda x: x['total_max_usage'], reverse=True)
+    # 4. Detailed analysis per customer (max usage per product, as VBA does)
+    with stage('4. aggregation') as s:
+        per_product = aggregate_customer_usage(also_usage, customers_df, also_products)
+        customer_analysis = build_customer_analysis(per_product)
+        s['rows'] = len(per_product)
     
     print("\nTop 15 Customers by Total Max Usage (November 2024):")
     print("-" * 80)
@@ -112,18 +116,20 @@ def analyze_november_2024_also():
     
     # 5. Check for potential billing interval issues
     print("\n=== Potential Billing Interval Issues ===")
-    suspicious_customers = []
-    
-    for customer in customer_analysis:
-        for product in customer['products']:
-            # Check if we have fractional usage that might indicate interval issues
-            if product['max_usage'] != int(product['max_usage']):
-                suspicious_customers.append({
-                    'customer': customer['customer_name'],
-                    'product': product['product_name'],
-                    'usage': product['max_usage'],
-                    'count': product['usage_count']
-                })
+    # Fractional usage might indicate interval issues
+    # (history-wide scan of all interval symptoms: usage_anomalies.py)
+    with stage('5. interval check') as s:
+        fractional = per_product[is_fractional(per_product['max_usage'])]
+        s['rows'] = len(fractional)
+    suspicious_customers = [
+        {
+            'customer': row.customer_name,
+            'product': row.product_name,
+            'usage': row.max_usage,
+            'count': row.usage_count
+        }
+        for row in fractional.itertuples(index=False)
+    ]
     
     if suspicious_customers:
         print("Customers with fractional usage (potential interval parsing issues):")
@@ -135,4 +141,5 @@ def analyze_november_2024_also():
     return customer_analysis
 
 if __name__ == "__main__":
-    analysis = analyze_november_2024_also()
\ No newline at end of file
+    with trace_run('analyze_also_november_2024'):
+        analysis = analyze_november_2024_also()
\ No newline at end of file
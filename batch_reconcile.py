@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+ALSO Batch-Abgleich
+Alle ALSO Workbooks (2020-2025) gegen Access tblUsage in einem Lauf abgleichen
+
+Access wird einmal geladen; das Parsen der Workbooks und der Abgleich pro
+Monat laufen parallel in einem Prozess-Pool. Die Ergebnisse werden zu einem
+periodenübergreifenden Report zusammengeführt.
+
+Monatsergebnisse werden im ResultCache abgelegt; neu berechnet werden nur
+Monate, deren Workbook, tblUsage-Ausschnitt oder tblProduct/tblKunden sich
+geändert haben.
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from access_data import ALSO_PRODUCTCLASS, load_table, load_usage, usage_with_names
+from also_attributes import parse_attributes
+from also_excel import ALSO_DATA_DIR, aggregate_raw_charges, find_workbooks, read_raw_charges
+from customer_resolver import CustomerResolver
+from product_catalog import ProductCatalog
+from reconciliation import DEFAULT_TOLERANCE, reconcile_customers, reconcile_products, write_diff
+from result_cache import ResultCache, file_fingerprint, fingerprint, frame_fingerprint
+
+PERIOD_COLUMNS = ['Jahr', 'Monat']
+
+
+def load_also_usage(customers_df=None, products_df=None):
+    """Access-Seite einmal laden: alle ALSO Usage-Zeilen mit Kunden- und Produktnamen"""
+    usage = load_usage(productclass=ALSO_PRODUCTCLASS)
+    if customers_df is None:
+        customers_df = load_table('tblKunden')
+    if products_df is None:
+        products_df = load_table('tblProduct')
+    return usage_with_names(usage, customers_df, products_df)
+
+
+def reconcile_month(jahr, monat, path, access_month, tolerance=DEFAULT_TOLERANCE, resolver=None,
+                    catalog=None):
+    """Ein Workbook parsen und gegen den Access-Monat abgleichen (läuft im Worker)"""
+    raw_charges = read_raw_charges(path)
+    raw_charges['Quantity'] = parse_attributes(raw_charges['Attributes'])['Quantity']
+
+    # Company auf den KundenName aus tblKunden abbilden, soweit auflösbar
+    if resolver is not None:
+        raw_charges['Company'] = resolver.canonical(raw_charges['Company'])
+
+    # Product name auf den Productname aus tblProduct abbilden (GUID, NCE-Präfix);
+    # GUIDs auflösbarer Zeilen zuerst lernen, damit umbenannte Produkte über die GUID matchen
+    if catalog is not None:
+        if 'VendorReference' in raw_charges:
+            catalog.learn_references(raw_charges['Product name'], raw_charges['VendorReference'])
+        mapped = catalog.map_products(raw_charges['Product name'], raw_charges.get('VendorReference'))
+        raw_charges['Product name'] = mapped['Productname'].fillna(raw_charges['Product name'].astype(object))
+    excel_agg = aggregate_raw_charges(raw_charges)
+
+    customers = reconcile_customers(excel_agg, access_month, tolerance=tolerance)
+    products = reconcile_products(excel_agg, access_month, tolerance=tolerance)
+
+    period = {'Jahr': jahr, 'Monat': monat, 'workbook': os.path.basename(path)}
+    return customers.assign(**period), products.assign(**period)
+
+
+def month_key(path, access_month, tables_version, tolerance):
+    """Cache-Schlüssel eines Monats aus den Fingerprints seiner Eingaben"""
+    return fingerprint('reconcile_month', os.path.basename(path), file_fingerprint(path),
+                       frame_fingerprint(access_month), tables_version, tolerance)
+
+
+def run_batch(base_path=ALSO_DATA_DIR, tolerance=DEFAULT_TOLERANCE, workers=None, use_cache=True):
+    """Alle Workbooks abgleichen; liefert (Kunden-Report, Produkt-Report)"""
+    workbooks = find_workbooks(base_path)
+    if not workbooks:
+        return pd.DataFrame(), pd.DataFrame()
+
+    customers_df, products_df = load_table('tblKunden'), load_table('tblProduct')
+    access = load_also_usage(customers_df, products_df)
+    resolver = CustomerResolver(customers_df)
+    catalog = ProductCatalog(products_df)
+    access_by_month = dict(tuple(access.groupby(PERIOD_COLUMNS)))
+    empty_month = access.iloc[0:0]
+
+    cache = ResultCache() if use_cache else None
+    tables_version = fingerprint(frame_fingerprint(customers_df), frame_fingerprint(products_df))
+    try:
+        results, pending = {}, {}
+        for jahr, monat, path in workbooks:
+            access_month = access_by_month.get((jahr, monat), empty_month)
+            key = month_key(path, access_month, tables_version, tolerance) if cache else None
+            hit, value = cache.get('reconcile_month', key) if cache else (False, None)
+            if hit:
+                results[path] = value
+            else:
+                pending[path] = (key, (jahr, monat, path, access_month))
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    path: pool.submit(reconcile_month, *month_args, tolerance, resolver, catalog)
+                    for path, (_, month_args) in pending.items()
+                }
+                for path, future in futures.items():
+                    results[path] = future.result()
+                    if cache:
+                        cache.put('reconcile_month', pending[path][0], results[path], label=os.path.basename(path))
+    finally:
+        if cache:
+            cache.close()
+    results = [results[path] for _, _, path in workbooks]
+
+    report_columns = ['Jahr', 'Monat', 'workbook']
+    customers = pd.concat([c for c, _ in results], ignore_index=True)
+    products = pd.concat([p for _, p in results], ignore_index=True)
+    customers = customers[report_columns + [c for c in customers.columns if c not in report_columns]]
+    products = products[report_columns + [c for c in products.columns if c not in report_columns]]
+    return customers, products
+
+
+def print_summary(customers):
+    """Abweichungen pro Monat und Typ"""
+    print("=== ALSO BATCH-ABGLEICH ===\n")
+    if customers.empty:
+        print("Keine Abweichungen gefunden.")
+        return
+
+    summary = pd.crosstab([customers['Jahr'], customers['Monat']], customers['diff_type'])
+    summary['difference'] = customers.groupby(PERIOD_COLUMNS)['difference'].sum()
+    print(summary.to_string())
+    print(f"\nPerioden: {len(summary)}")
+    print(f"Kunden-Abweichungen gesamt: {len(customers)}")
+    print(f"Netto-Differenz gesamt: {customers['difference'].sum():+.1f}")
+
+
+def write_reports(customers, products, output_dir, fmt='csv'):
+    """Kunden- und Produkt-Report schreiben"""
+    for name, report in (('customers', customers), ('products', products)):
+        path = write_diff(report, os.path.join(output_dir, f"also_reconciliation_{name}.{fmt}"))
+        print(f"Report geschrieben: {path}")
+
+
+def main():
+    """Hauptfunktion"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default=ALSO_DATA_DIR, help='Verzeichnis mit ALSO Workbooks')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Mengendifferenz, ab der ein Kunde/Produkt als Abweichung gilt')
+    parser.add_argument('--workers', type=int, default=None, help='Anzahl Worker-Prozesse')
+    parser.add_argument('--output-dir', default=None, help='Reports als CSV/Parquet hierhin schreiben')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--no-cache', action='store_true', help='Alle Monate neu berechnen')
+    args = parser.parse_args()
+
+    customers, products = run_batch(args.data_dir, args.tolerance, args.workers, not args.no_cache)
+    print_summary(customers)
+
+    if args.output_dir:
+        write_reports(customers, products, args.output_dir, args.format)
+
+    return customers, products
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Benchmark ALSO Import Pipeline
+Misst Laufzeit und Speicher der einzelnen Stufen auf synthetischen Daten
+
+Für jede Skalierung (Standard 1x / 10x / 100x) werden mit synthetic_data
+Fixtures in einem temporären Verzeichnis erzeugt. Jede Stufe läuft in einem
+frischen Prozess (kein Import- oder Cache-Vorteil aus der vorherigen Stufe):
+
+- load_excel_data              (Raw Charges November 2024)
+- load_access_data (kalt)      (ohne Feather-Snapshots)
+- load_access_data (warm)      (mit Snapshots aus dem kalten Lauf)
+- analyze_november_2024_also
+- compare_data                 (Eingaben vorab geladen, nur der Vergleich gemessen)
+
+Gemessen werden Wall-Clock, CPU-Zeit und maximale RSS des Prozesses; die
+Python-Allokationsspitze (tracemalloc) kommt aus einem zweiten, getrennten
+Lauf, da tracemalloc die Laufzeit um ein Vielfaches verlängert.
+
+Mit --attributes nur der Micro-Benchmark des Attributes-Parsers (.apply-Pfade
+vs. parse_attributes).
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import resource
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import generate
+
+DEFAULT_SCALES = [1, 10, 100]
+BASE_CUSTOMERS = 50
+BASE_PRODUCTS = 40
+
+STAGES = [
+    'load_excel_data',
+    'load_access_data (kalt)',
+    'load_access_data (warm)',
+    'analyze_november_2024_also',
+    'compare_data',
+]
+
+
+def _run_stage(stage, workbook, trace_memory=False):
+    """Eine Stufe ausführen (läuft im frischen Worker-Prozess)
+
+    Ohne trace_memory: wall_s, cpu_s und max_rss_mb; mit trace_memory nur
+    peak_mb (Zeiten unter tracemalloc wären verfälscht).
+    """
+    from access_data import clear_cache
+    from analyze_also_november_2024 import analyze_november_2024_also
+    from compare_also_november_2024 import compare_data, load_access_data, load_excel_data
+
+    setup = {}
+    if stage == 'compare_data':
+        with contextlib.redirect_stdout(io.StringIO()):
+            setup['excel'] = load_excel_data(workbook)[0]
+            setup['access'] = load_access_data()[0]
+    elif stage == 'load_access_data (kalt)':
+        clear_cache()
+
+    calls = {
+        'load_excel_data': lambda: load_excel_data(workbook),
+        'load_access_data (kalt)': load_access_data,
+        'load_access_data (warm)': load_access_data,
+        'analyze_november_2024_also': analyze_november_2024_also,
+        'compare_data': lambda: compare_data(setup['excel'], setup['access']),
+    }
+
+    if trace_memory:
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            calls[stage]()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {'peak_mb': peak / 2**20}
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        calls[stage]()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    # ru_maxrss: Linux in KiB, macOS in Bytes
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    max_rss = max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+    return {'wall_s': wall, 'cpu_s': cpu, 'max_rss_mb': max_rss / 2**20}
+
+
+def benchmark_scale(scale, work_dir, lines_per_customer=6, months=12):
+    """Fixtures für eine Skalierung erzeugen und alle Stufen messen"""
+    out_dir = os.path.join(work_dir, f"scale_{scale}")
+    started = time.perf_counter()
+    fixtures = generate(out_dir, customers=BASE_CUSTOMERS * scale, products=BASE_PRODUCTS,
+                        months=months, lines_per_customer=lines_per_customer,
+                        workbook_months=[(2024, 11)])
+    generate_s = time.perf_counter() - started
+
+    # Worker erben die Umgebung: Access-Quelle und Cache zeigen auf die Fixtures
+    os.environ['MSPGENIE_ACCESS_DB'] = fixtures['access']
+    os.environ['MSPGENIE_CACHE_DIR'] = os.path.join(out_dir, 'cache')
+
+    results = []
+    for stage in STAGES:
+        # Zeitmessung und tracemalloc-Lauf je in einem eigenen frischen Prozess
+        metrics = {}
+        for trace_memory in (False, True):
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                metrics.update(pool.submit(_run_stage, stage, fixtures['workbooks'][0], trace_memory).result())
+        results.append(dict(scale=f"{scale}x", stage=stage, wall_s=metrics['wall_s'], cpu_s=metrics['cpu_s'],
+                            peak_mb=metrics['peak_mb'], max_rss_mb=metrics['max_rss_mb']))
+
+    usage_rows = BASE_CUSTOMERS * scale * lines_per_customer * months
+    return results, {'scale': scale, 'usage_rows': usage_rows, 'generate_s': generate_s}
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, work_dir=None, lines_per_customer=6, months=12):
+    """Alle Skalierungen messen; liefert ein DataFrame (eine Zeile je Stufe)"""
+    saved_env = {key: os.environ.get(key) for key in ('MSPGENIE_ACCESS_DB', 'MSPGENIE_CACHE_DIR')}
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix='mspgenie_bench_', dir=work_dir) as tmp:
+            for scale in scales:
+                stage_results, info = benchmark_scale(scale, tmp, lines_per_customer, months)
+                print(f"{scale}x: {info['usage_rows']} tblUsage-Zeilen, "
+                      f"Fixtures in {info['generate_s']:.1f}s erzeugt")
+                results.extend(stage_results)
+    finally:
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return pd.DataFrame(results)
+
+
+def benchmark_attributes(rows=100_000, repeat=3):
+    """Micro-Benchmark: .apply-Pfade vs. parse_attributes (Sekunden, bester Lauf)"""
+    from also_attributes import classify_billing_type, parse_attributes
+    from also_excel import extract_quantity
+
+    # Realistische Kardinalität: drei Billing Types x Mengen -5..500
+    rng = np.random.default_rng(0)
+    prefixes = [
+        'Billing Type=Monthly (with 1-month commitment) - P1M Quantity',
+        'Billing Type=Monthly (with 1-year commitment) - P1Y Quantity',
+        'Billing Type=Prepaid (with 1-year commitment) - P1Y Quantity',
+    ]
+    attributes = pd.Series([
+        f"{prefixes[i % 3]}={q}" for i, q in enumerate(rng.integers(-5, 501, rows))
+    ], dtype=object)
+
+    def legacy_lambda(x):
+        # Variante aus corrected_also_analysis (negative Mengen -> 0)
+        return int(x.split('=')[-1]) if pd.notna(x) and x.split('=')[-1].isdigit() else 0
+
+    candidates = {
+        'apply(extract_quantity)': lambda: attributes.apply(extract_quantity),
+        'apply(split lambda)': lambda: attributes.apply(legacy_lambda),
+        'apply(classify_billing_type)': lambda: attributes.apply(classify_billing_type),
+        'parse_attributes (alle Felder)': lambda: parse_attributes(attributes),
+    }
+    return {
+        name: min(timeit.repeat(func, number=1, repeat=repeat))
+        for name, func in candidates.items()
+    }
+
+
+def main():
+    """Hauptfunktion"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--lines-per-customer', type=int, default=6)
+    parser.add_argument('--work-dir', default=None, help='Basisverzeichnis für die Fixtures')
+    parser.add_argument('--output', help='Ergebnisse zusätzlich als CSV speichern')
+    parser.add_argument('--attributes', action='store_true', help='Nur Attributes-Parser (100.000 Zeilen)')
+    args = parser.parse_args()
+
+    if args.attributes:
+        print("=== BENCHMARK ATTRIBUTES PARSER ===\n")
+        timings = benchmark_attributes()
+        for name, seconds in timings.items():
+            print(f"  {name:32s} {seconds * 1000:8.1f} ms")
+        return timings
+
+    print("=== BENCHMARK ALSO IMPORT PIPELINE ===\n")
+    results = run_benchmarks(args.scales, args.work_dir, args.lines_per_customer, args.months)
+
+    print()
+    print(results.to_string(index=False, float_format=lambda x: f"{x:8.2f}"))
+    if args.output:
+        results.to_csv(args.output, index=False)
+        print(f"\nErgebnisse gespeichert: {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
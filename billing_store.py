@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Billing Store
+Lokaler, indizierter SQLite-Speicher für alle Abrechnungsquellen
+
+Ingest normalisiert einmalig:
+- Access tblUsage / tblProduct / tblKunden (über access_data)
+- ALSO Raw Charges aller Workbooks (Quantity/Billing Type bereits geparst);
+  von der Platte gelöschte Workbooks werden wieder entfernt
+- Usage der Vendor-CSVs (Starface Cloud, Acronis, Altaro über vendor_usage)
+- Datei-Inventar der übrigen Vendor-Ordner (über vendor_scanner)
+
+Bereits übernommene Quellen werden anhand ihres Fingerprints übersprungen.
+Excel-Companies werden wie in compare_data/corrected_analysis über den
+CustomerResolver auf KundenName bzw. IDAlso abgebildet (Tabelle
+customer_keys, nach jedem Ingest neu aufgebaut). Die bestehenden Analysen
+(analyze_november_2024_also, compare_data, corrected_analysis) laufen
+danach als SQL-Abfragen auf dem Store.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+from access_data import ACCESS_DB, ALSO_PRODUCTCLASS, CACHE_DIR, database_fingerprint, load_tables
+from also_attributes import parse_attributes
+from also_excel import ALSO_DATA_DIR, find_workbooks, read_raw_charges
+from customer_resolver import CustomerResolver
+from vendor_manifest import scan_with_manifest
+from vendor_scanner import DATA_DIR
+from vendor_usage import VENDOR_CSV_LAYOUTS, ingest_vendor_usage, iter_vendor_csvs
+
+STORE_PATH = CACHE_DIR / 'billing_store.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customers (
+    IDKunden INTEGER PRIMARY KEY,
+    KundenName TEXT,
+    IDAlso TEXT
+);
+CREATE TABLE IF NOT EXISTS products (
+    IDProduct INTEGER PRIMARY KEY,
+    Productname TEXT,
+    IDProductclass INTEGER
+);
+CREATE TABLE IF NOT EXISTS usage (
+    IDKunden INTEGER,
+    IDProduct INTEGER,
+    Jahr INTEGER,
+    Monat INTEGER,
+    Usage REAL,
+    Detail TEXT
+);
+CREATE TABLE IF NOT EXISTS charges (
+    vendor TEXT NOT NULL,
+    Jahr INTEGER NOT NULL,
+    Monat INTEGER NOT NULL,
+    customer TEXT,
+    product TEXT,
+    vendor_reference TEXT,
+    attributes TEXT,
+    interval TEXT,
+    quantity INTEGER,
+    billing_type TEXT,
+    charge REAL,
+    source TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customer_keys (
+    customer TEXT PRIMARY KEY,
+    IDKunden INTEGER,
+    KundenName TEXT,
+    IDAlso TEXT
+);
+CREATE TABLE IF NOT EXISTS vendor_usage (
+    vendor TEXT NOT NULL,
+    customer TEXT,
+    IDKunden INTEGER,
+    product TEXT,
+    Jahr INTEGER,
+    Monat INTEGER,
+    Usage REAL,
+    rows INTEGER
+);
+CREATE TABLE IF NOT EXISTS vendor_files (
+    vendor TEXT NOT NULL,
+    path TEXT PRIMARY KEY,
+    period TEXT,
+    extension TEXT,
+    size INTEGER,
+    encoding TEXT,
+    columns TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_usage_period ON usage (Jahr, Monat, IDKunden, IDProduct);
+CREATE INDEX IF NOT EXISTS ix_charges_period ON charges (vendor, Jahr, Monat, customer, product);
+CREATE INDEX IF NOT EXISTS ix_charges_source ON charges (source);
+CREATE INDEX IF NOT EXISTS ix_products_class ON products (IDProductclass, IDProduct);
+CREATE INDEX IF NOT EXISTS ix_customers_also ON customers (IDAlso);
+CREATE INDEX IF NOT EXISTS ix_vendor_usage_period ON vendor_usage (vendor, Jahr, Monat, IDKunden);
+"""
+
+
+def open_store(path=STORE_PATH):
+    """Store öffnen (und Schema bei Bedarf anlegen)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _fingerprint(path):
+    """Fingerprint einer Datei aus mtime und Größe"""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def _is_current(conn, source, fingerprint):
+    row = conn.execute("SELECT fingerprint FROM sources WHERE source = ?", (source,)).fetchone()
+    return row is not None and row[0] == fingerprint
+
+
+def _mark_current(conn, source, fingerprint):
+    conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?)", (source, fingerprint))
+
+
+def ingest_access(conn, db_path=ACCESS_DB, force=False):
+    """Access-Tabellen ersetzen, falls sich die Datenbank geändert hat"""
+    source = f"access:{os.path.abspath(db_path)}"
+    fingerprint = database_fingerprint(db_path)
+    if not force and _is_current(conn, source, fingerprint):
+        return False
+
+    tables = load_tables(['tblUsage', 'tblProduct', 'tblKunden'], db_path)
+    with conn:
+        for table in ('usage', 'products', 'customers'):
+            conn.execute(f"DELETE FROM {table}")
+        tables['tblKunden'][['IDKunden', 'KundenName', 'IDAlso']].to_sql(
+            'customers', conn, if_exists='append', index=False)
+        tables['tblProduct'][['IDProduct', 'Productname', 'IDProductclass']].to_sql(
+            'products', conn, if_exists='append', index=False)
+        tables['tblUsage'][['IDKunden', 'IDProduct', 'Jahr', 'Monat', 'Usage', 'Detail']].to_sql(
+            'usage', conn, if_exists='append', index=False, chunksize=50_000)
+        _mark_current(conn, source, fingerprint)
+    return True
+
+
+def ingest_also_workbooks(conn, base_path=ALSO_DATA_DIR, force=False):
+    """Raw Charges neuer oder geänderter ALSO Workbooks übernehmen"""
+    ingested = []
+    workbooks = list(find_workbooks(base_path))
+    for jahr, monat, path in workbooks:
+        source = os.path.abspath(path)
+        fingerprint = _fingerprint(path)
+        if not force and _is_current(conn, source, fingerprint):
+            continue
+
+        raw = read_raw_charges(path)
+        attributes = parse_attributes(raw['Attributes'])
+        charges = pd.DataFrame({
+            'vendor': 'Also',
+            'Jahr': jahr,
+            'Monat': monat,
+            'customer': raw['Company'],
+            'product': raw['Product name'],
+            'vendor_reference': raw['VendorReference'],
+            'attributes': raw['Attributes'],
+            'interval': raw['Interval'],
+            'quantity': attributes['Quantity'],
+            'billing_type': attributes['billing_type'].astype(str),
+            'charge': raw['Charge'].astype('float64'),
+            'source': source,
+        })
+        with conn:
+            conn.execute("DELETE FROM charges WHERE source = ?", (source,))
+            charges.to_sql('charges', conn, if_exists='append', index=False)
+            _mark_current(conn, source, fingerprint)
+        ingested.append(path)
+
+    # Workbooks, die unter base_path nicht mehr liegen, samt Zeilen entfernen
+    present = {os.path.abspath(path) for _, _, path in workbooks}
+    root = os.path.join(os.path.abspath(base_path), '')
+    stale = [source for (source,) in conn.execute("SELECT DISTINCT source FROM charges WHERE vendor = 'Also'")
+             if source.startswith(root) and source not in present]
+    with conn:
+        for source in stale:
+            conn.execute("DELETE FROM charges WHERE source = ?", (source,))
+            conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+    return ingested
+
+
+def _vendor_csv_fingerprint(base_path):
+    """Fingerprint aller Vendor-CSVs aus Pfad, mtime und Größe"""
+    digest = hashlib.sha256()
+    for file_info in iter_vendor_csvs(base_path):
+        digest.update(f"{file_info['full_path']}|{file_info['mtime']}|{file_info['size']}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def ingest_vendor_csv_usage(conn, base_path=DATA_DIR, customers_df=None, force=False):
+    """Usage der Vendor-CSVs ersetzen, falls sich eine Datei geändert hat"""
+    source = f"vendor_usage:{os.path.abspath(base_path)}"
+    fingerprint = _vendor_csv_fingerprint(base_path)
+    if not force and _is_current(conn, source, fingerprint):
+        return False
+
+    usage, _ = ingest_vendor_usage(base_path, tuple(VENDOR_CSV_LAYOUTS), customers_df=customers_df)
+    usage = usage.astype({'vendor': object, 'customer': object, 'product': object})
+    with conn:
+        conn.execute("DELETE FROM vendor_usage")
+        usage.to_sql('vendor_usage', conn, if_exists='append', index=False)
+        _mark_current(conn, source, fingerprint)
+    return len(usage)
+
+
+def refresh_customer_keys(conn):
+    """Excel-Companies über den CustomerResolver auf KundenName/IDAlso abbilden"""
+    customers = pd.read_sql_query("SELECT IDKunden, KundenName, IDAlso FROM customers", conn)
+    companies = pd.read_sql_query(
+        "SELECT DISTINCT customer FROM charges WHERE customer IS NOT NULL", conn)['customer']
+    resolver = CustomerResolver(customers)
+    keys = pd.DataFrame({
+        'customer': companies,
+        'IDKunden': resolver.resolve(companies)['IDKunden'],
+        'KundenName': resolver.canonical(companies),
+        'IDAlso': resolver.canonical(companies, 'IDAlso'),
+    })
+    with conn:
+        conn.execute("DELETE FROM customer_keys")
+        keys.to_sql('customer_keys', conn, if_exists='append', index=False)
+    return len(keys)
+
+
+def ingest_vendor_inventory(conn, base_path=DATA_DIR):
+    """Datei-Inventar der Vendor-Ordner ersetzen (Profile über das Vendor-Manifest)"""
+    rows = [
+        (vendor, p['full_path'], p['period'], p['extension'], p['size'], p.get('encoding'),
+         json.dumps(p['columns']) if 'columns' in p else None, p.get('error'))
+        for vendor, profiles in scan_with_manifest(base_path)[0].items()
+        for p in profiles
+    ]
+    with conn:
+        conn.execute("DELETE FROM vendor_files")
+        conn.executemany("INSERT INTO vendor_files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def ingest(store_path=STORE_PATH, db_path=ACCESS_DB, also_dir=ALSO_DATA_DIR,
+           data_dir=DATA_DIR, force=False):
+    """Alle Quellen in den Store übernehmen; liefert eine Zusammenfassung"""
+    has_access = os.path.exists(db_path)
+    conn = open_store(store_path)
+    try:
+        summary = {
+            'access': ingest_access(conn, db_path, force) if has_access else False,
+            'workbooks': ingest_also_workbooks(conn, also_dir, force),
+        }
+        if os.path.isdir(data_dir):
+            # tblKunden direkt (nicht aus dem Store): enthält die Vendor-IDs wie IDStarface
+            customers_df = load_tables(['tblKunden'], db_path)['tblKunden'] if has_access else None
+            summary['vendor_usage'] = ingest_vendor_csv_usage(conn, data_dir, customers_df, force)
+            summary['vendor_files'] = ingest_vendor_inventory(conn, data_dir)
+        else:
+            summary['vendor_usage'], summary['vendor_files'] = False, 0
+        summary['customer_keys'] = refresh_customer_keys(conn)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return summary
+
+
+# --- Analysen als SQL ---------------------------------------------------
+
+ANALYZE_SQL = """
+SELECT u.IDKunden AS customer_id,
+       COALESCE(k.KundenName, 'Unknown-' || u.IDKunden) AS customer_name,
+       u.IDProduct AS product_id,
+       p.Productname AS product_name,
+       MAX(u.Usage) AS max_usage,
+       COUNT(*) AS usage_count
+FROM usage AS u
+JOIN products AS p ON p.IDProduct = u.IDProduct
+LEFT JOIN customers AS k ON k.IDKunden = u.IDKunden
+WHERE u.Jahr = :jahr AND u.Monat = :monat AND p.IDProductclass = :productclass
+GROUP BY u.IDKunden, u.IDProduct
+"""
+
+# Excel-Zeilen je Abgleich: compare_data rechnet mit MAX Quantity je
+# (Company, Product) und bildet danach auf KundenName ab, corrected_analysis
+# mit den rohen Raw-Charges-Zeilen, abgebildet auf IDAlso. Nicht auflösbare
+# Companies bleiben wie im CustomerResolver unverändert.
+EXCEL_MAX_SQL = """
+    SELECT COALESCE(ck.KundenName, c.customer) AS customer, MAX(c.quantity) AS quantity
+    FROM charges AS c
+    LEFT JOIN customer_keys AS ck ON ck.customer = c.customer
+    WHERE c.vendor = 'Also' AND c.Jahr = :jahr AND c.Monat = :monat
+      AND c.customer IS NOT NULL AND c.product IS NOT NULL
+    GROUP BY c.customer, c.product
+"""
+
+EXCEL_RAW_SQL = """
+    SELECT COALESCE(ck.IDAlso, c.customer) AS customer, c.quantity
+    FROM charges AS c
+    LEFT JOIN customer_keys AS ck ON ck.customer = c.customer
+    WHERE c.vendor = 'Also' AND c.Jahr = :jahr AND c.Monat = :monat
+"""
+
+# Excel: Summe der Zeilen je Kunde; Access: Summe Usage je Kunde.
+# Full Outer Join über die Schlüsselmenge.
+COMPARE_SQL = """
+WITH excel AS (
+    SELECT customer, SUM(quantity) AS excel_total, COUNT(*) AS excel_rows
+    FROM ({excel_lines})
+    GROUP BY customer
+),
+access AS (
+    SELECT {access_key} AS customer, SUM(u.Usage) AS access_total, COUNT(*) AS access_rows
+    FROM usage AS u
+    JOIN products AS p ON p.IDProduct = u.IDProduct
+    LEFT JOIN customers AS k ON k.IDKunden = u.IDKunden
+    WHERE u.Jahr = :jahr AND u.Monat = :monat AND p.IDProductclass = :productclass
+      AND {access_key} IS NOT NULL
+    GROUP BY {access_key}
+),
+keys AS (
+    SELECT customer FROM excel UNION SELECT customer FROM access
+)
+SELECT keys.customer,
+       COALESCE(excel.excel_total, 0) AS excel_total,
+       COALESCE(excel.excel_rows, 0) AS excel_rows,
+       COALESCE(access.access_total, 0) AS access_total,
+       COALESCE(access.access_rows, 0) AS access_rows,
+       COALESCE(excel.excel_total, 0) - COALESCE(access.access_total, 0) AS difference,
+       CASE
+           WHEN access.customer IS NULL THEN 'MISSING_IN_ACCESS'
+           WHEN excel.customer IS NULL THEN 'MISSING_IN_EXCEL'
+           WHEN ABS(COALESCE(excel.excel_total, 0) - access.access_total) > :tolerance THEN 'QUANTITY_MISMATCH'
+           ELSE 'MATCH'
+       END AS diff_type
+FROM keys
+LEFT JOIN excel ON excel.customer = keys.customer
+LEFT JOIN access ON access.customer = keys.customer
+ORDER BY keys.customer
+"""
+
+
+def query_customer_usage(conn, jahr, monat, productclass=ALSO_PRODUCTCLASS):
+    """analyze_november_2024_also: Max Usage je Kunde und Produkt"""
+    return pd.read_sql_query(ANALYZE_SQL, conn, params={
+        'jahr': jahr, 'monat': monat, 'productclass': productclass})
+
+
+def query_comparison(conn, jahr, monat, tolerance=0.1, by_also_id=False,
+                     productclass=ALSO_PRODUCTCLASS):
+    """compare_data (KundenName, MAX je Produkt) bzw. corrected_analysis (IDAlso, Rohzeilen) als SQL"""
+    if by_also_id:
+        access_key, excel_lines = 'k.IDAlso', EXCEL_RAW_SQL
+    else:
+        access_key, excel_lines = 'k.KundenName', EXCEL_MAX_SQL
+    sql = COMPARE_SQL.format(access_key=access_key, excel_lines=excel_lines)
+    return pd.read_sql_query(sql, conn, params={
+        'jahr': jahr, 'monat': monat, 'productclass': productclass, 'tolerance': tolerance})
+
+
+def main():
+    """Hauptfunktion: Quellen übernehmen"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--store', default=str(STORE_PATH))
+    parser.add_argument('--access-db', default=ACCESS_DB)
+    parser.add_argument('--also-dir', default=ALSO_DATA_DIR)
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--force', action='store_true', help='Alle Quellen neu übernehmen')
+    args = parser.parse_args()
+
+    summary = ingest(args.store, args.access_db, args.also_dir, args.data_dir, args.force)
+
+    print("=== BILLING STORE INGEST ===\n")
+    print(f"Access-Tabellen übernommen: {'ja' if summary['access'] else 'nein (unverändert)'}")
+    print(f"ALSO Workbooks übernommen:  {len(summary['workbooks'])}")
+    vendor_usage = summary['vendor_usage']
+    print(f"Vendor-Usage (CSV):         {'unverändert' if vendor_usage is False else f'{vendor_usage} Zeilen'}")
+    print(f"Vendor-Dateien inventarisiert: {summary['vendor_files']}")
+    print(f"Excel-Kunden zugeordnet:    {summary['customer_keys']}")
+
+    return summary
+
+
+if __name__ == "__main__":
+    main()
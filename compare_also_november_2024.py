@@ -4,106 +4,148 @@ Detaillierter Vergleich: Excel ALSO November 2024 vs Access tblUsage
 Findet genaue Unterschiede zwischen Soll (Excel) und Ist (Access)
 """
 
-import pandas as pd
-import subprocess
-from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
 
-def load_excel_data():
-    """Lade und verarbeite Excel November 2024 ALSO Daten"""
-    print("=== EXCEL DATEN (SOLL) ===")
-    
+from access_data import ALSO_PRODUCTCLASS, load_table, load_usage, usage_with_names
+from also_attributes import parse_attributes
+from also_excel import aggregate_raw_charges, period_label, read_raw_charges, workbook_period
+from customer_resolver import CustomerResolver
+from instrumentation import stage, trace_run
+from reconciliation import (
+    DEFAULT_TOLERANCE, MATCH, MISSING_IN_ACCESS, MISSING_IN_EXCEL, QUANTITY_MISMATCH,
+    reconcile_customers
+)
+from result_cache import ResultCache, file_fingerprint, fingerprint, frame_fingerprint
+
+NOVEMBER_2024_WORKBOOK = 'data/Also/MB_NETWORKS_GmbH_11-2024.xlsx'
+
+def read_excel_data(path=NOVEMBER_2024_WORKBOOK):
+    """Excel Raw Charges laden und aggregieren (ohne Ausgabe)"""
     # Raw Charges Sheet laden
-    raw_charges = pd.read_excel('data/Also/MB_NETWORKS_GmbH_11-2024.xlsx', sheet_name='Raw Charges')
+    raw_charges = read_raw_charges(path)
     
     # Quantity aus Attributes extrahieren
-    def extract_quantity(attr_str):
-        if pd.isna(attr_str):
-            return 0
-        # Nimm alles nach dem letzten '=' (wie VBA)
-        last_equal_pos = attr_str.rfind('=')
-        if last_equal_pos != -1:
-            quantity_str = attr_str[last_equal_pos + 1:]
-            try:
-                return int(quantity_str)
-            except ValueError:
-                return 0
-        return 0
-    
-    raw_charges['Quantity'] = raw_charges['Attributes'].apply(extract_quantity)
+    with stage('parse attributes') as s:
+        raw_charges['Quantity'] = parse_attributes(raw_charges['Attributes'])['Quantity']
+        s['rows'] = len(raw_charges)
     
     # Korrekte Aggregierung: MAX Quantity pro Company + Product
-    excel_agg = raw_charges.groupby(['Company', 'Product name']).agg({
-        'Quantity': 'max',  # Maximum quantity für dieses Produkt
-        'Charge': 'sum',
-        'Interval': 'first',
-        'VendorReference': 'first'
-    }).reset_index()
+    with stage('excel aggregation') as s:
+        excel_agg = aggregate_raw_charges(raw_charges)
+        s['rows'] = len(excel_agg)
     
+    return excel_agg, raw_charges
+
+def print_excel_summary(excel_agg, raw_charges):
+    """Kennzahlen der Excel-Daten ausgeben"""
+    print("=== EXCEL DATEN (SOLL) ===")
     print(f"Excel Rohdaten: {len(raw_charges)} Einträge")
     print(f"Nach Aggregierung: {len(excel_agg)} Einträge")
     print(f"Kunden: {excel_agg['Company'].nunique()}")
     print(f"Total Quantity: {excel_agg['Quantity'].sum()}")
-    
+
+def load_excel_data(path=NOVEMBER_2024_WORKBOOK):
+    """Lade und verarbeite Excel November 2024 ALSO Daten"""
+    excel_agg, raw_charges = read_excel_data(path)
+    print_excel_summary(excel_agg, raw_charges)
     return excel_agg, raw_charges
 
-def load_access_data():
-    """Lade Access tblUsage November 2024 ALSO Daten"""
-    print("\n=== ACCESS DATEN (IST) ===")
-    
-    # tblUsage exportieren
-    result = subprocess.run(['mdb-export', 'MSPCalculator.accdb', 'tblUsage'], 
-                          capture_output=True, text=True)
-    usage_df = pd.read_csv(StringIO(result.stdout))
-    
-    # November 2024 filtern
-    nov_2024 = usage_df[(usage_df['Monat'] == 11) & (usage_df['Jahr'] == 2024)]
-    
-    # ALSO Produkte identifizieren (IDProductclass = 2)
-    result = subprocess.run(['mdb-export', 'MSPCalculator.accdb', 'tblProduct'], 
-                          capture_output=True, text=True)
-    products_df = pd.read_csv(StringIO(result.stdout))
-    also_products = products_df[products_df['IDProductclass'] == 2]['IDProduct'].tolist()
-    
-    # Nur ALSO Produkte
-    also_usage = nov_2024[nov_2024['IDProduct'].isin(also_products)]
-    
-    # Kundennamen hinzufügen
-    result = subprocess.run(['mdb-export', 'MSPCalculator.accdb', 'tblKunden'], 
-                          capture_output=True, text=True)
-    customers_df = pd.read_csv(StringIO(result.stdout))
-    
-    # Merge customer names und product names
-    also_usage_detailed = also_usage.merge(
-        customers_df[['IDKunden', 'KundenName']], 
-        left_on='IDKunden', right_on='IDKunden', how='left'
-    ).merge(
-        products_df[['IDProduct', 'Productname']], 
-        left_on='IDProduct', right_on='IDProduct', how='left'
+def submit_access_exports(pool, jahr=2024, monat=11):
+    """tblUsage (Abrechnungsmonat), tblProduct und tblKunden als parallele Jobs starten"""
+    return (
+        pool.submit(load_usage, jahr=jahr, monat=monat),
+        pool.submit(load_table, 'tblProduct'),
+        pool.submit(load_table, 'tblKunden')
     )
-    
-    print(f"Access tblUsage November 2024: {len(also_usage_detailed)} Einträge")
+
+def join_access_data(usage, products_df, customers_df):
+    """Nur ALSO Produkte (IDProductclass = 2), Kunden- und Produktnamen anfügen"""
+    with stage('access join') as s:
+        also_products = products_df.loc[products_df['IDProductclass'] == ALSO_PRODUCTCLASS, 'IDProduct']
+        also_usage = usage[usage['IDProduct'].isin(also_products)]
+        joined = usage_with_names(also_usage, customers_df, products_df)
+        s['rows'] = len(joined)
+    return joined
+
+def print_access_summary(also_usage_detailed, jahr=2024, monat=11):
+    """Kennzahlen der Access-Daten ausgeben"""
+    print("\n=== ACCESS DATEN (IST) ===")
+    print(f"Access tblUsage {period_label(jahr, monat)}: {len(also_usage_detailed)} Einträge")
     print(f"Kunden: {also_usage_detailed['KundenName'].nunique()}")
     print(f"Total Usage: {also_usage_detailed['Usage'].sum()}")
+
+def load_access_data(jahr=2024, monat=11):
+    """Lade Access tblUsage ALSO Daten eines Monats (Standard November 2024)"""
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        usage, products_df, customers_df = (f.result() for f in submit_access_exports(pool, jahr, monat))
+    
+    also_usage_detailed = join_access_data(usage, products_df, customers_df)
+    print_access_summary(also_usage_detailed, jahr, monat)
     
     return also_usage_detailed, customers_df, products_df
 
-def compare_data(excel_data, access_data):
-    """Detaillierter Vergleich zwischen Excel und Access"""
+def load_all_data(path=NOVEMBER_2024_WORKBOOK):
+    """Excel und alle Access-Exporte gleichzeitig laden
+    
+    Die Laufzeit entspricht etwa der langsamsten Einzelquelle statt der
+    Summe aller Quellen. Der Access-Monat kommt aus dem Dateinamen des
+    Workbooks.
+    """
+    jahr, monat = workbook_period(path)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        excel_future = pool.submit(read_excel_data, path)
+        access_futures = submit_access_exports(pool, jahr, monat)
+        
+        excel_agg, excel_raw = excel_future.result()
+        usage, products_df, customers_df = (f.result() for f in access_futures)
+    
+    access_data = join_access_data(usage, products_df, customers_df)
+    
+    print_excel_summary(excel_agg, excel_raw)
+    print_access_summary(access_data, jahr, monat)
+    
+    return (excel_agg, excel_raw), (access_data, customers_df, products_df)
+
+def reconcile_excel_access(excel_data, access_data, tolerance=DEFAULT_TOLERANCE, resolver=None):
+    """Companies auflösen und auf Kundenebene abgleichen; liefert (Company, customer_diff)"""
+    # Company auf den KundenName aus tblKunden abbilden, soweit auflösbar
+    companies = excel_data['Company']
+    if resolver is not None:
+        companies = resolver.canonical(companies)
+    
+    # Ein Full Outer Merge auf Kundenebene statt Filter pro Kunde
+    customer_diff = reconcile_customers(excel_data.assign(Company=companies), access_data,
+                                        tolerance=tolerance, keep_matches=True)
+    return companies, customer_diff.sort_values('customer', kind='stable')
+
+def compare_data(excel_data, access_data, tolerance=DEFAULT_TOLERANCE, resolver=None, cache_key=None):
+    """Detaillierter Vergleich zwischen Excel und Access
+    
+    Mit cache_key kommt der Abgleich aus dem Result Cache, solange sich
+    Workbook, Access-Monat und Stammdaten nicht geändert haben.
+    """
     print("\n=== DETAILLIERTER VERGLEICH ===")
     
-    differences = []
+    def compute():
+        return reconcile_excel_access(excel_data, access_data, tolerance, resolver)
+    
+    with stage('reconcile customers') as s:
+        if cache_key is not None:
+            with ResultCache() as cache:
+                companies, customer_diff = cache.get_or_compute('compare_data', cache_key, compute)
+        else:
+            companies, customer_diff = compute()
+        excel_data = excel_data.assign(Company=companies)
+        s['rows'] = len(customer_diff)
     
-    # 1. Kunden die in Excel aber nicht in Access sind
-    excel_customers = set(excel_data['Company'].unique())
-    access_customers = set(access_data['KundenName'].dropna().unique())
+    differences = []
     
-    only_in_excel = excel_customers - access_customers
-    only_in_access = access_customers - excel_customers
+    # 1. Kunden die nur in Excel bzw. nur in Access sind
+    only_in_excel = customer_diff[customer_diff['diff_type'] == MISSING_IN_ACCESS]
+    only_in_access = customer_diff[customer_diff['diff_type'] == MISSING_IN_EXCEL]
     
     print(f"\nKunden nur in Excel: {len(only_in_excel)}")
-    for customer in sorted(only_in_excel):
-        customer_data = excel_data[excel_data['Company'] == customer]
-        total_qty = customer_data['Quantity'].sum()
+    for customer, total_qty in zip(only_in_excel['customer'], only_in_excel['excel_total']):
         print(f"  - {customer}: {total_qty} Quantity")
         differences.append({
             'type': 'CUSTOMER_MISSING_IN_ACCESS',
@@ -114,9 +156,7 @@ def compare_data(excel_data, access_data):
         })
     
     print(f"\nKunden nur in Access: {len(only_in_access)}")
-    for customer in sorted(only_in_access):
-        customer_data = access_data[access_data['KundenName'] == customer]
-        total_usage = customer_data['Usage'].sum()
+    for customer, total_usage in zip(only_in_access['customer'], only_in_access['access_total']):
         print(f"  - {customer}: {total_usage} Usage")
         differences.append({
             'type': 'CUSTOMER_MISSING_IN_EXCEL',
@@ -127,31 +167,23 @@ def compare_data(excel_data, access_data):
         })
     
     # 2. Gemeinsame Kunden vergleichen
-    common_customers = excel_customers & access_customers
-    print(f"\nGemeinsame Kunden: {len(common_customers)}")
-    
-    customer_differences = []
-    
-    for customer in sorted(common_customers):
-        excel_customer = excel_data[excel_data['Company'] == customer]
-        access_customer = access_data[access_data['KundenName'] == customer]
-        
-        excel_total = excel_customer['Quantity'].sum()
-        access_total = access_customer['Usage'].sum()
-        diff = excel_total - access_total
-        
-        if abs(diff) > 0.1:  # Nur signifikante Unterschiede
-            customer_differences.append({
-                'customer': customer,
-                'excel_total': excel_total,
-                'access_total': access_total,
-                'difference': diff,
-                'excel_products': len(excel_customer),
-                'access_products': len(access_customer)
-            })
-    
-    # Sortiere nach größter Differenz
-    customer_differences.sort(key=lambda x: abs(x['difference']), reverse=True)
+    common = customer_diff['diff_type'].isin([QUANTITY_MISMATCH, MATCH])
+    print(f"\nGemeinsame Kunden: {common.sum()}")
+    
+    # Nur signifikante Unterschiede, sortiert nach größter Differenz
+    mismatches = customer_diff[customer_diff['diff_type'] == QUANTITY_MISMATCH]
+    mismatches = mismatches.sort_values('difference', key=abs, ascending=False, kind='stable')
+    customer_differences = [
+        {
+            'customer': row.customer,
+            'excel_total': row.excel_total,
+            'access_total': row.access_total,
+            'difference': row.difference,
+            'excel_products': row.excel_rows,
+            'access_products': row.access_rows
+        }
+        for row in mismatches.itertuples(index=False)
+    ]
     
     print(f"\nKunden mit Unterschieden: {len(customer_differences)}")
     print("\nTop 10 größte Unterschiede:")
@@ -166,21 +198,24 @@ def compare_data(excel_data, access_data):
     # 3. Produkt-Level-Analyse für größte Abweichungen
     print("\n=== PRODUKT-LEVEL-ANALYSE (Top 3 Kunden) ===")
     
+    excel_by_customer = excel_data.groupby('Company', sort=False, observed=True)
+    access_by_customer = access_data.groupby('KundenName', sort=False, observed=True)
+    
     for i, diff in enumerate(customer_differences[:3]):
         customer = diff['customer']
         print(f"\n{i+1}. {customer}")
         print("-" * 50)
         
-        excel_customer = excel_data[excel_data['Company'] == customer]
-        access_customer = access_data[access_data['KundenName'] == customer]
+        excel_customer = excel_by_customer.get_group(customer)
+        access_customer = access_by_customer.get_group(customer)
         
         print("Excel Produkte:")
-        for _, row in excel_customer.iterrows():
-            print(f"  {row['Product name'][:40]:40s}: {row['Quantity']:3.0f}")
+        for product, quantity in zip(excel_customer['Product name'], excel_customer['Quantity']):
+            print(f"  {product[:40]:40s}: {quantity:3.0f}")
         
         print("Access Produkte:")
-        for _, row in access_customer.iterrows():
-            print(f"  {row['Productname'][:40]:40s}: {row['Usage']:3.0f}")
+        for product, usage in zip(access_customer['Productname'], access_customer['Usage']):
+            print(f"  {product[:40]:40s}: {usage:3.0f}")
     
     # 4. Zusammenfassung
     total_excel = excel_data['Quantity'].sum()
@@ -194,18 +229,23 @@ def compare_data(excel_data, access_data):
     
     return differences, customer_differences
 
-def main():
+def main(path=NOVEMBER_2024_WORKBOOK, tolerance=DEFAULT_TOLERANCE, use_cache=True):
     """Hauptfunktion"""
-    print("ALSO November 2024 Vergleich: Excel vs Access\n")
+    print(f"ALSO {period_label(*workbook_period(path))} Vergleich: Excel vs Access\n")
     
-    # Daten laden
-    excel_agg, excel_raw = load_excel_data()
-    access_data, customers_df, products_df = load_access_data()
+    # Daten laden (Excel und Access parallel)
+    (excel_agg, excel_raw), (access_data, customers_df, products_df) = load_all_data(path)
     
-    # Vergleichen
-    differences, customer_diffs = compare_data(excel_agg, access_data)
+    # Vergleichen (Abgleich aus dem Cache, solange Workbook, Access-Monat und Stammdaten unverändert sind)
+    cache_key = None
+    if use_cache:
+        cache_key = fingerprint('compare_data', file_fingerprint(path), frame_fingerprint(access_data),
+                                frame_fingerprint(customers_df), frame_fingerprint(products_df), tolerance)
+    differences, customer_diffs = compare_data(excel_agg, access_data, tolerance,
+                                               CustomerResolver(customers_df), cache_key)
     
     print(f"\nAnalyse abgeschlossen. {len(differences)} Unterschiede gefunden.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with trace_run('compare_also_november_2024'):
+        main()
\ No newline at end of file
@@ -4,59 +4,87 @@ KORRIGIERTE ALSO November 2024 Analyse
 Berücksichtigt NUR IDProductclass=2 (ALSO) Produkte
 """
 
-import pandas as pd
-import subprocess
-from io import StringIO
+from access_data import ALSO_PRODUCTCLASS, load_table, load_usage
+from also_attributes import parse_attributes
+from also_excel import read_raw_charges, workbook_period
+from customer_resolver import CustomerResolver
+from instrumentation import stage, trace_run
+from reconciliation import (
+    DEFAULT_TOLERANCE, MATCH, MISSING_IN_ACCESS, MISSING_IN_EXCEL, QUANTITY_MISMATCH,
+    reconcile_customers
+)
+from result_cache import ResultCache, file_fingerprint, fingerprint, frame_fingerprint
 
-def corrected_analysis():
-    print("=== KORRIGIERTE ALSO ANALYSE (nur IDProductclass=2) ===\n")
-    
-    # 1. Excel-Daten (unverändert)
-    excel_data = pd.read_excel('data/Also/MB_NETWORKS_GmbH_11-2024.xlsx', sheet_name='Raw Charges')
-    excel_data['Quantity'] = excel_data['Attributes'].apply(lambda x: 
-        int(x.split('=')[-1]) if pd.notna(x) and x.split('=')[-1].isdigit() else 0
-    )
-    
-    excel_agg = excel_data.groupby(['Company', 'Product name']).agg({
-        'Quantity': 'max'
-    }).reset_index()
-    
-    # 2. Access-Daten - NUR IDProductclass=2
-    result = subprocess.run(['mdb-export', 'MSPCalculator.accdb', 'tblUsage'], 
-                          capture_output=True, text=True)
-    usage_df = pd.read_csv(StringIO(result.stdout))
-    
-    # November 2024
-    nov_2024 = usage_df[(usage_df['Monat'] == 11) & (usage_df['Jahr'] == 2024)]
-    
-    # Nur ALSO Produkte (IDProductclass=2)
-    result = subprocess.run(['mdb-export', 'MSPCalculator.accdb', 'tblProduct'], 
-                          capture_output=True, text=True)
-    products_df = pd.read_csv(StringIO(result.stdout))
-    
-    also_products = products_df[products_df['IDProductclass'] == 2]['IDProduct'].tolist()
-    also_usage = nov_2024[nov_2024['IDProduct'].isin(also_products)]
+NOVEMBER_2024_WORKBOOK = 'data/Also/MB_NETWORKS_GmbH_11-2024.xlsx'
+
+def excel_vs_access(path, also_usage_detailed, tolerance=DEFAULT_TOLERANCE, resolver=None):
+    """Excel laden, aggregieren und gegen Access abgleichen (gecachter Teil)"""
+    # 1. Excel-Daten (Company auf die IDAlso des aufgelösten Kunden, soweit auflösbar)
+    with stage('1. excel') as s:
+        excel_data = read_raw_charges(path)
+        excel_data['Quantity'] = parse_attributes(excel_data['Attributes'])['Quantity']
+        if resolver is not None:
+            excel_data['Company'] = resolver.canonical(excel_data['Company'], 'IDAlso')
+        
+        excel_agg = excel_data.groupby(['Company', 'Product name'], observed=True).agg({
+            'Quantity': 'max'
+        }).reset_index()
+        s['rows'] = len(excel_agg)
+    
+    # 3. Vergleich nach Kunden (ein Full Outer Merge auf Company = IDAlso)
+    with stage('3. reconcile customers') as s:
+        customer_diff = reconcile_customers(
+            excel_data, also_usage_detailed, access_customer='IDAlso',
+            tolerance=tolerance, keep_matches=True
+        )
+        s['rows'] = len(customer_diff)
+    
+    return len(excel_agg), excel_agg['Quantity'].sum(), customer_diff
+
+def load_access_usage(jahr, monat, customers_df=None):
+    """ALSO Usage (IDProductclass=2) eines Monats mit IDAlso des Kunden"""
+    also_usage = load_usage(jahr=jahr, monat=monat, productclass=ALSO_PRODUCTCLASS)
     
     # Kundennamen hinzufügen
-    result = subprocess.run(['mdb-export', 'MSPCalculator.accdb', 'tblKunden'], 
-                          capture_output=True, text=True)
-    customers_df = pd.read_csv(StringIO(result.stdout))
+    if customers_df is None:
+        customers_df = load_table('tblKunden')
     
-    also_usage_detailed = also_usage.merge(
+    return also_usage.merge(
         customers_df[['IDKunden', 'IDAlso']], 
         on='IDKunden', how='left'
     )
+
+def corrected_analysis(tolerance=DEFAULT_TOLERANCE, path=NOVEMBER_2024_WORKBOOK, use_cache=True):
+    print("=== KORRIGIERTE ALSO ANALYSE (nur IDProductclass=2) ===\n")
     
-    print(f"Excel: {len(excel_agg)} Einträge, {excel_agg['Quantity'].sum()} Total Quantity")
+    # 2. Access-Daten - NUR IDProductclass=2
+    # Abrechnungsmonat des Workbooks, nur ALSO Produkte (IDProductclass=2)
+    jahr, monat = workbook_period(path)
+    with stage('2. access') as s:
+        customers_df = load_table('tblKunden')
+        also_usage_detailed = load_access_usage(jahr, monat, customers_df)
+        s['rows'] = len(also_usage_detailed)
+    
+    # Excel-Seite und Abgleich aus dem Cache, solange Workbook, Access-Monat und Kunden unverändert sind
+    def compute():
+        return excel_vs_access(path, also_usage_detailed, tolerance, CustomerResolver(customers_df))
+    
+    if use_cache:
+        key = fingerprint('corrected_analysis', file_fingerprint(path), frame_fingerprint(also_usage_detailed),
+                          frame_fingerprint(customers_df), tolerance)
+        with ResultCache() as cache:
+            excel_rows, excel_total, customer_diff = cache.get_or_compute('corrected_analysis', key, compute)
+    else:
+        excel_rows, excel_total, customer_diff = compute()
+    
+    print(f"Excel: {excel_rows} Einträge, {excel_total} Total Quantity")
     print(f"Access (nur ALSO): {len(also_usage_detailed)} Einträge, {also_usage_detailed['Usage'].sum():.0f} Total Usage")
     
-    # 3. Vergleich nach Kunden
-    excel_customers = set(excel_data['Company'].unique())
-    access_customers = set(also_usage_detailed['IDAlso'].dropna().unique())
+    diff_type = customer_diff['diff_type']
     
-    only_in_excel = excel_customers - access_customers
-    only_in_access = access_customers - excel_customers
-    common_customers = excel_customers & access_customers
+    only_in_excel = customer_diff[diff_type == MISSING_IN_ACCESS].sort_values('customer')
+    only_in_access = customer_diff[diff_type == MISSING_IN_EXCEL]
+    common_customers = customer_diff[diff_type.isin([QUANTITY_MISMATCH, MATCH])]
     
     print(f"\nKunden nur in Excel: {len(only_in_excel)}")
     print(f"Kunden nur in Access: {len(only_in_access)}")  
@@ -64,24 +92,20 @@ def corrected_analysis():
     
     if len(only_in_excel) > 0:
         print("\nNur in Excel:")
-        for customer in sorted(only_in_excel):
-            qty = excel_data[excel_data['Company'] == customer]['Quantity'].sum()
+        for customer, qty in zip(only_in_excel['customer'], only_in_excel['excel_total']):
             print(f"  - {customer}: {qty}")
     
     # 4. Detailvergleich gemeinsame Kunden
-    differences = []
-    for customer in common_customers:
-        excel_total = excel_data[excel_data['Company'] == customer]['Quantity'].sum()
-        access_total = also_usage_detailed[also_usage_detailed['IDAlso'] == customer]['Usage'].sum()
-        diff = excel_total - access_total
-        
-        if abs(diff) > 0.1:
-            differences.append({
-                'customer': customer,
-                'excel': excel_total,
-                'access': access_total,
-                'diff': diff
-            })
+    mismatches = customer_diff[diff_type == QUANTITY_MISMATCH]
+    differences = [
+        {
+            'customer': row.customer,
+            'excel': row.excel_total,
+            'access': row.access_total,
+            'diff': row.difference
+        }
+        for row in mismatches.itertuples(index=False)
+    ]
     
     if differences:
         print(f"\nKunden mit Abweichungen: {len(differences)}")
@@ -93,5 +117,6 @@ def corrected_analysis():
     return len(only_in_excel), len(differences)
 
 if __name__ == "__main__":
-    missing, wrong = corrected_analysis()
-    print(f"\nFAZIT: {missing} fehlende Kunden, {wrong} falsche Mengen")
\ No newline at end of file
+    with trace_run('corrected_also_analysis'):
+        missing, wrong = corrected_analysis()
+        print(f"\nFAZIT: {missing} fehlende Kunden, {wrong} falsche Mengen")
\ No newline at end of file
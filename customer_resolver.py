@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Customer Resolver
+Einheitliche Zuordnung von Excel-Company / IDAlso / KundenName zu tblKunden
+
+Baut einmal Hash-Indizes über tblKunden (IDKunden, IDAlso, normalisierter
+Name). Nicht direkt auflösbare Namen laufen durch eine geblockte
+Fuzzy-Stufe: verglichen wird nur mit Kunden, die ein Namens-Token teilen,
+nicht jeder Name mit jedem. resolve() arbeitet auf den eindeutigen Werten
+einer Series und ist damit O(n) in der Zeilenanzahl.
+"""
+
+import re
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from access_data import load_table
+
+FUZZY_THRESHOLD = 0.9
+MIN_TOKEN_LENGTH = 3
+
+MATCH_ALSO = 'also_id'
+MATCH_EXACT = 'exact'
+MATCH_NORMALIZED = 'normalized'
+MATCH_FUZZY = 'fuzzy'
+
+UMLAUTS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+
+# Rechtsformen tragen nichts zur Identität bei ("Müller GmbH" == "Müller")
+LEGAL_FORMS = re.compile(
+    r'\b(gmbh|mbh|ag|kg|ohg|gbr|ug|ek|ev|eg|co|se|inc|ltd|llc|haftungsbeschraenkt)\b'
+)
+NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_names(names):
+    """Normalisierter Namensschlüssel (vektorisiert über eine Series)"""
+    key = names.astype('string').str.casefold().str.translate(UMLAUTS)
+    key = key.str.replace(NON_ALNUM, ' ', regex=True)
+    key = key.str.replace(LEGAL_FORMS, ' ', regex=True)
+    return key.str.split().str.join(' ')
+
+
+def _digits(key):
+    """Zahlen-Tokens; Kunden mit abweichenden Nummern sind nie identisch"""
+    return sorted(token for token in key.split() if token.isdigit())
+
+
+def _tokens(key):
+    """Block-Tokens eines normalisierten Namens"""
+    return {token for token in key.split() if len(token) >= MIN_TOKEN_LENGTH}
+
+
+class CustomerResolver:
+    """Hash-indizierte Kundenauflösung über tblKunden"""
+
+    def __init__(self, customers_df, fuzzy_threshold=FUZZY_THRESHOLD):
+        customers = customers_df.drop_duplicates('IDKunden')
+        self.fuzzy_threshold = fuzzy_threshold
+        self.names = customers.set_index('IDKunden')['KundenName'].astype(object)
+        self.also_ids = (customers.set_index('IDKunden')['IDAlso'].astype(object)
+                         if 'IDAlso' in customers else pd.Series(dtype=object))
+
+        ids = customers['IDKunden']
+        self.by_also = self._index(customers['IDAlso'], ids) if 'IDAlso' in customers else {}
+        self.by_name = self._index(customers['KundenName'], ids)
+
+        # Normalisierte Schlüssel aus KundenName und IDAlso
+        self.by_key = {}
+        for column in ('IDAlso', 'KundenName'):
+            if column in customers:
+                self.by_key.update(self._index(normalize_names(customers[column]), ids))
+
+        self.blocks = {}
+        for key, customer_id in self.by_key.items():
+            for token in _tokens(key):
+                self.blocks.setdefault(token, []).append((key, customer_id))
+
+    @staticmethod
+    def _index(values, ids):
+        """Wert -> IDKunden (erster Treffer gewinnt, leere Werte ausgelassen)"""
+        mask = values.notna() & (values.astype('string').str.len() > 0)
+        index = {}
+        for value, customer_id in zip(values[mask], ids[mask]):
+            index.setdefault(value, customer_id)
+        return index
+
+    @classmethod
+    def from_access(cls, **kwargs):
+        """Resolver aus tblKunden der Access-Datenbank"""
+        return cls(load_table('tblKunden'), **kwargs)
+
+    def _fuzzy(self, key):
+        """Bester Kandidat innerhalb der Token-Blöcke"""
+        candidates = {}
+        for token in _tokens(key):
+            for candidate_key, customer_id in self.blocks.get(token, ()):
+                candidates.setdefault(candidate_key, customer_id)
+
+        best_id, best_score = None, 0.0
+        digits = _digits(key)
+        for candidate_key, customer_id in candidates.items():
+            if _digits(candidate_key) != digits:
+                continue
+            score = SequenceMatcher(None, key, candidate_key).ratio()
+            if score > best_score:
+                best_id, best_score = customer_id, score
+        if best_score >= self.fuzzy_threshold:
+            return best_id, best_score
+        return None, best_score
+
+    def resolve(self, values):
+        """Series von Namen/IDAlso auf tblKunden auflösen
+
+        Liefert (Index wie die Eingabe) IDKunden (Int64, <NA> falls
+        unbekannt), KundenName, match (also_id/exact/normalized/fuzzy) und
+        score.
+        """
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Series(uniques, dtype=object)
+        keys = normalize_names(uniques)
+
+        resolved_ids, matches, scores = [], [], []
+        for value, key in zip(uniques, keys):
+            if value in self.by_also:
+                customer_id, match, score = self.by_also[value], MATCH_ALSO, 1.0
+            elif value in self.by_name:
+                customer_id, match, score = self.by_name[value], MATCH_EXACT, 1.0
+            elif pd.notna(key) and key in self.by_key:
+                customer_id, match, score = self.by_key[key], MATCH_NORMALIZED, 1.0
+            elif pd.notna(key) and key:
+                customer_id, score = self._fuzzy(key)
+                match = MATCH_FUZZY if customer_id is not None else None
+            else:
+                customer_id, match, score = None, None, 0.0
+            resolved_ids.append(customer_id)
+            matches.append(match)
+            scores.append(score)
+
+        # Fehlende Eingaben (Code -1) zeigen auf den angehängten Leerwert
+        def spread(items, empty):
+            return pd.Series(items + [empty], dtype=object).to_numpy()[codes]
+
+        customer_ids = pd.array(spread(resolved_ids, None), dtype='Int64')
+        return pd.DataFrame({
+            'IDKunden': customer_ids,
+            'KundenName': pd.Series(customer_ids).map(self.names).to_numpy(),
+            'match': spread(matches, None),
+            'score': spread(scores, 0.0).astype(np.float64),
+        }, index=values.index)
+
+    def canonical(self, values, column='KundenName'):
+        """Werte auf KundenName bzw. IDAlso des aufgelösten Kunden abbilden
+
+        Nicht auflösbare Werte (oder Kunden ohne Eintrag in column) bleiben
+        unverändert.
+        """
+        lookup = self.also_ids if column == 'IDAlso' else self.names
+        resolved = self.resolve(values)['IDKunden'].map(lookup)
+        return resolved.fillna(values.astype(object))
+
+    def names_for_ids(self, customer_ids):
+        """KundenName je IDKunden, Fallback 'Unknown-{id}'"""
+        return customer_ids.map(self.names).fillna('Unknown-' + customer_ids.astype(str))
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Stage Instrumentation
+Laufzeit, CPU-Zeit, Peak-RSS und Zeilenanzahl je Verarbeitungsstufe
+
+Aktiviert über MSPGENIE_TRACE (oder enable()):
+    MSPGENIE_TRACE=1              Trace unter <CACHE_DIR>/traces/ ablegen
+    MSPGENIE_TRACE=run.json       Trace in diese Datei schreiben
+    MSPGENIE_TRACE=/pfad/traces   Trace in dieses Verzeichnis schreiben
+
+Ohne Aktivierung ist stage() ein leerer Kontextmanager.
+
+    with trace_run('analyze_also_november_2024'):
+        with stage('filter usage') as s:
+            usage = ...
+            s['rows'] = len(usage)
+
+CPU-Zeit ist die des ganzen Prozesses (process_time): eine Stufe, die
+Worker-Threads startet, enthält deren Arbeit; parallel laufende Stufen
+zählen sich dabei gegenseitig mit. Kindprozesse wie mdb-export erscheinen
+als child_cpu_s.
+"""
+
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+TRACE_ENV = 'MSPGENIE_TRACE'
+
+_target = os.environ.get(TRACE_ENV, '')
+_enabled = _target not in ('', '0')
+_records = []
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(target='1'):
+    """Instrumentierung einschalten (z.B. für ein --trace Flag)"""
+    global _enabled, _target
+    _enabled, _target = True, target
+
+
+def is_enabled():
+    return _enabled
+
+
+def _max_rss_mb():
+    """Prozessweite RSS-Spitze (ru_maxrss: Linux KiB, macOS Bytes)"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 2**20 if sys.platform == 'darwin' else max_rss / 2**10
+
+
+def _child_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+@contextmanager
+def stage(name, rows=None):
+    """Eine Stufe messen; der gelieferte Record nimmt z.B. 'rows' auf"""
+    if not _enabled:
+        yield {}
+        return
+
+    stack = _local.__dict__.setdefault('stack', [])
+    record = {
+        'stage': name,
+        'parent': stack[-1]['stage'] if stack else None,
+        'depth': len(stack),
+        'thread': threading.current_thread().name,
+        'started': time.time(),
+        'rows': rows,
+    }
+    stack.append(record)
+    rss_before = _max_rss_mb()
+    wall, cpu, child_cpu = time.perf_counter(), time.process_time(), _child_cpu()
+    try:
+        yield record
+    except BaseException as exc:
+        record['error'] = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        record.update(
+            wall_s=round(time.perf_counter() - wall, 6),
+            cpu_s=round(time.process_time() - cpu, 6),
+            child_cpu_s=round(_child_cpu() - child_cpu, 6),
+            max_rss_mb=round(_max_rss_mb(), 1),
+            rss_growth_mb=round(_max_rss_mb() - rss_before, 1),
+        )
+        stack.pop()
+        with _lock:
+            _records.append(record)
+
+
+def traced(name=None):
+    """Decorator-Variante von stage(); Standardname ist der Funktionsname"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def records():
+    """Abgeschlossene Stufen in Startreihenfolge"""
+    with _lock:
+        return sorted(_records, key=lambda record: record['started'])
+
+
+def reset():
+    with _lock:
+        _records.clear()
+
+
+def _trace_path(script):
+    """Zielpfad des JSON-Traces aus MSPGENIE_TRACE"""
+    filename = f"{script}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    if _target.endswith('.json'):
+        return Path(_target)
+    if _target not in ('1', 'true', 'yes'):
+        return Path(_target) / filename
+
+    from access_data import CACHE_DIR
+    return CACHE_DIR / 'traces' / filename
+
+
+def write_trace(script, path=None):
+    """Alle Stufen als JSON-Trace schreiben; liefert den Pfad"""
+    path = Path(path) if path else _trace_path(script)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    trace = {
+        'script': script,
+        'argv': sys.argv,
+        'pid': os.getpid(),
+        'written': datetime.now().isoformat(timespec='seconds'),
+        'stages': records(),
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, indent=2, default=str)
+    return path
+
+
+def print_report():
+    """Stufen-Tabelle auf der Konsole ausgeben"""
+    print("\n=== STAGE TIMINGS ===")
+    print(f"{'Stufe':45s} {'Wall s':>8s} {'CPU s':>8s} {'Kind s':>8s} {'RSS MB':>8s} {'Zeilen':>9s}")
+    for record in records():
+        label = '  ' * record['depth'] + record['stage']
+        if record['thread'] != 'MainThread':
+            label += f" [{record['thread']}]"
+        rows = '' if record['rows'] is None else str(record['rows'])
+        print(f"{label[:45]:45s} {record['wall_s']:8.3f} {record['cpu_s']:8.3f} "
+              f"{record['child_cpu_s']:8.3f} {record['max_rss_mb']:8.1f} {rows:>9s}")
+
+
+@contextmanager
+def trace_run(script):
+    """Gesamten Lauf als Stufe messen; danach Bericht und JSON-Trace"""
+    try:
+        with stage(script):
+            yield
+    finally:
+        if _enabled:
+            print_report()
+            print(f"\nTrace: {write_trace(script)}")
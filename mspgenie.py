@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+MSPGenie CLI
+Ein Einstiegspunkt für Inventur, Analyse, Vergleich und Abgleich
+
+    python mspgenie.py inventory [--no-profile | --full]
+    python mspgenie.py analyze
+    python mspgenie.py compare [--workbook PFAD] [--tolerance 0.1] [--no-cache]
+    python mspgenie.py reconcile [--data-dir data/Also] [--output-dir reports] [--no-cache]
+    python mspgenie.py cache [stats|clear]
+    python mspgenie.py vendor-usage [--vendor starface] [--output usage.parquet]
+    python mspgenie.py anomalies [--jump-ratio 3] [--window 3] [--output findings.csv]
+    python mspgenie.py writeback --workbook PFAD [--target corrections.sqlite] [--dry-run]
+
+Auf Modulebene wird nur die Standardbibliothek importiert; pandas,
+openpyxl und die Analysemodule lädt erst der jeweilige Unterbefehl.
+"--help" und "inventory --no-profile" starten damit ohne pandas. Alle
+Befehle nutzen die Snapshots der Access-Schicht (access_data) weiter.
+"""
+
+import argparse
+import sys
+
+from instrumentation import enable, is_enabled, trace_run
+from vendor_scanner import DATA_DIR
+
+
+def cmd_inventory(args):
+    """Vendor-Dateien auflisten (und profilieren)"""
+    from vendor_scanner import VENDORS, scan_vendors
+
+    report = None
+    if args.no_profile or args.full:
+        scan = scan_vendors(args.data_dir, VENDORS, profile=not args.no_profile)
+    else:
+        # Über das Manifest: nur neue oder geänderte Dateien werden profiliert
+        from vendor_manifest import scan_with_manifest
+        scan, report = scan_with_manifest(args.data_dir, VENDORS)
+
+    print("=== VENDOR FILE INVENTORY ===\n")
+    print(f"{'Vendor':<15} {'Dateien':>8} {'Größe MB':>10} {'Perioden':>9} {'Fehler':>7}")
+    print("-" * 53)
+    for vendor, files in scan.items():
+        size_mb = sum(f['size'] for f in files) / (1024 * 1024)
+        periods = len({f['period'] for f in files if f['period']})
+        errors = sum('error' in f for f in files)
+        print(f"{vendor:<15} {len(files):>8} {size_mb:>10.1f} {periods:>9} {errors:>7}")
+    print(f"\nDateien gesamt: {sum(len(files) for files in scan.values())}")
+    if report is not None:
+        print(f"Manifest: {len(report['added'])} neu, {len(report['changed'])} geändert, "
+              f"{len(report['removed'])} entfernt, {report['unchanged']} unverändert")
+    return scan
+
+
+def cmd_analyze(args):
+    """ALSO November 2024 Analyse (Max Usage je Kunde/Produkt)"""
+    from analyze_also_november_2024 import analyze_november_2024_also
+
+    return analyze_november_2024_also()
+
+
+def cmd_compare(args):
+    """Excel (Soll) vs Access (Ist) für ein Workbook"""
+    from compare_also_november_2024 import NOVEMBER_2024_WORKBOOK, main as compare_main
+    from reconciliation import DEFAULT_TOLERANCE
+
+    return compare_main(args.workbook or NOVEMBER_2024_WORKBOOK,
+                        DEFAULT_TOLERANCE if args.tolerance is None else args.tolerance,
+                        not args.no_cache)
+
+
+def cmd_reconcile(args):
+    """Alle Workbooks gegen tblUsage abgleichen"""
+    from also_excel import ALSO_DATA_DIR
+    from batch_reconcile import print_summary, run_batch, write_reports
+    from reconciliation import DEFAULT_TOLERANCE
+
+    tolerance = DEFAULT_TOLERANCE if args.tolerance is None else args.tolerance
+    customers, products = run_batch(args.data_dir or ALSO_DATA_DIR, tolerance, args.workers,
+                                   not args.no_cache)
+    print_summary(customers)
+    if args.output_dir:
+        write_reports(customers, products, args.output_dir, args.format)
+    return customers, products
+
+
+def cmd_cache(args):
+    """Result Cache anzeigen oder leeren"""
+    from result_cache import ResultCache, print_stats
+
+    with ResultCache() as cache:
+        if args.action == 'clear':
+            print(f"{cache.clear()} Einträge gelöscht.")
+        else:
+            print_stats(cache)
+
+
+def cmd_vendor_usage(args):
+    """Vendor-CSVs (Starface Cloud, Acronis, Altaro) streamend verdichten"""
+    from access_data import load_table
+    from reconciliation import write_diff
+    from vendor_usage import CSV_CHUNK_SIZE, VENDOR_CSV_LAYOUTS, ingest_vendor_usage, print_vendor_usage
+
+    customers_df = None if args.no_resolve else load_table('tblKunden')
+    usage, files = ingest_vendor_usage(args.data_dir, args.vendor or tuple(VENDOR_CSV_LAYOUTS),
+                                       args.chunksize or CSV_CHUNK_SIZE, customers_df)
+    print_vendor_usage(usage, files)
+    if args.output:
+        print(f"\nGeschrieben: {write_diff(usage, args.output)}")
+    return usage
+
+
+def cmd_anomalies(args):
+    """Anomalie-Scan über die gesamte Usage-Historie"""
+    from access_data import load_table, load_usage
+    from reconciliation import write_diff
+    from usage_anomalies import print_findings, scan_anomalies, usage_history
+
+    customers_df, products_df = load_table('tblKunden'), load_table('tblProduct')
+    vendor_usage = None
+    if args.vendor_dir:
+        from vendor_usage import ingest_vendor_usage
+
+        vendor_usage, _ = ingest_vendor_usage(args.vendor_dir, customers_df=customers_df)
+
+    history = usage_history(load_usage(productclass=args.productclass), customers_df, products_df,
+                            vendor_usage)
+    thresholds = {name: getattr(args, name) for name in
+                  ('jump_ratio', 'min_jump', 'window', 'min_drop_baseline') if getattr(args, name) is not None}
+    findings = scan_anomalies(history, **thresholds)
+    print_findings(findings, args.top)
+    if args.output:
+        print(f"\nGeschrieben: {write_diff(findings, args.output)}")
+    return findings
+
+
+def cmd_writeback(args):
+    """Korrekturen eines Workbooks nach tblUsage zurückschreiben"""
+    from access_data import ACCESS_DB
+    from reconciliation import DEFAULT_TOLERANCE
+    from usage_writeback import (
+        WRITEBACK_CHUNK_SIZE, init_sqlite_target, is_sqlite_target, print_writeback, writeback_workbook
+    )
+
+    target = args.target or ACCESS_DB
+    if args.init_sqlite:
+        if not is_sqlite_target(target):
+            raise SystemExit('--init-sqlite nur mit SQLite-Ziel (.sqlite/.db)')
+        init_sqlite_target(target)
+
+    tolerance = DEFAULT_TOLERANCE if args.tolerance is None else args.tolerance
+    result = writeback_workbook(args.workbook, target, tolerance,
+                                args.chunksize or WRITEBACK_CHUNK_SIZE, args.dry_run)
+    print_writeback(args.workbook, *result, args.dry_run)
+    return result
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='mspgenie', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--trace', action='store_true',
+                        help='Stufen messen und JSON-Trace schreiben (wie MSPGENIE_TRACE=1)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    inventory = commands.add_parser('inventory', help=cmd_inventory.__doc__)
+    inventory.add_argument('--data-dir', default=DATA_DIR)
+    inventory.add_argument('--no-profile', action='store_true',
+                           help='Nur auflisten, keine Dateien öffnen')
+    inventory.add_argument('--full', action='store_true',
+                           help='Alle Dateien neu profilieren statt über das Manifest')
+    inventory.set_defaults(func=cmd_inventory)
+
+    analyze = commands.add_parser('analyze', help=cmd_analyze.__doc__)
+    analyze.set_defaults(func=cmd_analyze)
+
+    compare = commands.add_parser('compare', help=cmd_compare.__doc__)
+    compare.add_argument('--workbook', help='Standard: November 2024 Workbook; Access-Monat laut Dateiname')
+    compare.add_argument('--tolerance', type=float, help='Standard: 0.1')
+    compare.add_argument('--no-cache', action='store_true', help='Abgleich neu berechnen')
+    compare.set_defaults(func=cmd_compare)
+
+    reconcile = commands.add_parser('reconcile', help=cmd_reconcile.__doc__)
+    reconcile.add_argument('--data-dir', help='Verzeichnis mit ALSO Workbooks (Standard: data/Also)')
+    reconcile.add_argument('--tolerance', type=float, help='Standard: 0.1')
+    reconcile.add_argument('--workers', type=int, default=None, help='Anzahl Worker-Prozesse')
+    reconcile.add_argument('--output-dir', default=None, help='Reports als CSV/Parquet hierhin schreiben')
+    reconcile.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    reconcile.add_argument('--no-cache', action='store_true', help='Alle Monate neu berechnen')
+    reconcile.set_defaults(func=cmd_reconcile)
+
+    cache = commands.add_parser('cache', help=cmd_cache.__doc__)
+    cache.add_argument('action', choices=['stats', 'clear'], nargs='?', default='stats')
+    cache.set_defaults(func=cmd_cache)
+
+    vendor_usage = commands.add_parser('vendor-usage', help=cmd_vendor_usage.__doc__)
+    vendor_usage.add_argument('--data-dir', default=DATA_DIR)
+    vendor_usage.add_argument('--vendor', action='append', choices=['starface', 'Acronis', 'Altaro'],
+                              help='Nur diesen Vendor (mehrfach möglich)')
+    vendor_usage.add_argument('--chunksize', type=int, help='Zeilen je Block (Standard: 100000)')
+    vendor_usage.add_argument('--no-resolve', action='store_true', help='Kunden nicht über tblKunden auflösen')
+    vendor_usage.add_argument('--output', help='Usage-Tabelle als .parquet/.feather/.csv schreiben')
+    vendor_usage.set_defaults(func=cmd_vendor_usage)
+
+    anomalies = commands.add_parser('anomalies', help=cmd_anomalies.__doc__)
+    anomalies.add_argument('--jump-ratio', type=float, help='Standard: 3.0')
+    anomalies.add_argument('--min-jump', type=float, help='Standard: 5')
+    anomalies.add_argument('--window', type=int, help='Vormonate im gleitenden Median (Standard: 3)')
+    anomalies.add_argument('--min-drop-baseline', type=float, help='Standard: 1')
+    anomalies.add_argument('--productclass', type=int, help='Nur diese IDProductclass')
+    anomalies.add_argument('--vendor-dir', help='Zusätzlich Vendor-CSVs aus diesem Verzeichnis')
+    anomalies.add_argument('--top', type=int, default=25)
+    anomalies.add_argument('--output', help='Fundliste als .parquet/.feather/.csv schreiben')
+    anomalies.set_defaults(func=cmd_anomalies)
+
+    writeback = commands.add_parser('writeback', help=cmd_writeback.__doc__)
+    writeback.add_argument('--workbook', required=True)
+    writeback.add_argument('--target', help='Access-Datenbank oder SQLite-Datei (Standard: MSPGENIE_ACCESS_DB)')
+    writeback.add_argument('--tolerance', type=float, help='Standard: 0.1')
+    writeback.add_argument('--chunksize', type=int, help='Zeilen je executemany (Standard: 1000)')
+    writeback.add_argument('--dry-run', action='store_true', help='Ausführen und zurückrollen')
+    writeback.add_argument('--init-sqlite', action='store_true',
+                           help='SQLite-Ziel vorher aus der Access-Datenbank anlegen')
+    writeback.set_defaults(func=cmd_writeback)
+
+    return parser
+
+
+def main(argv=None):
+    """Hauptfunktion"""
+    args = build_parser().parse_args(argv)
+    if args.trace and not is_enabled():
+        enable()
+    with trace_run(f"mspgenie-{args.command}"):
+        args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
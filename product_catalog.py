@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Product Catalog
+Indizierter Produktkatalog aus tblProduct für Excel <-> Access Joins
+
+Hash-Indizes über IDProduct, VendorReference (Microsoft Artikel-GUID),
+exakten Productname und einen normalisierten Namensschlüssel. Der Schlüssel
+ignoriert das "(NCE)"-Präfix (Pflichtenheft: ^\\(NCE\\)\\s+(.+)$), Groß-/
+Kleinschreibung und Satzzeichen, sodass Legacy- und NCE-Variante derselben
+SKU zusammenfallen. Gibt es in tblProduct beide Varianten, gewinnt die mit
+gleicher NCE-Kennung.
+
+tblProduct führt keine GUIDs; learn_references() übernimmt sie aus den
+Raw Charges (VendorReference je auflösbarem Produktnamen), bevor
+map_products() eine ganze Raw Charges Spalte auf einmal abbildet: jede
+(Name, GUID)-Kombination wird nur einmal nachgeschlagen.
+"""
+
+import re
+
+import pandas as pd
+
+from access_data import load_table
+
+MATCH_GUID = 'guid'
+MATCH_EXACT = 'exact'
+MATCH_NORMALIZED = 'normalized'
+
+NCE_PREFIX = re.compile(r'^\s*\(nce\)\s*', re.IGNORECASE)
+NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def is_nce(names):
+    """True für Produktnamen mit "(NCE)"-Präfix (vektorisiert)"""
+    return names.astype('string').str.contains(NCE_PREFIX).fillna(False).astype(bool)
+
+
+def normalize_product_names(names):
+    """Normalisierter Produktschlüssel ohne NCE-Präfix (vektorisiert über eine Series)"""
+    key = names.astype('string').str.replace(NCE_PREFIX, '', regex=True).str.casefold()
+    key = key.str.replace(NON_ALNUM, ' ', regex=True)
+    return key.str.split().str.join(' ')
+
+
+class ProductCatalog:
+    """Hash-indizierter Produktkatalog über tblProduct"""
+
+    def __init__(self, products_df, references=None):
+        products = products_df.drop_duplicates('IDProduct')
+        ids = products['IDProduct']
+        self.names = products.set_index('IDProduct')['Productname'].astype(object)
+
+        self.by_name = {}
+        for name, product_id in zip(products['Productname'], ids):
+            if pd.notna(name):
+                self.by_name.setdefault(name, product_id)
+
+        # Schlüssel -> [(IDProduct, nce)], Legacy und NCE derselben SKU in einer Liste
+        self.by_key = {}
+        keys = normalize_product_names(products['Productname'])
+        for key, product_id, nce in zip(keys, ids, is_nce(products['Productname'])):
+            if pd.notna(key) and key:
+                self.by_key.setdefault(key, []).append((product_id, nce))
+
+        self.by_guid = {}
+        if 'VendorReference' in products:
+            self.add_references(dict(zip(products['VendorReference'], ids)))
+        if references:
+            self.add_references(references)
+
+    @classmethod
+    def from_access(cls, **kwargs):
+        """Katalog aus tblProduct der Access-Datenbank"""
+        return cls(load_table('tblProduct'), **kwargs)
+
+    def add_references(self, references):
+        """VendorReference-GUIDs (GUID -> IDProduct) aufnehmen"""
+        for guid, product_id in references.items():
+            if pd.notna(guid) and guid and pd.notna(product_id):
+                self.by_guid[str(guid).lower()] = product_id
+
+    def _by_name(self, name, key, nce):
+        """Exakter Name, sonst normalisierter Schlüssel (gleiche NCE-Kennung bevorzugt)"""
+        if name in self.by_name:
+            return self.by_name[name], MATCH_EXACT
+        candidates = self.by_key.get(key) if pd.notna(key) else None
+        if not candidates:
+            return None, None
+        for product_id, candidate_nce in candidates:
+            if candidate_nce == nce:
+                return product_id, MATCH_NORMALIZED
+        return candidates[0][0], MATCH_NORMALIZED
+
+    def map_products(self, names, references=None):
+        """Raw Charges Produktnamen (und optional VendorReference) auf tblProduct abbilden
+
+        Liefert (Index wie die Eingabe) IDProduct (Int32, <NA> falls
+        unbekannt), Productname, match (guid/exact/normalized) und nce.
+        """
+        pairs = pd.DataFrame({
+            'name': names.astype(object),
+            'guid': references.astype(object) if references is not None else None,
+        }, index=names.index)
+        codes = pairs.groupby(['name', 'guid'], sort=False, dropna=False).ngroup().to_numpy()
+        uniques = pairs.drop_duplicates()
+
+        keys = normalize_product_names(uniques['name']).to_numpy()
+        nce = is_nce(uniques['name']).to_numpy()
+
+        resolved_ids, matches = [], []
+        for name, guid, key, name_nce in zip(uniques['name'], uniques['guid'], keys, nce):
+            guid = str(guid).lower() if pd.notna(guid) else None
+            if guid in self.by_guid:
+                product_id, match = self.by_guid[guid], MATCH_GUID
+            elif pd.notna(name):
+                product_id, match = self._by_name(name, key, name_nce)
+            else:
+                product_id, match = None, None
+            resolved_ids.append(product_id)
+            matches.append(match)
+
+        product_ids = pd.array(pd.Series(resolved_ids, dtype=object).to_numpy()[codes], dtype='Int32')
+        return pd.DataFrame({
+            'IDProduct': product_ids,
+            'Productname': pd.Series(product_ids).map(self.names).to_numpy(),
+            'match': pd.Series(matches, dtype=object).to_numpy()[codes],
+            'nce': nce[codes],
+        }, index=names.index)
+
+    def learn_references(self, names, references):
+        """GUIDs aus Raw Charges übernehmen, deren Produktname auflösbar ist
+
+        Danach werden umbenannte Produkte mit bekannter GUID direkt gefunden.
+        Liefert die Anzahl neu gelernter GUIDs.
+        """
+        pairs = pd.DataFrame({'name': names.astype(object), 'guid': references.astype(object)})
+        pairs = pairs.dropna().drop_duplicates()
+        mapped = self.map_products(pairs['name'])
+
+        learned = {}
+        for guid, product_id in zip(pairs['guid'], mapped['IDProduct']):
+            if pd.notna(product_id) and str(guid).lower() not in self.by_guid:
+                learned.setdefault(str(guid).lower(), int(product_id))
+        self.add_references(learned)
+        return len(learned)
+
+    def names_for_ids(self, product_ids):
+        """Productname je IDProduct, Fallback 'Product-{id}'"""
+        return product_ids.map(self.names).fillna('Product-' + product_ids.astype(str))
+
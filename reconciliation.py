@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Reconciliation Engine
+Mengenbasierter Abgleich Excel (Soll) vs Access tblUsage (Ist)
+
+Statt pro Kunde beide Tabellen erneut zu filtern, werden beide Seiten einmal
+auf (Kunde[, Produkt]) aggregiert und per Full Outer Merge verglichen. Das
+Ergebnis ist eine typisierte Differenztabelle, die direkt auf Platte
+geschrieben werden kann. Über `by` (z.B. Jahr/Monat) lassen sich beliebig
+viele Abrechnungsmonate in einem Durchlauf abgleichen.
+"""
+
+from pathlib import Path
+
+import pandas as pd
+
+from schemas import share_categories
+
+DEFAULT_TOLERANCE = 0.1
+
+MISSING_IN_ACCESS = 'MISSING_IN_ACCESS'
+MISSING_IN_EXCEL = 'MISSING_IN_EXCEL'
+QUANTITY_MISMATCH = 'QUANTITY_MISMATCH'
+MATCH = 'MATCH'
+
+DIFF_TYPES = pd.CategoricalDtype(
+    [MISSING_IN_ACCESS, MISSING_IN_EXCEL, QUANTITY_MISMATCH, MATCH]
+)
+
+
+def _aggregate(df, keys, names, value, prefix):
+    """Summe und Zeilenanzahl je Schlüssel"""
+    agg = df.groupby(list(keys), sort=False, observed=True).agg(**{
+        f'{prefix}_total': (value, 'sum'),
+        f'{prefix}_rows': (value, 'size'),
+    })
+    agg.index.names = names
+    return agg.reset_index()
+
+
+def _reconcile(excel_data, access_data, excel_keys, access_keys, names,
+               excel_value, access_value, tolerance, keep_matches):
+    """Full Outer Merge beider Seiten auf den gemeinsamen Schlüsseln"""
+    # Categorical-Schlüssel beider Seiten auf ein Dictionary: Merge über Codes
+    excel_data, access_data = excel_data.copy(deep=False), access_data.copy(deep=False)
+    for excel_key, access_key in zip(excel_keys, access_keys):
+        if (isinstance(excel_data[excel_key].dtype, pd.CategoricalDtype)
+                and isinstance(access_data[access_key].dtype, pd.CategoricalDtype)):
+            excel_data[excel_key], access_data[access_key] = share_categories(
+                excel_data[excel_key], access_data[access_key])
+
+    excel = _aggregate(excel_data, excel_keys, names, excel_value, 'excel')
+    access = _aggregate(access_data, access_keys, names, access_value, 'access')
+
+    merged = excel.merge(access, on=names, how='outer', indicator=True)
+
+    # Fehlende Seite mit 0 auffüllen, Ausgangs-Dtypes beibehalten
+    for column, source in (('excel_total', excel), ('access_total', access),
+                           ('excel_rows', excel), ('access_rows', access)):
+        merged[column] = merged[column].fillna(0).astype(source[column].dtype)
+
+    merged['difference'] = merged['excel_total'] - merged['access_total']
+
+    side = merged.pop('_merge')
+    diff_type = pd.Series(MATCH, index=merged.index)
+    diff_type[side == 'left_only'] = MISSING_IN_ACCESS
+    diff_type[side == 'right_only'] = MISSING_IN_EXCEL
+    diff_type[(side == 'both') & (merged['difference'].abs() > tolerance)] = QUANTITY_MISMATCH
+    merged['diff_type'] = diff_type.astype(DIFF_TYPES)
+
+    if not keep_matches:
+        merged = merged[merged['diff_type'] != MATCH]
+    return merged.reset_index(drop=True)
+
+
+def reconcile_customers(excel_data, access_data, excel_customer='Company',
+                        access_customer='KundenName', excel_value='Quantity',
+                        access_value='Usage', by=(), tolerance=DEFAULT_TOLERANCE,
+                        keep_matches=False):
+    """Abgleich auf Kundenebene
+
+    Liefert je Kunde (und je `by`-Spalte) excel_total, access_total,
+    difference, excel_rows, access_rows und diff_type.
+    """
+    by = list(by)
+    return _reconcile(
+        excel_data, access_data,
+        by + [excel_customer], by + [access_customer], by + ['customer'],
+        excel_value, access_value, tolerance, keep_matches
+    )
+
+
+def reconcile_products(excel_data, access_data, excel_customer='Company',
+                       excel_product='Product name', access_customer='KundenName',
+                       access_product='Productname', excel_value='Quantity',
+                       access_value='Usage', by=(), tolerance=DEFAULT_TOLERANCE,
+                       keep_matches=False):
+    """Abgleich auf Kunden- und Produktebene"""
+    by = list(by)
+    return _reconcile(
+        excel_data, access_data,
+        by + [excel_customer, excel_product], by + [access_customer, access_product],
+        by + ['customer', 'product'],
+        excel_value, access_value, tolerance, keep_matches
+    )
+
+
+def write_diff(diff, path):
+    """Differenztabelle schreiben (.parquet, .feather oder CSV)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == '.parquet':
+        diff.to_parquet(path, index=False)
+    elif path.suffix == '.feather':
+        diff.reset_index(drop=True).to_feather(path)
+    else:
+        diff.to_csv(path, index=False)
+    return path
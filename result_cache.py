@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Result Cache
+Zwischenspeicher für Abgleichsergebnisse je Monat, adressiert über
+Fingerprints der Eingaben
+
+Schlüssel = Hash aus Workbook-Inhalt (SHA-256), tblUsage-Ausschnitt des
+Monats, tblProduct/tblKunden-Stand und Parametern (z.B. Toleranz). Ändert
+sich nach einer Korrektur in Access nur ein Monat, ändert sich nur dessen
+Schlüssel; alle anderen Monate werden direkt aus dem Cache bedient.
+
+Ergebnisse liegen als Pickle unter <CACHE_DIR>/results/, der Index
+(Größe, letzter Zugriff, Treffer) in SQLite. Überschreitet der Cache
+MSPGENIE_RESULT_CACHE_MB (Standard 256), werden die am längsten nicht
+genutzten Einträge entfernt (LRU).
+
+    python result_cache.py stats
+    python result_cache.py clear
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+
+from access_data import CACHE_DIR
+from vendor_manifest import file_hash
+
+RESULTS_DIR = CACHE_DIR / 'results'
+MAX_CACHE_BYTES = int(os.environ.get('MSPGENIE_RESULT_CACHE_MB', 256)) * 2**20
+
+# Bei Änderungen an der Abgleichslogik erhöhen: alte Ergebnisse werden ungültig
+RESULT_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    label TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS counters (
+    kind TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_entries_lru ON entries (last_access);
+"""
+
+
+def fingerprint(*parts):
+    """Stabiler Hash aus beliebigen (repr-baren) Bestandteilen"""
+    digest = hashlib.sha256(f"v{RESULT_VERSION}".encode())
+    for part in parts:
+        digest.update(b'\x00')
+        digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+
+def frame_fingerprint(df):
+    """Inhalts-Hash eines DataFrames (Spalten, Dtypes und Werte, ohne Index)"""
+    digest = hashlib.sha256(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+_file_hashes = {}
+
+
+def file_fingerprint(path):
+    """Inhalts-Hash einer Datei (pro Prozess anhand mtime/Größe gemerkt)"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if memo_key not in _file_hashes:
+        _file_hashes[memo_key] = file_hash(path)
+    return _file_hashes[memo_key]
+
+
+class ResultCache:
+    """Größenbegrenzter LRU-Cache für Ergebnisse (Pickle + SQLite-Index)"""
+
+    def __init__(self, directory=RESULTS_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, 'index.sqlite'))
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _count(self, kind, column):
+        self.conn.execute("INSERT OR IGNORE INTO counters (kind) VALUES (?)", (kind,))
+        self.conn.execute(f"UPDATE counters SET {column} = {column} + 1 WHERE kind = ?", (kind,))
+
+    def get(self, kind, key):
+        """(True, Ergebnis) bei Treffer, sonst (False, None)"""
+        row = self.conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+        value, hit = None, False
+        if row is not None:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    value, hit = pickle.load(f), True
+            except (OSError, pickle.UnpicklingError, EOFError):
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+        with self.conn:
+            if hit:
+                self.conn.execute("UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                                  (time.time(), key))
+            self._count(kind, 'hits' if hit else 'misses')
+        return hit, value
+
+    def put(self, kind, key, value, label=None):
+        """Ergebnis ablegen und danach auf max_bytes zurückschneiden"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, self._path(key))
+
+        now = time.time()
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, 0)",
+                              (key, kind, label, size, now, now))
+        self.evict()
+
+    def get_or_compute(self, kind, key, compute, label=None):
+        """Ergebnis aus dem Cache oder compute() ausführen und ablegen"""
+        hit, value = self.get(kind, key)
+        if not hit:
+            value = compute()
+            self.put(kind, key, value, label)
+        return value
+
+    def evict(self):
+        """Am längsten nicht genutzte Einträge entfernen, bis max_bytes eingehalten ist"""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        evicted = []
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append(key)
+            total -= size
+        with self.conn:
+            self.conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in evicted])
+        for key in evicted:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        return len(evicted)
+
+    def clear(self):
+        """Alle Einträge und Zähler löschen"""
+        keys = [row[0] for row in self.conn.execute("SELECT key FROM entries")]
+        with self.conn:
+            self.conn.execute("DELETE FROM entries")
+            self.conn.execute("DELETE FROM counters")
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        return len(keys)
+
+    def stats(self):
+        """Treffer, Fehlschläge, Trefferquote, Einträge und Größe je Ergebnisart"""
+        counters = pd.read_sql_query("SELECT kind, hits, misses FROM counters", self.conn)
+        entries = pd.read_sql_query(
+            "SELECT kind, COUNT(*) AS entries, SUM(size) AS size FROM entries GROUP BY kind", self.conn)
+        stats = counters.merge(entries, on='kind', how='outer').fillna(0)
+        for column in ('hits', 'misses', 'entries', 'size'):
+            stats[column] = stats[column].astype('int64')
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] / lookups.where(lookups > 0)).fillna(0.0)
+        stats['size_mb'] = stats['size'] / 2**20
+        return stats.drop(columns='size').set_index('kind').sort_index()
+
+
+def print_stats(cache):
+    """Cache-Statistik ausgeben"""
+    stats = cache.stats()
+    print("=== RESULT CACHE ===\n")
+    if stats.empty:
+        print("Cache ist leer.")
+        return stats
+
+    print(stats.to_string(formatters={'hit_rate': '{:.1%}'.format, 'size_mb': '{:.2f}'.format}))
+    hits, misses = stats['hits'].sum(), stats['misses'].sum()
+    total_rate = hits / (hits + misses) if hits + misses else 0.0
+    print(f"\nGesamt: {hits} Treffer, {misses} Fehlschläge, Trefferquote {total_rate:.1%}")
+    print(f"Belegt: {stats['size_mb'].sum():.2f} MB von {cache.max_bytes / 2**20:.0f} MB")
+    return stats
+
+
+def main():
+    """Hauptfunktion"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=['stats', 'clear'], nargs='?', default='stats')
+    args = parser.parse_args()
+
+    with ResultCache() as cache:
+        if args.command == 'clear':
+            print(f"{cache.clear()} Einträge gelöscht.")
+        else:
+            print_stats(cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+P1Y Prepaid Revenue Recognition
+Vektorisierte Umsatzabgrenzung der ALSO Raw Charges anhand der Interval-Spalte
+
+Das Interval-Feld (DD.MM.YYYY - DD.MM.YYYY) wird in einem Schritt nach
+datetime64 geparst. Anhand der Laufzeit (und des Commitments aus den
+Attributes) wird jede Zeile als P1M, P1Y-monatlich oder P1Y-Vorauszahlung
+klassifiziert. Vorauszahlungen werden auf ihre Laufzeit (12 Monate)
+verteilt; die Expansion Zeile -> Leistungsmonate erfolgt per np.repeat
+ohne Python-Schleife pro Zeile. Negative Mengen (Stornierungen) werden
+genauso verteilt und mindern die Folgemonate.
+"""
+
+import argparse
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from also_attributes import parse_attributes
+from also_excel import ALSO_DATA_DIR, find_workbooks, read_raw_charges
+
+P1M = 'P1M'
+P1Y_MONTHLY = 'P1Y_Monthly'
+P1Y_PREPAID = 'P1Y_Prepaid'
+
+BILLING_CLASSES = pd.CategoricalDtype([P1M, P1Y_MONTHLY, P1Y_PREPAID])
+
+# Pflichtenheft: Vorauszahlung = Zeitraum 365/366 Tage, monatlich < 31 Tage
+PREPAID_MIN_DAYS = 360
+
+INTERVAL_PATTERN = re.compile(
+    r'(?P<start>\d{1,2}\.\d{1,2}\.\d{4})\s*-\s*(?P<end>\d{1,2}\.\d{1,2}\.\d{4})'
+)
+
+KEY_COLUMNS = ['Company', 'Product name', 'VendorReference']
+
+
+def parse_intervals(intervals):
+    """Interval-Spalte nach start/end (datetime64) und span_days zerlegen"""
+    codes, uniques = pd.factorize(intervals)
+    parts = pd.Series(uniques, dtype='string').str.extract(INTERVAL_PATTERN)
+    start = pd.to_datetime(parts['start'], format='%d.%m.%Y', errors='coerce').to_numpy()
+    end = pd.to_datetime(parts['end'], format='%d.%m.%Y', errors='coerce').to_numpy()
+
+    # Fehlende Intervalle (Code -1) zeigen auf den angehängten NaT-Wert
+    start = np.append(start, np.datetime64('NaT'))[codes]
+    end = np.append(end, np.datetime64('NaT'))[codes]
+
+    return pd.DataFrame({
+        'start': start,
+        'end': end,
+        'span_days': (end - start) / np.timedelta64(1, 'D'),
+    }, index=intervals.index)
+
+
+def classify_lines(span_days, commitment):
+    """P1M / P1Y-monatlich / P1Y-Vorauszahlung anhand Laufzeit und Commitment"""
+    prepaid = np.asarray(span_days >= PREPAID_MIN_DAYS)
+    yearly = np.asarray(commitment == 'P1Y')
+    codes = np.select([prepaid, yearly], [2, 1], default=0)
+    return pd.Categorical.from_codes(codes, dtype=BILLING_CLASSES)
+
+
+def _month_index(dates):
+    """datetime64 -> fortlaufender Monatsindex (Jahr * 12 + Monat - 1)"""
+    months = dates.astype('datetime64[M]').astype(np.int64)
+    return months + 1970 * 12
+
+
+def build_schedule(charges):
+    """Raw Charges in einen Leistungsmonats-Plan expandieren
+
+    Erwartet Interval, Attributes und Charge; Jahr/Monat (Abrechnungsmonat
+    des Workbooks) sowie Company, Product name und VendorReference werden
+    übernommen, falls vorhanden. Liefert eine Zeile je (Charge-Zeile,
+    Leistungsmonat) mit quantity und recognized_charge.
+    """
+    intervals = parse_intervals(charges['Interval'])
+    attributes = parse_attributes(charges['Attributes'])
+    billing_class = classify_lines(intervals['span_days'].to_numpy(), attributes['commitment'].to_numpy())
+
+    start = intervals['start'].to_numpy()
+    end = intervals['end'].to_numpy()
+    valid = ~np.isnat(start)
+    start_month = np.where(valid, _month_index(start), 0)
+
+    if 'Jahr' in charges and 'Monat' in charges:
+        billed_month = charges['Jahr'].to_numpy(np.int64) * 12 + charges['Monat'].to_numpy(np.int64) - 1
+    elif valid.all():
+        billed_month = start_month
+    else:
+        # Ohne Interval und Abrechnungsmonat gibt es keinen Leistungsmonat (sonst Jahr 0)
+        raise ValueError(f"{(~valid).sum()} Zeilen ohne Interval und ohne Jahr/Monat")
+    first_month = np.where(valid, start_month, billed_month)
+
+    # Vorauszahlungen über die volle Laufzeit verteilen, alles andere im Startmonat.
+    # Das Enddatum ist inklusiv: 01.12.2024 - 30.11.2025 endet vor dem 01.12.2025 = 12 Monate
+    prepaid = np.asarray(billing_class == P1Y_PREPAID)
+    term_end = np.where(valid, end, start) + np.timedelta64(1, 'D')
+    term = np.where(valid, _month_index(term_end) - start_month, 1)
+    n_months = np.where(prepaid, np.maximum(term, 1), 1)
+
+    rows = np.repeat(np.arange(len(charges)), n_months)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(n_months) - n_months, n_months)
+    service_month = first_month[rows] + offsets
+
+    # Auf Cent runden; der letzte Monat trägt die Rundungsdifferenz
+    charge = charges['Charge'].to_numpy(np.float64)
+    per_month = np.round(charge / n_months, 2)
+    last = offsets == n_months[rows] - 1
+    recognized = np.where(last, charge[rows] - per_month[rows] * (n_months[rows] - 1), per_month[rows])
+
+    schedule = {'line': charges.index.to_numpy()[rows]}
+    for column in KEY_COLUMNS:
+        if column in charges:
+            schedule[column] = charges[column].to_numpy()[rows]
+    schedule.update({
+        'billing_class': billing_class[rows],
+        'billed_jahr': billed_month[rows] // 12,
+        'billed_monat': billed_month[rows] % 12 + 1,
+        'Jahr': service_month // 12,
+        'Monat': service_month % 12 + 1,
+        'quantity': attributes['Quantity'].to_numpy()[rows],
+        'recognized_charge': recognized,
+    })
+    return pd.DataFrame(schedule)
+
+
+def summarize_schedule(schedule):
+    """Pro Monat: abgerechnet, realisiert und passiver Abgrenzungsposten"""
+    billed = schedule.groupby(['billed_jahr', 'billed_monat'])['recognized_charge'].sum()
+    billed.index.names = ['Jahr', 'Monat']
+    recognized = schedule.groupby(['Jahr', 'Monat'])['recognized_charge'].sum()
+    prepaid = schedule[schedule['billing_class'] == P1Y_PREPAID].groupby(['Jahr', 'Monat'])['recognized_charge'].sum()
+
+    summary = pd.DataFrame({'billed': billed, 'recognized': recognized, 'prepaid_recognized': prepaid})
+    summary = summary.fillna(0.0).sort_index()
+    summary['deferred_balance'] = (summary['billed'] - summary['recognized']).cumsum().round(2)
+    return summary
+
+
+def _read_workbook(item):
+    """Raw Charges eines Workbooks mit Abrechnungsmonat (läuft im Worker)"""
+    jahr, monat, path = item
+    return read_raw_charges(path).assign(Jahr=jahr, Monat=monat)
+
+
+def load_all_charges(base_path=ALSO_DATA_DIR, workers=None):
+    """Raw Charges aller ALSO Workbooks (parallel geparst) in einem Frame"""
+    workbooks = find_workbooks(base_path)
+    if not workbooks:
+        return pd.DataFrame(columns=['Interval', 'Attributes', 'Charge', 'Jahr', 'Monat'])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        frames = list(pool.map(_read_workbook, workbooks))
+    return pd.concat(frames, ignore_index=True)
+
+
+def recognize_workbooks(base_path=ALSO_DATA_DIR, workers=None):
+    """Alle Workbooks seit 2020 in einem Aufruf abgrenzen: (schedule, summary)"""
+    schedule = build_schedule(load_all_charges(base_path, workers))
+    return schedule, summarize_schedule(schedule)
+
+
+def main():
+    """Hauptfunktion"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default=ALSO_DATA_DIR)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    schedule, summary = recognize_workbooks(args.data_dir, args.workers)
+
+    print("=== P1Y PREPAID REVENUE RECOGNITION ===\n")
+    lines = schedule.drop_duplicates('line')
+    print("Zeilen je Abrechnungsart:")
+    print(lines['billing_class'].value_counts().to_string())
+    print(f"\nStornierungen (negative Mengen): {(lines['quantity'] < 0).sum()}")
+    print("\nMonatsübersicht:")
+    print(summary.to_string(float_format=lambda x: f"{x:10.2f}"))
+
+    return schedule, summary
+
+
+if __name__ == "__main__":
+    main()
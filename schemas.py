@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Frame Schemas
+Deklarierte, kompakte Dtypes für Access-Tabellen und ALSO Raw Charges
+
+- IDs als int32 (Int32, falls fehlende Werte vorkommen)
+- Jahr/Monat als int16/int8
+- Kunden-, Produkt- und Textspalten als Categorical: jeder Name liegt einmal
+  im Dictionary, die Zeilen tragen nur Codes; Merges übernehmen die Codes
+- Geldbeträge als Decimal (pyarrow decimal128) statt float64
+
+Die Schemas werden beim Laden angewendet (access_data, also_excel,
+vendor_usage);
+Snapshots speichern bereits die kompakten Typen.
+"""
+
+import pandas as pd
+import pyarrow as pa
+from pandas.api.types import union_categoricals
+
+# Bei Änderungen erhöhen: alte Snapshots werden dann nicht mehr verwendet
+SCHEMA_VERSION = 1
+
+MONEY = pd.ArrowDtype(pa.decimal128(18, 4))
+MONEY_SCALE = 4
+
+ACCESS_SCHEMAS = {
+    'tblUsage': {
+        'IDUsage': 'int32',
+        'IDKunden': 'int32',
+        'IDProduct': 'int32',
+        'Jahr': 'int16',
+        'Monat': 'int8',
+        'Usage': 'float64',
+        'Detail': 'category',
+    },
+    'tblProduct': {
+        'IDProduct': 'int32',
+        'Productname': 'category',
+        'IDProductclass': 'int16',
+    },
+    'tblKunden': {
+        'IDKunden': 'int32',
+        'KundenName': 'category',
+        'IDAlso': 'category',
+    },
+}
+
+RAW_CHARGES_SCHEMA = {
+    'Reseller': 'category',
+    'Company': 'category',
+    'Department': 'category',
+    'Product name': 'category',
+    'Vendor': 'category',
+    'VendorReference': 'category',
+    'Attributes': 'category',
+    'Account': 'category',
+    'BillingStartDate': 'category',
+    'Priceable item': 'category',
+    'Charge': MONEY,
+    'Interval': 'category',
+    'Contract Id': 'Int64',
+    'SecondVendorReference': 'category',
+}
+
+# Normalisierte Vendor-Usage (vendor_usage), vergleichbar mit tblUsage
+VENDOR_USAGE_SCHEMA = {
+    'vendor': 'category',
+    'customer': 'category',
+    'IDKunden': 'Int32',
+    'product': 'category',
+    'Jahr': 'int16',
+    'Monat': 'int8',
+    'Usage': 'float64',
+    'rows': 'int64',
+}
+
+
+def to_money(values):
+    """Beträge (float/str) exakt auf MONEY_SCALE Stellen als Decimal"""
+    numeric = pd.to_numeric(pd.Series(values), errors='coerce')
+    return numeric.round(MONEY_SCALE).astype(MONEY)
+
+
+def _cast(series, dtype):
+    """Eine Spalte in den deklarierten Dtype überführen"""
+    if dtype == MONEY:
+        return to_money(series)
+    if dtype == 'category':
+        return series.astype('category')
+    if isinstance(dtype, str) and dtype.startswith('int'):
+        # Fehlende Werte: nullable Variante (Int32 statt int32)
+        if series.isna().any():
+            return pd.to_numeric(series, errors='coerce').astype(dtype.capitalize())
+        return series.astype(dtype)
+    if isinstance(dtype, str) and dtype.startswith('Int'):
+        return pd.to_numeric(series, errors='coerce').round().astype(dtype)
+    return series.astype(dtype)
+
+
+def apply_schema(df, schema):
+    """Deklarierte Dtypes auf vorhandene Spalten anwenden (andere bleiben unverändert)"""
+    if not schema:
+        return df
+    casts = {
+        column: _cast(df[column], dtype)
+        for column, dtype in schema.items()
+        if column in df and df[column].dtype != dtype
+    }
+    return df.assign(**casts) if casts else df
+
+
+def share_categories(*series):
+    """Categoricals auf ein gemeinsames (sortiertes) Dictionary umstellen
+
+    Gleiche Kategorien auf beiden Seiten lassen Merges und Vergleiche auf
+    den Integer-Codes laufen statt auf Strings.
+    """
+    categoricals = [s.astype('category') for s in series]
+    categories = union_categoricals(
+        [s.cat.remove_unused_categories().values for s in categoricals],
+        sort_categories=True, ignore_order=True
+    ).categories
+    return [s.cat.set_categories(categories) for s in categoricals]
+
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Synthetic ALSO Test Data
+Erzeugt realistische Raw Charges Workbooks und tblUsage/tblProduct/tblKunden
+CSV-Fixtures in konfigurierbarer Größe (ohne echte Kundendaten)
+
+Ausgabe:
+    <out>/access/tblKunden.csv, tblProduct.csv, tblUsage.csv  (mdb-export-Format)
+    <out>/Also/MB_NETWORKS_GmbH_MM-YYYY.xlsx                   (ab 2023)
+    <out>/Also/finish/MB_NETWORKS_GmbH_(MM.YYYY).xlsx          (2020-2022)
+
+Das access/-Verzeichnis kann direkt als Access-Quelle verwendet werden
+(MSPGENIE_ACCESS_DB=<out>/access).
+"""
+
+import argparse
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from access_data import ALSO_PRODUCTCLASS
+
+PRODUCT_NAMES = [
+    'Microsoft 365 Business Standard', 'Microsoft 365 Business Basic',
+    'Microsoft 365 Business Premium', 'Microsoft 365 Apps for business',
+    'Exchange Online (Plan 1)', 'Exchange Online (Plan 2)', 'Office 365 E1',
+    'Office 365 E3', 'Microsoft Teams Essentials', 'Microsoft Defender for Office 365 (Plan 1)',
+    'Teams EEA', 'Adobe Acrobat Pro DC',
+]
+
+BILLING_TYPES = [
+    ('Billing Type=Monthly (with 1-month commitment) - P1M', 'P1M'),
+    ('Billing Type=Monthly (with 1-year commitment) - P1Y', 'P1Y_Monthly'),
+    ('Billing Type=Prepaid (with 1-year commitment) - P1Y', 'P1Y_Prepaid'),
+]
+
+RAW_CHARGES_HEADER = [
+    'Reseller', 'Company', 'Department', 'Product name', 'Vendor', 'VendorReference',
+    'Attributes', 'Account', 'BillingStartDate', 'Priceable item', 'Charge', 'Interval',
+    'Contract Id', 'SecondVendorReference',
+]
+
+# Weitere Produktklassen, damit der ALSO-Filter etwas zu tun hat
+OTHER_PRODUCTCLASSES = [1, 3, 4]
+
+
+def make_customers(n_customers, rng):
+    """tblKunden: IDAlso entspricht meist dem Company-Namen in Excel"""
+    ids = np.arange(1, n_customers + 1)
+    names = [f"Kunde {i:05d} GmbH" for i in ids]
+    also_ids = pd.Series(names, dtype=object)
+    also_ids[rng.random(n_customers) < 0.1] = None  # nicht jeder Kunde ist ALSO-Kunde
+    return pd.DataFrame({'IDKunden': ids, 'KundenName': names, 'IDAlso': also_ids})
+
+
+def make_products(n_products, rng):
+    """tblProduct: ~3/4 ALSO-Produkte (teilweise mit (NCE)-Präfix)"""
+    ids = np.arange(1, n_products + 1)
+    names = []
+    for i in ids:
+        base = PRODUCT_NAMES[(i - 1) % len(PRODUCT_NAMES)]
+        variant = (i - 1) // len(PRODUCT_NAMES)
+        name = base if variant == 0 else f"{base} v{variant}"
+        names.append(f"(NCE) {name}" if i % 2 else name)
+    productclass = np.where(rng.random(n_products) < 0.75, ALSO_PRODUCTCLASS,
+                            rng.choice(OTHER_PRODUCTCLASSES, n_products))
+    return pd.DataFrame({
+        'IDProduct': ids,
+        'Productname': names,
+        'IDProductclass': productclass,
+        'VendorReference': [str(uuid.UUID(int=int(rng.integers(0, 2**63)) << 64 | int(i))) for i in ids],
+    })
+
+
+def make_usage(customers, products, periods, lines_per_customer, rng):
+    """tblUsage: mehrere Einträge je Kunde/Produkt/Monat (Details), Usage meist ganzzahlig"""
+    n_customers = len(customers)
+    rows_per_period = n_customers * lines_per_customer
+    frames = []
+    for jahr, monat in periods:
+        usage = rng.integers(1, 25, rows_per_period).astype(np.float64)
+        usage[rng.random(rows_per_period) < 0.02] += 0.5  # vereinzelt gebrochene Werte
+        frames.append(pd.DataFrame({
+            'IDKunden': np.repeat(customers['IDKunden'].to_numpy(), lines_per_customer),
+            'IDProduct': rng.choice(products['IDProduct'].to_numpy(), rows_per_period),
+            'Jahr': jahr,
+            'Monat': monat,
+            'Usage': usage,
+            'Detail': rng.choice(['', 'P1M', 'P1Y', 'P1Y Prepaid'], rows_per_period),
+        }))
+    usage = pd.concat(frames, ignore_index=True)
+    usage.insert(0, 'IDUsage', np.arange(1, len(usage) + 1))
+    return usage
+
+
+def make_raw_charges(customers, products, jahr, monat, lines_per_customer,
+                     prepaid_share, negative_share, rng):
+    """Raw Charges Sheet eines Monats (14 Spalten wie im Pflichtenheft)"""
+    also_products = products[products['IDProductclass'] == ALSO_PRODUCTCLASS]
+    # Excel-Seite kennt ein paar Kunden, die in Access fehlen (und umgekehrt)
+    companies = pd.concat([
+        customers['KundenName'].sample(frac=0.95, random_state=int(rng.integers(1 << 31))),
+        pd.Series([f"Neukunde {i:03d} GmbH" for i in range(max(1, len(customers) // 50))]),
+    ], ignore_index=True)
+
+    n = len(companies) * lines_per_customer
+    company = np.repeat(companies.to_numpy(), lines_per_customer)
+    product_idx = rng.integers(0, len(also_products), n)
+
+    billing = rng.choice([0, 1], n, p=[0.2, 0.8])
+    billing[rng.random(n) < prepaid_share] = 2
+    quantity = rng.integers(1, 30, n)
+    negative = (billing == 2) & (rng.random(n) < negative_share)
+    quantity[negative] *= -1
+
+    start = pd.Timestamp(year=jahr, month=monat, day=1)
+    start_day = rng.integers(0, 27, n)
+    starts = start + pd.to_timedelta(start_day, unit='D')
+    ends = np.where(billing == 2, starts + pd.DateOffset(years=1),
+                    starts + pd.to_timedelta(rng.integers(1, 5, n), unit='D'))
+    interval = [f"{s:%d.%m.%Y} - {pd.Timestamp(e):%d.%m.%Y}" for s, e in zip(starts, ends)]
+
+    prefixes = np.array([prefix for prefix, _ in BILLING_TYPES], dtype=object)
+    unit_price = rng.uniform(1.5, 25.0, n).round(2)
+    charge = np.where(billing == 2, unit_price * 12, unit_price) * quantity
+
+    return pd.DataFrame({
+        'Reseller': 'MB NETWORKS GmbH',
+        'Company': company,
+        'Department': 'N/A',
+        'Product name': also_products['Productname'].to_numpy()[product_idx],
+        'Vendor': 'Microsoft',
+        'VendorReference': also_products['VendorReference'].to_numpy()[product_idx],
+        'Attributes': [f"{p} Quantity={q}" for p, q in zip(prefixes[billing], quantity)],
+        'Account': [f"{abs(q)} ({1324000 + i % 997})" for i, q in enumerate(quantity)],
+        'BillingStartDate': '06.12.2022',
+        'Priceable item': [f"Field = Quantity, {p.replace('Billing Type=', 'Billing Type = ')}"
+                           for p in prefixes[billing]],
+        'Charge': charge.round(2),
+        'Interval': interval,
+        'Contract Id': rng.choice([123456.0, 123457.0, 123458.0, 123459.0, 123460.0], n),
+        'SecondVendorReference': 'N/A',
+    }, columns=RAW_CHARGES_HEADER)
+
+
+def workbook_path(out_dir, jahr, monat):
+    """Dateiname nach Pflichtenheft-Schema (alt/neu je Jahr)"""
+    if jahr <= 2022:
+        return os.path.join(out_dir, 'Also', 'finish', f"MB_NETWORKS_GmbH_({monat:02d}.{jahr}).xlsx")
+    return os.path.join(out_dir, 'Also', f"MB_NETWORKS_GmbH_{monat:02d}-{jahr}.xlsx")
+
+
+def write_workbook(path, raw_charges):
+    """Workbook mit den drei ALSO-Sheets schreiben"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    grouped = raw_charges.groupby(['Product name', 'Attributes', 'Interval'], as_index=False).agg(
+        Quantity=('Charge', 'size'), **{'Total price': ('Charge', 'sum')})
+    grouped['Price per unit'] = (grouped['Total price'] / grouped['Quantity']).round(2)
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        pd.DataFrame().to_excel(writer, sheet_name='Pivot Charges', index=False)
+        grouped[['Product name', 'Attributes', 'Interval', 'Quantity', 'Price per unit', 'Total price']] \
+            .to_excel(writer, sheet_name='Grouped By Service', index=False)
+        raw_charges.to_excel(writer, sheet_name='Raw Charges', index=False)
+
+
+def month_range(start_year, start_month, months):
+    """Liste (Jahr, Monat) ab Startmonat"""
+    first = start_year * 12 + start_month - 1
+    return [(m // 12, m % 12 + 1) for m in range(first, first + months)]
+
+
+def generate(out_dir, customers=50, products=40, start_year=2024, start_month=1, months=12,
+             lines_per_customer=6, prepaid_share=0.3, negative_share=0.05,
+             workbook_months=None, seed=42):
+    """Fixtures schreiben; workbook_months begrenzt die erzeugten Workbooks
+
+    Liefert die Pfade {'access': <dir>, 'workbooks': [...]}.
+    """
+    rng = np.random.default_rng(seed)
+    periods = month_range(start_year, start_month, months)
+
+    customers_df = make_customers(customers, rng)
+    products_df = make_products(products, rng)
+    usage_df = make_usage(customers_df, products_df, periods, lines_per_customer, rng)
+
+    access_dir = os.path.join(out_dir, 'access')
+    os.makedirs(access_dir, exist_ok=True)
+    customers_df.to_csv(os.path.join(access_dir, 'tblKunden.csv'), index=False)
+    products_df.drop(columns='VendorReference').to_csv(os.path.join(access_dir, 'tblProduct.csv'), index=False)
+    usage_df.to_csv(os.path.join(access_dir, 'tblUsage.csv'), index=False)
+
+    workbooks = []
+    for jahr, monat in (workbook_months or periods):
+        raw_charges = make_raw_charges(customers_df, products_df, jahr, monat, lines_per_customer,
+                                       prepaid_share, negative_share, rng)
+        path = workbook_path(out_dir, jahr, monat)
+        write_workbook(path, raw_charges)
+        workbooks.append(path)
+
+    return {'access': access_dir, 'workbooks': workbooks}
+
+
+def main():
+    """Hauptfunktion"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('out_dir')
+    parser.add_argument('--customers', type=int, default=50)
+    parser.add_argument('--products', type=int, default=40)
+    parser.add_argument('--start', default='2024-01', help='Erster Monat (YYYY-MM)')
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--lines-per-customer', type=int, default=6)
+    parser.add_argument('--prepaid-share', type=float, default=0.3)
+    parser.add_argument('--negative-share', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    start_year, start_month = (int(part) for part in args.start.split('-'))
+    result = generate(args.out_dir, args.customers, args.products, start_year, start_month,
+                      args.months, args.lines_per_customer, args.prepaid_share,
+                      args.negative_share, seed=args.seed)
+
+    print(f"Access-Fixtures: {result['access']}")
+    print(f"Workbooks: {len(result['workbooks'])}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from also_attributes import (
+    MONTHLY, UNKNOWN, YEARLY_MONTHLY, YEARLY_PREPAID, classify_billing_type, parse_attributes
+)
+from also_excel import extract_quantity
+
+# (Attributes, Quantity, billing_type, commitment, prepaid)
+KNOWN_VARIANTS = [
+    ('Billing Type=Monthly (with 1-month commitment) - P1M Quantity=3', 3, MONTHLY, 'P1M', False),
+    ('Billing Type=Monthly (with 1-year commitment) - P1Y Quantity=1', 1, YEARLY_MONTHLY, 'P1Y', False),
+    ('Billing Type=Prepaid (with 1-year commitment) - P1Y Quantity=12', 12, YEARLY_PREPAID, 'P1Y', True),
+    ('Billing Type=Prepaid (with 1-year commitment) - P1Y Quantity=-3', -3, YEARLY_PREPAID, 'P1Y', True),
+    ('Billing Type=Monthly (with 1-year commitment) - P1Y Quantity= 7 ', 7, YEARLY_MONTHLY, 'P1Y', False),
+    ('Level1QuantityDropdown=5', 5, UNKNOWN, None, False),
+    ('Quantity=abc', 0, UNKNOWN, None, False),
+    ('Billing Type=Monthly', 0, UNKNOWN, None, False),
+    ('', 0, UNKNOWN, None, False),
+    (None, 0, UNKNOWN, None, False),
+]
+
+
+@pytest.mark.parametrize('attributes, quantity, billing_type, commitment, prepaid', KNOWN_VARIANTS)
+def test_parse_attributes(attributes, quantity, billing_type, commitment, prepaid):
+    parsed = parse_attributes(pd.Series([attributes], dtype=object)).iloc[0]
+    assert parsed['Quantity'] == quantity
+    assert parsed['billing_type'] == billing_type
+    assert (parsed['commitment'] if pd.notna(parsed['commitment']) else None) == commitment
+    assert parsed['prepaid'] == prepaid
+
+
+@pytest.mark.parametrize('attributes', [variant[0] for variant in KNOWN_VARIANTS])
+def test_parity_with_row_parsers(attributes):
+    parsed = parse_attributes(pd.Series([attributes], dtype=object)).iloc[0]
+    assert parsed['Quantity'] == extract_quantity(attributes)
+    assert parsed['billing_type'] == classify_billing_type(attributes)
+
+
+def test_repeated_values_keep_index():
+    attributes = pd.Series([KNOWN_VARIANTS[2][0], None, KNOWN_VARIANTS[2][0]], index=[10, 20, 30], dtype=object)
+    parsed = parse_attributes(attributes)
+    assert parsed.index.tolist() == [10, 20, 30]
+    assert parsed['Quantity'].tolist() == [12, 0, 12]
@@ -0,0 +1,113 @@
+import pandas as pd
+import pytest
+
+from also_excel import aggregate_raw_charges
+from billing_store import (ingest_also_workbooks, ingest_vendor_csv_usage, open_store, query_comparison,
+                           refresh_customer_keys)
+from customer_resolver import CustomerResolver
+from reconciliation import reconcile_customers
+
+CUSTOMERS = pd.DataFrame({
+    'IDKunden': [1, 2, 3],
+    'KundenName': ['Müller GmbH', 'Schmidt IT', 'Ohne Excel AG'],
+    'IDAlso': ['A-1', 'A-2', 'A-3'],
+})
+PRODUCTS = pd.DataFrame({
+    'IDProduct': [10, 11, 20],
+    'Productname': ['M365 Basic', 'M365 Standard', 'Fremdprodukt'],
+    'IDProductclass': [2, 2, 1],
+})
+USAGE = pd.DataFrame({
+    'IDKunden': [1, 1, 2, 3, 2],
+    'IDProduct': [10, 11, 10, 10, 20],
+    'Jahr': 2024,
+    'Monat': 11,
+    'Usage': [5.0, 2.0, 3.0, 1.0, 99.0],
+    'Detail': None,
+})
+# Company wie im Workbook: Schreibweise, IDAlso statt Name, unbekannter Kunde
+RAW = pd.DataFrame({
+    'Company': ['MUELLER GMBH', 'MUELLER GMBH', 'MUELLER GMBH', 'A-2', 'Schmidt IT', 'Fremdfirma'],
+    'Product name': ['M365 Basic', 'M365 Basic', 'M365 Standard', 'M365 Basic', 'M365 Basic', 'M365 Basic'],
+    'Quantity': [4.0, 5.0, 2.0, 1.0, 3.0, 7.0],
+    'Charge': 1.0,
+    'Interval': 'monthly',
+    'VendorReference': None,
+})
+COLUMNS = ['customer', 'excel_total', 'excel_rows', 'access_total', 'access_rows', 'diff_type']
+
+
+@pytest.fixture
+def store(tmp_path):
+    conn = open_store(str(tmp_path / 'store.db'))
+    CUSTOMERS.to_sql('customers', conn, if_exists='append', index=False)
+    PRODUCTS.to_sql('products', conn, if_exists='append', index=False)
+    USAGE.to_sql('usage', conn, if_exists='append', index=False)
+    pd.DataFrame({
+        'vendor': 'Also', 'Jahr': 2024, 'Monat': 11,
+        'customer': RAW['Company'], 'product': RAW['Product name'], 'quantity': RAW['Quantity'],
+        'source': '/daten/Also/MB_NETWORKS_GmbH_11-2024.xlsx',
+    }).to_sql('charges', conn, if_exists='append', index=False)
+    refresh_customer_keys(conn)
+    yield conn
+    conn.close()
+
+
+def access_frame():
+    also = USAGE[USAGE['IDProduct'].isin(PRODUCTS.loc[PRODUCTS['IDProductclass'] == 2, 'IDProduct'])]
+    return also.merge(CUSTOMERS, on='IDKunden')
+
+
+def normalized(frame):
+    frame = frame[COLUMNS].astype({'customer': str, 'diff_type': str})
+    return frame.sort_values('customer', ignore_index=True)
+
+
+def test_comparison_by_name_matches_compare_data(store):
+    resolver = CustomerResolver(CUSTOMERS)
+    excel = aggregate_raw_charges(RAW)
+    expected = reconcile_customers(excel.assign(Company=resolver.canonical(excel['Company'])),
+                                   access_frame(), tolerance=0.1, keep_matches=True)
+
+    actual = query_comparison(store, 2024, 11, tolerance=0.1)
+
+    pd.testing.assert_frame_equal(normalized(actual), normalized(expected), check_dtype=False)
+    assert set(actual['customer']) == {'Müller GmbH', 'Schmidt IT', 'Ohne Excel AG', 'Fremdfirma'}
+
+
+def test_comparison_by_also_id_matches_corrected_analysis(store):
+    resolver = CustomerResolver(CUSTOMERS)
+    expected = reconcile_customers(RAW.assign(Company=resolver.canonical(RAW['Company'], 'IDAlso')),
+                                   access_frame(), access_customer='IDAlso', tolerance=0.1, keep_matches=True)
+
+    actual = query_comparison(store, 2024, 11, tolerance=0.1, by_also_id=True)
+
+    pd.testing.assert_frame_equal(normalized(actual), normalized(expected), check_dtype=False)
+
+
+def test_deleted_workbook_is_purged(store, tmp_path):
+    also_dir = tmp_path / 'Also'
+    also_dir.mkdir()
+    stale = str(also_dir / 'MB_NETWORKS_GmbH_10-2024.xlsx')
+    with store:
+        store.execute("INSERT INTO charges (vendor, Jahr, Monat, customer, source) VALUES ('Also', 2024, 10, 'X', ?)", (stale,))
+        store.execute("INSERT INTO sources VALUES (?, 'alt')", (stale,))
+
+    assert ingest_also_workbooks(store, str(also_dir)) == []
+
+    assert store.execute("SELECT COUNT(*) FROM charges WHERE source = ?", (stale,)).fetchone() == (0,)
+    assert store.execute("SELECT COUNT(*) FROM sources WHERE source = ?", (stale,)).fetchone() == (0,)
+    # Quellen außerhalb des Verzeichnisses bleiben erhalten
+    assert store.execute("SELECT COUNT(*) FROM charges WHERE Monat = 11").fetchone() == (len(RAW),)
+
+
+def test_vendor_csv_usage_is_stored_once(store, tmp_path):
+    csv = tmp_path / 'data' / 'starface' / 'starface.csv'
+    csv.parent.mkdir(parents=True)
+    csv.write_text('Domain;Anzahl User;Datum\nschmidt it;3;01.11.2024\nschmidt it;4;20.11.2024\n')
+
+    assert ingest_vendor_csv_usage(store, str(tmp_path / 'data'), CUSTOMERS) == 1
+    assert ingest_vendor_csv_usage(store, str(tmp_path / 'data'), CUSTOMERS) is False
+
+    rows = store.execute("SELECT vendor, IDKunden, Jahr, Monat, Usage FROM vendor_usage").fetchall()
+    assert rows == [('starface', 2, 2024, 11, 4.0)]
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from product_catalog import MATCH_GUID, MATCH_NORMALIZED, ProductCatalog
+
+PRODUCTS = pd.DataFrame({
+    'IDProduct': [1, 2],
+    'Productname': ['Microsoft 365 Business Basic', '(NCE) Microsoft 365 Business Standard'],
+    'IDProductclass': [2, 2],
+})
+
+
+def test_learned_guid_resolves_renamed_product():
+    catalog = ProductCatalog(PRODUCTS)
+    learned = catalog.learn_references(
+        pd.Series(['Microsoft 365 Business Basic', 'Unbekanntes Produkt']),
+        pd.Series(['3B555118-DA6A-4418-894F-7DF1E2096870', 'FFFFFFFF-0000-0000-0000-000000000000']),
+    )
+    assert learned == 1
+
+    mapped = catalog.map_products(
+        pd.Series(['M365 Basic (umbenannt)']),
+        pd.Series(['3b555118-da6a-4418-894f-7df1e2096870']),
+    )
+    assert mapped['IDProduct'].tolist() == [1]
+    assert mapped['match'].tolist() == [MATCH_GUID]
+
+
+def test_guid_wins_over_name():
+    catalog = ProductCatalog(PRODUCTS, references={'guid-standard': 2})
+    mapped = catalog.map_products(pd.Series(['Microsoft 365 Business Basic']), pd.Series(['GUID-STANDARD']))
+    assert mapped['IDProduct'].tolist() == [2]
+    assert mapped['match'].tolist() == [MATCH_GUID]
+
+
+def test_unknown_guid_falls_back_to_name():
+    catalog = ProductCatalog(PRODUCTS)
+    mapped = catalog.map_products(pd.Series(['Microsoft 365 Business Standard']), pd.Series(['unbekannt']))
+    assert mapped['IDProduct'].tolist() == [2]
+    assert mapped['match'].tolist() == [MATCH_NORMALIZED]
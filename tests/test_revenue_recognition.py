@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from revenue_recognition import P1Y_PREPAID, build_schedule
+
+PREPAID = 'Billing Type=Prepaid (with 1-year commitment) - P1Y Quantity=1'
+MONTHLY = 'Billing Type=Monthly (with 1-year commitment) - P1Y Quantity=1'
+
+
+@pytest.mark.parametrize('interval, attributes, months', [
+    ('01.12.2024 - 30.11.2025', PREPAID, 12),
+    ('01.12.2024 - 01.12.2025', PREPAID, 12),
+    ('15.11.2024 - 14.11.2025', PREPAID, 12),
+    ('01.02.2024 - 31.01.2025', PREPAID, 12),
+    ('01.11.2024 - 30.11.2024', MONTHLY, 1),
+])
+def test_service_months(interval, attributes, months):
+    charges = pd.DataFrame({'Interval': [interval], 'Attributes': [attributes], 'Charge': [120.0]})
+    schedule = build_schedule(charges)
+    assert len(schedule) == months
+    assert schedule['recognized_charge'].sum() == pytest.approx(120.0)
+
+
+def test_inclusive_prepaid_year_starts_in_first_month():
+    charges = pd.DataFrame({'Interval': ['01.12.2024 - 30.11.2025'], 'Attributes': [PREPAID], 'Charge': [120.0]})
+    schedule = build_schedule(charges)
+    assert (schedule['billing_class'] == P1Y_PREPAID).all()
+    assert list(zip(schedule['Jahr'], schedule['Monat']))[0] == (2024, 12)
+    assert list(zip(schedule['Jahr'], schedule['Monat']))[-1] == (2025, 11)
+    assert schedule['recognized_charge'].tolist() == [10.0] * 12
+
+
+def test_missing_interval_uses_billed_month():
+    charges = pd.DataFrame({'Interval': [None], 'Attributes': [MONTHLY], 'Charge': [5.0],
+                            'Jahr': [2024], 'Monat': [11]})
+    schedule = build_schedule(charges)
+    assert list(zip(schedule['Jahr'], schedule['Monat'])) == [(2024, 11)]
+
+
+def test_missing_interval_without_billed_month_is_rejected():
+    charges = pd.DataFrame({'Interval': [None], 'Attributes': [MONTHLY], 'Charge': [5.0]})
+    with pytest.raises(ValueError):
+        build_schedule(charges)
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from usage_anomalies import (
+    DROP_TO_ZERO, DUPLICATE, FRACTIONAL, JUMP, NEGATIVE_PREPAID, SERIES, monthly_series,
+    rolling_baseline, scan_anomalies
+)
+
+
+def history(rows):
+    """Historie im Format von usage_history aus (product, Monat, Usage[, Detail])"""
+    frame = pd.DataFrame([
+        {'source': 'tblUsage', 'customer': 'Kunde', 'product': row[0], 'Jahr': 2024,
+         'Monat': row[1], 'Usage': float(row[2]), 'Detail': row[3] if len(row) > 3 else ''}
+        for row in rows
+    ])
+    return frame.astype({**{column: 'category' for column in SERIES + ['Detail']},
+                         'Jahr': 'int16', 'Monat': 'int8'})
+
+
+def findings_for(findings, rule):
+    found = findings[findings['rule'] == rule]
+    return sorted(zip(found['product'].astype(str), found['Monat'].astype(int)))
+
+
+def test_series_extends_to_last_month_of_source():
+    grid, keys = monthly_series(history(
+        [('A', monat, 5) for monat in range(1, 5)] + [('B', monat, 5) for monat in range(1, 7)]))
+    a = grid[grid['series'] == keys.index[keys['product'] == 'A'][0]]
+    assert (a['period'] % 12 + 1).tolist() == [1, 2, 3, 4, 5, 6]
+    assert a['Usage'].tolist() == [5, 5, 5, 5, 0, 0]
+
+
+def test_disappearing_product_is_dropped_once():
+    findings = scan_anomalies(history(
+        [('A', monat, 5) for monat in range(1, 5)] + [('B', monat, 5) for monat in range(1, 7)]))
+    assert findings_for(findings, DROP_TO_ZERO) == [('A', 5)]
+
+
+def test_gap_counts_as_drop():
+    findings = scan_anomalies(history([('A', 1, 5), ('A', 2, 5), ('A', 3, 5), ('A', 5, 5)]))
+    assert findings_for(findings, DROP_TO_ZERO) == [('A', 4)]
+
+
+def test_jump_against_rolling_median():
+    findings = scan_anomalies(history([('A', 1, 2), ('A', 2, 2), ('A', 3, 2), ('A', 4, 20)]))
+    assert findings_for(findings, JUMP) == [('A', 4)]
+
+
+def test_small_jump_below_min_jump_is_ignored():
+    findings = scan_anomalies(history([('A', 1, 1), ('A', 2, 1), ('A', 3, 1), ('A', 4, 4)]))
+    assert findings_for(findings, JUMP) == []
+
+
+def test_fractional_duplicate_and_negative_prepaid():
+    findings = scan_anomalies(history([
+        ('A', 1, 1.5),
+        ('B', 1, 2, 'Monthly'), ('B', 1, 3, 'Monthly'),
+        ('C', 1, -3, 'Prepaid P1Y'),
+    ]))
+    assert findings_for(findings, FRACTIONAL) == [('A', 1)]
+    assert findings_for(findings, DUPLICATE) == [('B', 1)]
+    assert findings_for(findings, NEGATIVE_PREPAID) == [('C', 1)]
+
+
+def test_rolling_baseline_matches_groupby_median():
+    rng = np.random.default_rng(0)
+    rows = [(f"P{i % 7}", monat, rng.integers(0, 20)) for i in range(7) for monat in range(1, 13)
+            if rng.random() > 0.2]
+    grid, _ = monthly_series(history(rows))
+    for window in (1, 2, 3, 5):
+        expected = grid.groupby('series')['Usage'].transform(
+            lambda usage: usage.shift().rolling(window, min_periods=1).median())
+        np.testing.assert_allclose(rolling_baseline(grid, window), expected)
@@ -0,0 +1,49 @@
+import os
+
+from vendor_manifest import scan_with_manifest, update_manifest
+from vendor_scanner import scan_vendors
+
+VENDORS = ['starface', 'Acronis']
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_missing_root_gives_empty_report(tmp_path):
+    report = update_manifest(str(tmp_path / 'fehlt'), str(tmp_path / 'manifest.sqlite'))
+
+    assert report == {'added': [], 'removed': [], 'changed': [], 'schema_changed': [], 'unchanged': 0}
+
+
+def test_rescan_profiles_only_changed_files(tmp_path):
+    data, manifest = tmp_path / 'data', str(tmp_path / 'manifest.sqlite')
+    write(data / 'starface' / 'starface_2024-11.csv', 'Domain;Anzahl User;Datum\nkunde.example;3;01.11.2024\n')
+    write(data / 'Acronis' / 'usage.csv', 'Customer,Edition,Device,Date\nKunde A,Cyber Protect,dev1,2024-11-05\n')
+
+    first, report = scan_with_manifest(str(data), VENDORS, manifest)
+    assert len(report['added']) == 2
+
+    changed = data / 'Acronis' / 'usage.csv'
+    write(changed, 'Kunde;Edition;Gerät;Datum\nKunde A;Cyber Protect;dev1;2024-11-05\n')
+    os.utime(changed, ns=(1, 1))
+    second, report = scan_with_manifest(str(data), VENDORS, manifest)
+
+    assert report['unchanged'] == 1
+    assert report['changed'] == report['schema_changed'] == [str(changed)]
+    assert second['Acronis'][0]['columns'] == ['Kunde', 'Edition', 'Gerät', 'Datum']
+    assert second['starface'] == first['starface']
+
+
+def test_scan_matches_scan_vendors(tmp_path):
+    data = tmp_path / 'data'
+    write(data / 'starface' / 'b_2024-10.csv', 'Domain;Anzahl User;Datum\nkunde.example;3;01.10.2024\n')
+    write(data / 'starface' / 'a_2024-11.csv', 'Domain;Anzahl User;Datum\nkunde.example;3;01.11.2024\n')
+
+    scan, _ = scan_with_manifest(str(data), VENDORS, str(tmp_path / 'manifest.sqlite'))
+    expected = scan_vendors(str(data), VENDORS)
+
+    keys = ['filename', 'relative_path', 'full_path', 'size', 'extension', 'period', 'encoding', 'columns']
+    assert {vendor: [[p[k] for k in keys] for p in profiles] for vendor, profiles in scan.items()} == \
+           {vendor: [[p[k] for k in keys] for p in profiles] for vendor, profiles in expected.items()}
@@ -0,0 +1,61 @@
+import warnings
+
+from vendor_usage import ingest_vendor_usage
+
+
+def write(path, text, encoding='utf-8'):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(text.encode(encoding) if isinstance(text, str) else text)
+
+
+def months(usage, vendor):
+    rows = usage[usage['vendor'] == vendor]
+    return sorted(zip(rows['customer'].astype(str), rows['Jahr'].astype(int), rows['Monat'].astype(int)))
+
+
+def test_date_formats_follow_vendor_layout(tmp_path):
+    write(tmp_path / 'Acronis' / 'usage.csv',
+          'Customer,Edition,Device,Date\nKunde A,Cyber Protect,dev1,11/05/2024\n')
+    write(tmp_path / 'starface' / 'starface.csv',
+          'Domain;Anzahl User;Datum\nkunde-b.example;3;11.05.2024\n', 'cp1252')
+
+    usage, files = ingest_vendor_usage(tmp_path, ('Acronis', 'starface'))
+
+    assert files['error'].isna().all()
+    assert months(usage, 'Acronis') == [('Kunde A', 2024, 11)]
+    assert months(usage, 'starface') == [('kunde-b.example', 2024, 5)]
+
+
+def test_vendor_without_rows_does_not_warn(tmp_path):
+    write(tmp_path / 'starface' / 'starface.csv', 'Domain;Anzahl User;Datum\nkunde.example;3;01.11.2024\n')
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        usage, _ = ingest_vendor_usage(tmp_path)
+
+    assert usage['vendor'].astype(str).unique().tolist() == ['starface']
+
+
+def test_file_with_late_decode_error_is_dropped_completely(tmp_path):
+    header = 'Domain;Anzahl User;Datum\n'
+    november = ''.join(f'kunde{i % 50}.example;{i % 7};15.11.2024\n' for i in range(4000))
+    body = (header + november).encode('utf-8') + b'kunde\xff.example;3;15.12.2024\n'
+    assert len(body) > 64 * 1024
+    write(tmp_path / 'starface' / 'broken_2024.csv', body)
+    write(tmp_path / 'starface' / 'ok_2024.csv', header + 'ok.example;2;15.11.2024\n')
+
+    usage, files = ingest_vendor_usage(tmp_path, ('starface',), chunksize=1000)
+
+    assert months(usage, 'starface') == [('ok.example', 2024, 11)]
+    broken = files.set_index('file').loc['broken_2024.csv']
+    assert broken['error'].startswith('UnicodeDecodeError')
+
+
+def test_rows_without_customer_or_month_are_counted(tmp_path):
+    write(tmp_path / 'starface' / 'gaps.csv',
+          'Domain;Anzahl User;Datum\na.example;3;15.12.2024\n;4;15.12.2024\nb.example;2;kein Datum\n')
+
+    usage, files = ingest_vendor_usage(tmp_path, ('starface',))
+
+    assert months(usage, 'starface') == [('a.example', 2024, 12)]
+    assert files['skipped'].tolist() == [2]
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Usage Anomalies
+Regelbasierter Anomalie-Scan über die gesamte Usage-Historie (tblUsage und
+Vendor-CSVs) statt einzelner Monatsskripte
+
+Regeln (alle vektorisiert über alle Kunden/Produkte/Monate auf einmal):
+- fractional:       Usage nicht ganzzahlig (Symptom des Billing-Interval-Bugs)
+- jump:             Monatswert weicht um mindestens JUMP_RATIO vom gleitenden
+                    Median der Vormonate ab (und um mindestens MIN_JUMP)
+- drop_to_zero:     Monat fällt auf 0 bzw. fehlt, obwohl der gleitende Median
+                    der Vormonate mindestens MIN_DROP_BASELINE beträgt
+- duplicate:        mehrere Zeilen mit gleichem Kunde/Produkt/Monat/Detail
+- negative_prepaid: Prepaid-Zeilen mit negativer Menge
+
+Monatswert ist wie in analyze_november_2024_also die MAX Usage je Kunde/
+Produkt/Monat. Jede Reihe läuft von ihrem ersten Monat bis zum letzten Monat
+ihrer Quelle; Lücken und fehlende Folgemonate (Produktzeile entfällt)
+zählen als 0. Ergebnis ist eine nach score (Abweichung in Usage-Einheiten)
+absteigend sortierte Fundliste.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from access_data import load_table, load_usage
+from customer_resolver import CustomerResolver
+from instrumentation import stage, trace_run
+from product_catalog import ProductCatalog
+
+JUMP_RATIO = 3.0
+MIN_JUMP = 5.0
+BASELINE_WINDOW = 3
+MIN_DROP_BASELINE = 1.0
+FRACTION_TOLERANCE = 1e-9
+
+FRACTIONAL = 'fractional'
+JUMP = 'jump'
+DROP_TO_ZERO = 'drop_to_zero'
+DUPLICATE = 'duplicate'
+NEGATIVE_PREPAID = 'negative_prepaid'
+
+RULES = pd.CategoricalDtype([FRACTIONAL, JUMP, DROP_TO_ZERO, DUPLICATE, NEGATIVE_PREPAID])
+
+SERIES = ['source', 'customer', 'product']
+FINDING_COLUMNS = ['rule', 'source', 'customer', 'product', 'Jahr', 'Monat',
+                   'usage', 'baseline', 'score', 'rows']
+
+
+def is_fractional(values, tolerance=FRACTION_TOLERANCE):
+    """True für nicht ganzzahlige Werte (vektorisiert)"""
+    return (values - values.round()).abs() > tolerance
+
+
+def _names(ids, names_for_ids):
+    """Namen je eindeutiger ID einmal bestimmen und über die Codes verteilen"""
+    codes, uniques = pd.factorize(ids)
+    return names_for_ids(pd.Series(uniques)).to_numpy()[codes]
+
+
+def usage_history(usage, customers_df, products_df, vendor_usage=None):
+    """tblUsage (und optional vendor_usage) als eine Historie
+
+    Spalten: source, customer, product, Jahr, Monat, Usage, Detail.
+    Kunden- und Produktnamen über CustomerResolver/ProductCatalog.
+    """
+    resolver = CustomerResolver(customers_df)
+    catalog = ProductCatalog(products_df)
+    frames = [pd.DataFrame({
+        'source': 'tblUsage',
+        'customer': _names(usage['IDKunden'], resolver.names_for_ids),
+        'product': _names(usage['IDProduct'], catalog.names_for_ids),
+        'Jahr': usage['Jahr'].to_numpy(),
+        'Monat': usage['Monat'].to_numpy(),
+        'Usage': usage['Usage'].to_numpy(),
+        'Detail': usage['Detail'].astype(object).to_numpy(),
+    })]
+
+    if vendor_usage is not None and len(vendor_usage):
+        customer = vendor_usage['IDKunden'].map(resolver.names).astype(object)
+        frames.append(pd.DataFrame({
+            'source': vendor_usage['vendor'].astype(object).to_numpy(),
+            'customer': customer.fillna(vendor_usage['customer'].astype(object)).to_numpy(),
+            'product': vendor_usage['product'].astype(object).to_numpy(),
+            'Jahr': vendor_usage['Jahr'].to_numpy(),
+            'Monat': vendor_usage['Monat'].to_numpy(),
+            'Usage': vendor_usage['Usage'].to_numpy(),
+            'Detail': None,
+        }))
+
+    history = pd.concat(frames, ignore_index=True)
+    for column in SERIES:
+        history[column] = history[column].astype('category')
+    history['Detail'] = history['Detail'].fillna('').astype('category')
+    history['Jahr'] = history['Jahr'].astype('int16')
+    history['Monat'] = history['Monat'].astype('int8')
+    return history
+
+
+def _findings(frame, rule, usage, baseline, score, rows=1):
+    """Fundzeilen einer Regel im gemeinsamen Format"""
+    def values(v):
+        return v.to_numpy() if isinstance(v, pd.Series) else v
+
+    findings = pd.DataFrame({
+        'rule': rule,
+        **{column: frame[column].to_numpy() for column in SERIES + ['Jahr', 'Monat']},
+        'usage': values(usage),
+        'baseline': values(baseline),
+        'score': values(score),
+        'rows': values(rows),
+    }, index=pd.RangeIndex(len(frame)))
+    return findings.astype({'usage': 'float64', 'baseline': 'float64', 'score': 'float64', 'rows': 'int64'})
+
+
+def monthly_series(history):
+    """MAX Usage je Reihe und Monat, Lücken bis zum letzten Monat der Quelle mit 0
+
+    Das Raster einer Reihe endet nicht bei ihrem letzten eigenen Monat,
+    sondern beim letzten Monat ihrer Quelle: entfällt eine Produktzeile,
+    folgt eine 0 (sonst bliebe drop_to_zero für fehlende Monate stumm).
+    Liefert (grid, keys): grid nach (series, period) sortiert mit series,
+    period, position (Monate seit Reihenbeginn) und Usage; keys enthält die
+    Reihenschlüssel je series. Das Raster wird über Integer-Positionen
+    gefüllt, ohne Merge und ohne Python-Schleife.
+    """
+    periods = history['Jahr'].astype('int32') * 12 + history['Monat'].astype('int32') - 1
+    monthly = history.assign(period=periods).groupby(SERIES + ['period'], observed=True)['Usage'].max()
+    monthly = monthly.reset_index()
+    if monthly.empty:
+        grid = pd.DataFrame({column: pd.Series(dtype='int64') for column in ('series', 'period', 'position')})
+        return grid.assign(Usage=pd.Series(dtype='float64')), monthly[SERIES]
+
+    series_of_row = monthly.groupby(SERIES, observed=True).ngroup().to_numpy()
+    period_of_row = monthly['period'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, series_of_row[1:] != series_of_row[:-1]])
+    ends = np.r_[starts[1:], len(monthly)] - 1
+    source_last = monthly.groupby('source', observed=True)['period'].transform('max').to_numpy()
+    first, last = period_of_row[starts], source_last[ends]
+
+    lengths = last - first + 1
+    offsets = np.cumsum(lengths) - lengths
+    series = np.repeat(np.arange(len(starts)), lengths)
+    position = np.arange(lengths.sum()) - offsets[series]
+
+    usage = np.zeros(len(series))
+    usage[offsets[series_of_row] + period_of_row - first[series_of_row]] = monthly['Usage'].to_numpy()
+    grid = pd.DataFrame({'series': series, 'period': first[series] + position,
+                         'position': position, 'Usage': usage})
+    keys = monthly.iloc[starts][SERIES].reset_index(drop=True)
+    return grid, keys
+
+
+def rolling_baseline(grid, window=BASELINE_WINDOW):
+    """Median der bis zu window Vormonate derselben Reihe
+
+    Die Vormonate liegen als Lag-Matrix (Zeilen x window) vor; Werte vor
+    dem Reihenanfang sind NaN und landen beim zeilenweisen Sortieren hinten.
+    Für kleine Fenster deutlich schneller als Rolling.median.
+    """
+    usage = grid['Usage'].to_numpy()
+    position = grid['position'].to_numpy()
+
+    lags = np.full((len(usage), window), np.nan)
+    for lag in range(1, window + 1):
+        lags[lag:, lag - 1] = usage[:len(usage) - lag]
+        lags[position < lag, lag - 1] = np.nan
+    lags.sort(axis=1)
+
+    count = np.minimum(position, window)
+    rows = np.arange(len(usage))
+    median = (lags[rows, np.maximum(count - 1, 0) // 2] + lags[rows, count // 2]) / 2
+    return pd.Series(median, index=grid.index)
+
+
+def _with_keys(rows, keys):
+    """Reihenschlüssel und Jahr/Monat an Rasterzeilen anfügen"""
+    rows = rows.join(keys, on='series')
+    return rows.assign(Jahr=(rows['period'] // 12).astype('int16'),
+                       Monat=(rows['period'] % 12 + 1).astype('int8'))
+
+
+def scan_anomalies(history, jump_ratio=JUMP_RATIO, min_jump=MIN_JUMP, window=BASELINE_WINDOW,
+                   min_drop_baseline=MIN_DROP_BASELINE, fraction_tolerance=FRACTION_TOLERANCE):
+    """Alle Regeln über die Historie; liefert die nach score sortierte Fundliste"""
+    findings = []
+
+    with stage('anomaly fractional') as s:
+        rows = history[is_fractional(history['Usage'], fraction_tolerance)]
+        fraction = (rows['Usage'] - rows['Usage'].round()).abs()
+        findings.append(_findings(rows, FRACTIONAL, rows['Usage'], rows['Usage'].round(), fraction))
+        s['rows'] = len(rows)
+
+    with stage('anomaly duplicates') as s:
+        duplicates = history.groupby(SERIES + ['Jahr', 'Monat', 'Detail'], observed=True).agg(
+            rows=('Usage', 'size'), usage=('Usage', 'sum'), first=('Usage', 'first'))
+        duplicates = duplicates[duplicates['rows'] > 1].reset_index()
+        findings.append(_findings(duplicates, DUPLICATE, duplicates['usage'], duplicates['first'],
+                                  duplicates['usage'] - duplicates['first'], duplicates['rows']))
+        s['rows'] = len(duplicates)
+
+    with stage('anomaly negative prepaid') as s:
+        details = history['Detail'].cat
+        prepaid = details.categories.str.contains('prepaid', case=False)[details.codes]
+        rows = history[prepaid & (history['Usage'] < 0).to_numpy()]
+        findings.append(_findings(rows, NEGATIVE_PREPAID, rows['Usage'], 0.0, rows['Usage'].abs()))
+        s['rows'] = len(rows)
+
+    with stage('anomaly rolling rules') as s:
+        grid, keys = monthly_series(history)
+        grid['baseline'] = baseline = rolling_baseline(grid, window)
+        usage = grid['Usage']
+        previous = usage.shift().where(grid['position'] >= 1)
+
+        both = (usage > 0) & (baseline > 0)
+        ratio = np.maximum(usage, baseline) / np.minimum(usage, baseline).where(both)
+        jumps = _with_keys(grid[both & (ratio >= jump_ratio) & ((usage - baseline).abs() >= min_jump)], keys)
+        findings.append(_findings(jumps, JUMP, jumps['Usage'], jumps['baseline'],
+                                  (jumps['Usage'] - jumps['baseline']).abs()))
+
+        drops = _with_keys(grid[(usage == 0) & (previous > 0) & (baseline >= min_drop_baseline)], keys)
+        findings.append(_findings(drops, DROP_TO_ZERO, 0.0, drops['baseline'], drops['baseline']))
+        s['rows'] = len(jumps) + len(drops)
+
+    findings = [f for f in findings if len(f)]
+    result = pd.concat(findings, ignore_index=True) if findings else pd.DataFrame(columns=FINDING_COLUMNS)
+    result['rule'] = result['rule'].astype(RULES)
+    result = result.sort_values(['score', 'rule', 'Jahr', 'Monat'], ascending=[False, True, True, True],
+                                kind='stable', ignore_index=True)
+    result.insert(0, 'rank', np.arange(1, len(result) + 1))
+    return result
+
+
+def print_findings(findings, top=25):
+    """Zusammenfassung je Regel und die Top-Funde ausgeben"""
+    print("=== USAGE ANOMALIES ===\n")
+    if findings.empty:
+        print("Keine Auffälligkeiten gefunden.")
+        return
+
+    summary = findings.groupby('rule', observed=False).agg(
+        findings=('score', 'size'), score=('score', 'sum'), customers=('customer', 'nunique'))
+    print(summary.to_string(float_format=lambda x: f"{x:.1f}"))
+
+    print(f"\nTop {min(top, len(findings))} Funde:")
+    print("-" * 80)
+    columns = ['rank', 'rule', 'source', 'customer', 'product', 'Jahr', 'Monat', 'usage', 'baseline', 'score']
+    print(findings[columns].head(top).to_string(index=False, float_format=lambda x: f"{x:.1f}"))
+
+
+def main():
+    """Hauptfunktion"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jump-ratio', type=float, default=JUMP_RATIO)
+    parser.add_argument('--min-jump', type=float, default=MIN_JUMP)
+    parser.add_argument('--window', type=int, default=BASELINE_WINDOW, help='Vormonate im gleitenden Median')
+    parser.add_argument('--min-drop-baseline', type=float, default=MIN_DROP_BASELINE)
+    parser.add_argument('--productclass', type=int, default=None, help='Nur diese IDProductclass')
+    parser.add_argument('--vendor-dir', default=None, help='Zusätzlich Vendor-CSVs aus diesem Verzeichnis')
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--output', help='Fundliste als .parquet/.feather/.csv schreiben')
+    args = parser.parse_args()
+
+    customers_df, products_df = load_table('tblKunden'), load_table('tblProduct')
+    vendor_usage = None
+    if args.vendor_dir:
+        from vendor_usage import ingest_vendor_usage
+
+        vendor_usage, _ = ingest_vendor_usage(args.vendor_dir, customers_df=customers_df)
+
+    with stage('anomaly history') as s:
+        history = usage_history(load_usage(productclass=args.productclass), customers_df, products_df,
+                                vendor_usage)
+        s['rows'] = len(history)
+
+    findings = scan_anomalies(history, args.jump_ratio, args.min_jump, args.window, args.min_drop_baseline)
+    print_findings(findings, args.top)
+
+    if args.output:
+        from reconciliation import write_diff
+
+        print(f"\nGeschrieben: {write_diff(findings, args.output)}")
+    return findings
+
+
+if __name__ == "__main__":
+    with trace_run('usage_anomalies'):
+        main()
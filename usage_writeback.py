@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Usage Write-Back
+Korrigierte ALSO Mengen aus dem Abgleich gesammelt nach tblUsage zurückschreiben
+
+Statt Korrekturen von Hand bzw. über den alten VBA-Import einzutragen, wird
+der Abgleich eines Workbooks auf (IDKunden, IDProduct) in zwei Batches
+übersetzt:
+- INSERT für Kunde/Produkt, die nur in Excel stehen (MISSING_IN_ACCESS,
+  in compare_data als CUSTOMER_MISSING_IN_ACCESS gemeldet)
+- UPDATE für Mengenabweichungen (QUANTITY_MISMATCH): die tblUsage-Zeilen
+  werden in IDUsage-Reihenfolge korrigiert, sodass ihre Summe der
+  Excel-Menge entspricht
+
+Nur in Access vorhandene Zeilen (MISSING_IN_EXCEL) werden nicht gelöscht,
+sondern nur gemeldet. Beide Batches laufen als parametrisiertes executemany
+in Blöcken von chunksize Zeilen innerhalb einer Transaktion: ein Monat wird
+ganz oder gar nicht übernommen.
+
+Ziel ist die Access-Datenbank (pyodbc, schreibend) oder für Tests eine
+lokale SQLite-Kopie (--init-sqlite legt sie aus tblUsage/tblProduct an).
+
+    python usage_writeback.py --workbook data/Also/MB_NETWORKS_GmbH_11-2024.xlsx --dry-run
+    python usage_writeback.py --workbook ... --target corrections.sqlite --init-sqlite
+"""
+
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from access_data import (
+    ACCESS_DB, ACCESS_ODBC_DRIVER, ALSO_PRODUCTCLASS, _query_usage_odbc, load_table
+)
+from also_attributes import parse_attributes
+from also_excel import aggregate_raw_charges, parse_workbook_period, read_raw_charges
+from customer_resolver import CustomerResolver
+from instrumentation import stage, trace_run
+from product_catalog import ProductCatalog
+from reconciliation import (
+    DEFAULT_TOLERANCE, MISSING_IN_ACCESS, MISSING_IN_EXCEL, QUANTITY_MISMATCH, reconcile_products
+)
+from schemas import ACCESS_SCHEMAS, apply_schema
+
+WRITEBACK_CHUNK_SIZE = 1_000
+SQLITE_SUFFIXES = ('.sqlite', '.sqlite3', '.db')
+
+INSERT_SQL = "INSERT INTO tblUsage (IDKunden, IDProduct, Jahr, Monat, Usage, Detail) VALUES (?, ?, ?, ?, ?, ?)"
+UPDATE_SQL = "UPDATE tblUsage SET Usage = ? WHERE IDUsage = ?"
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tblUsage (
+    IDUsage INTEGER PRIMARY KEY AUTOINCREMENT,
+    IDKunden INTEGER NOT NULL,
+    IDProduct INTEGER NOT NULL,
+    Jahr INTEGER NOT NULL,
+    Monat INTEGER NOT NULL,
+    Usage REAL,
+    Detail TEXT
+);
+CREATE TABLE IF NOT EXISTS tblProduct (
+    IDProduct INTEGER PRIMARY KEY,
+    Productname TEXT,
+    IDProductclass INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_usage_period ON tblUsage (Jahr, Monat, IDKunden, IDProduct);
+"""
+
+
+def is_sqlite_target(target):
+    """True, wenn das Ziel eine SQLite-Datei statt der Access-Datenbank ist"""
+    return str(target).lower().endswith(SQLITE_SUFFIXES)
+
+
+def init_sqlite_target(path, db_path=ACCESS_DB):
+    """SQLite-Stand-in mit tblUsage und tblProduct aus der Access-Datenbank anlegen"""
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SQLITE_SCHEMA)
+        with conn:
+            conn.execute("DELETE FROM tblUsage")
+            conn.execute("DELETE FROM tblProduct")
+            products = load_table('tblProduct', db_path)[['IDProduct', 'Productname', 'IDProductclass']]
+            usage = load_table('tblUsage', db_path)[
+                ['IDUsage', 'IDKunden', 'IDProduct', 'Jahr', 'Monat', 'Usage', 'Detail']]
+            products.astype(object).to_sql('tblProduct', conn, if_exists='append', index=False)
+            usage.astype(object).to_sql('tblUsage', conn, if_exists='append', index=False,
+                                        chunksize=50_000)
+    finally:
+        conn.close()
+    return path
+
+
+def connect_target(target=ACCESS_DB):
+    """Schreibende Verbindung zum Ziel (SQLite-Datei oder Access über pyodbc)"""
+    if is_sqlite_target(target):
+        if not os.path.exists(target):
+            raise FileNotFoundError(f"{target}: SQLite-Ziel fehlt (--init-sqlite verwenden)")
+        return sqlite3.connect(target)
+
+    import pyodbc
+
+    if ACCESS_ODBC_DRIVER not in pyodbc.drivers():
+        raise RuntimeError(f"ODBC-Treiber fehlt: {ACCESS_ODBC_DRIVER}")
+    db_path = os.path.abspath(target)
+    return pyodbc.connect(f"DRIVER={{{ACCESS_ODBC_DRIVER}}};DBQ={db_path};", autocommit=False)
+
+
+def read_target_usage(conn, jahr, monat, productclass=ALSO_PRODUCTCLASS):
+    """Aktuellen Stand des Monats direkt aus dem Ziel lesen"""
+    usage = _query_usage_odbc(conn, jahr, monat, productclass)
+    return apply_schema(usage, ACCESS_SCHEMAS['tblUsage'])
+
+
+def excel_usage(raw_charges, resolver, catalog, product_ids):
+    """Raw Charges auf (IDKunden, IDProduct) abbilden
+
+    MAX Quantity je Company/Product (wie aggregate_raw_charges), danach
+    Summe je ID-Paar, da Legacy- und NCE-Name auf dasselbe Produkt fallen
+    können. Liefert (usage, skipped); skipped enthält nicht auflösbare
+    Zeilen und Produkte außerhalb der ALSO Produktklasse.
+    """
+    raw_charges = raw_charges.copy()
+    raw_charges['Quantity'] = parse_attributes(raw_charges['Attributes'])['Quantity']
+    catalog.learn_references(raw_charges['Product name'], raw_charges['VendorReference'])
+    excel_agg = aggregate_raw_charges(raw_charges)
+
+    excel_agg['IDKunden'] = resolver.resolve(excel_agg['Company'])['IDKunden']
+    excel_agg['IDProduct'] = catalog.map_products(
+        excel_agg['Product name'], excel_agg['VendorReference'])['IDProduct']
+
+    reason = pd.Series(None, index=excel_agg.index, dtype=object)
+    reason[~excel_agg['IDProduct'].isin(product_ids)] = 'not_also_product'
+    reason[excel_agg['IDProduct'].isna()] = 'unknown_product'
+    reason[excel_agg['IDKunden'].isna()] = 'unknown_customer'
+    skipped = excel_agg[reason.notna()].assign(reason=reason[reason.notna()])
+
+    usage = excel_agg[reason.isna()].astype({'IDKunden': 'int32', 'IDProduct': 'int32'})
+    usage = usage.groupby(['IDKunden', 'IDProduct'], sort=False).agg(
+        Quantity=('Quantity', 'sum'),
+        Detail=('Interval', 'first'),
+    ).reset_index()
+    usage['Detail'] = usage['Detail'].astype(object)
+    return usage, skipped.reset_index(drop=True)
+
+
+def _update_rows(mismatches, access_month):
+    """UPDATE-Zeilen für Mengenabweichungen
+
+    Mehrmenge: die erste tblUsage-Zeile (kleinste IDUsage) wird erhöht.
+    Mindermenge: die Reduktion wird in IDUsage-Reihenfolge auf die Zeilen
+    verteilt, keine Zeile fällt dabei unter 0.
+    """
+    keys = ['IDKunden', 'IDProduct']
+    rows = access_month[keys + ['IDUsage', 'Usage']].sort_values('IDUsage', kind='stable')
+    rows = rows.rename(columns={'Usage': 'old_usage'}).merge(
+        mismatches[keys + ['difference', 'excel_total', 'access_total']], on=keys)
+    first = ~rows.duplicated(keys)
+
+    # Reduktion, die frühere Zeilen desselben Kunden/Produkts bereits tragen
+    available = rows['old_usage'].clip(lower=0)
+    before = available.groupby([rows[key] for key in keys]).cumsum() - available
+    reduction = np.minimum((-rows['difference'] - before).clip(lower=0), available)
+
+    increase = rows['old_usage'] + rows['difference'].where(first, 0)
+    rows['Usage'] = (rows['old_usage'] - reduction).where(rows['difference'] < 0, increase)
+    return rows[rows['Usage'] != rows['old_usage']]
+
+
+def build_corrections(excel, access_month, jahr, monat, tolerance=DEFAULT_TOLERANCE):
+    """Abgleich auf (IDKunden, IDProduct) in INSERT- und UPDATE-Zeilen übersetzen
+
+    Liefert (corrections, access_only); corrections (eine Zeile je
+    Statement) hat die Spalten action,
+    IDUsage, IDKunden, IDProduct, Jahr, Monat, Usage (neu), old_usage,
+    excel_total, access_total und Detail.
+    """
+    diff = reconcile_products(
+        excel, access_month,
+        excel_customer='IDKunden', excel_product='IDProduct',
+        access_customer='IDKunden', access_product='IDProduct',
+        excel_value='Quantity', access_value='Usage', tolerance=tolerance
+    ).rename(columns={'customer': 'IDKunden', 'product': 'IDProduct'})
+
+    details = excel[['IDKunden', 'IDProduct', 'Detail']]
+
+    inserts = diff[diff['diff_type'] == MISSING_IN_ACCESS].merge(
+        details, on=['IDKunden', 'IDProduct'], how='left')
+    inserts = inserts.assign(action='insert', IDUsage=pd.NA, old_usage=0.0,
+                             Usage=inserts['excel_total'].astype('float64'))
+
+    updates = _update_rows(diff[diff['diff_type'] == QUANTITY_MISMATCH], access_month)
+    updates = updates.assign(action='update', Detail=None)
+
+    columns = ['action', 'IDUsage', 'IDKunden', 'IDProduct', 'Jahr', 'Monat', 'Usage',
+               'old_usage', 'excel_total', 'access_total', 'Detail']
+    corrections = pd.concat([inserts, updates], ignore_index=True).assign(Jahr=jahr, Monat=monat)
+    corrections['IDUsage'] = corrections['IDUsage'].astype('Int64')
+    access_only = diff[diff['diff_type'] == MISSING_IN_EXCEL].reset_index(drop=True)
+    return corrections[columns], access_only
+
+
+def _batches(rows, chunksize):
+    """Parameterliste in Blöcke zu chunksize Zeilen teilen"""
+    for start in range(0, len(rows), chunksize):
+        yield rows[start:start + chunksize]
+
+
+def apply_corrections(conn, corrections, chunksize=WRITEBACK_CHUNK_SIZE, dry_run=False):
+    """INSERT- und UPDATE-Batches in einer Transaktion ausführen
+
+    Bei einem Fehler wird der ganze Monat zurückgerollt. dry_run führt die
+    Statements aus und rollt danach zurück (prüft SQL und Parameter, ohne
+    etwas zu ändern). Liefert {'insert': n, 'update': n}.
+    """
+    inserts = corrections[corrections['action'] == 'insert']
+    updates = corrections[corrections['action'] == 'update']
+    insert_rows = [
+        (int(k), int(p), int(j), int(m), float(u), d if pd.notna(d) else None)
+        for k, p, j, m, u, d in zip(inserts['IDKunden'], inserts['IDProduct'], inserts['Jahr'],
+                                    inserts['Monat'], inserts['Usage'], inserts['Detail'])
+    ]
+    update_rows = [(float(u), int(i)) for u, i in zip(updates['Usage'], updates['IDUsage'])]
+
+    cursor = conn.cursor()
+    try:
+        with stage('write-back insert') as s:
+            for batch in _batches(insert_rows, chunksize):
+                cursor.executemany(INSERT_SQL, batch)
+            s['rows'] = len(insert_rows)
+        with stage('write-back update') as s:
+            for batch in _batches(update_rows, chunksize):
+                cursor.executemany(UPDATE_SQL, batch)
+            s['rows'] = len(update_rows)
+    except Exception:
+        conn.rollback()
+        raise
+
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+    return {'insert': len(insert_rows), 'update': len(update_rows)}
+
+
+def writeback_workbook(path, target=ACCESS_DB, tolerance=DEFAULT_TOLERANCE,
+                       chunksize=WRITEBACK_CHUNK_SIZE, dry_run=False, db_path=ACCESS_DB):
+    """Ein Workbook abgleichen und die Korrekturen in das Ziel schreiben
+
+    Liefert (corrections, skipped, access_only, counts).
+    """
+    period = parse_workbook_period(os.path.basename(path))
+    if period is None:
+        raise ValueError(f"{path}: kein ALSO Workbook (Periode nicht erkennbar)")
+    jahr, monat = period
+
+    products_df = load_table('tblProduct', db_path)
+    product_ids = products_df.loc[products_df['IDProductclass'] == ALSO_PRODUCTCLASS, 'IDProduct']
+    resolver = CustomerResolver(load_table('tblKunden', db_path))
+    catalog = ProductCatalog(products_df)
+
+    with stage('write-back excel') as s:
+        excel, skipped = excel_usage(read_raw_charges(path), resolver, catalog, product_ids)
+        s['rows'] = len(excel)
+
+    conn = connect_target(target)
+    try:
+        access_month = read_target_usage(conn, jahr, monat)
+        with stage('write-back diff') as s:
+            corrections, access_only = build_corrections(excel, access_month, jahr, monat, tolerance)
+            s['rows'] = len(corrections)
+        counts = apply_corrections(conn, corrections, chunksize, dry_run)
+    finally:
+        conn.close()
+    return corrections, skipped, access_only, counts
+
+
+def print_writeback(path, corrections, skipped, access_only, counts, dry_run):
+    """Ergebnis des Write-Backs ausgeben"""
+    print(f"=== USAGE WRITE-BACK {'(DRY RUN) ' if dry_run else ''}===\n")
+    print(f"Workbook: {path}")
+    print(f"INSERT (nur in Excel):        {counts['insert']:6d}")
+    print(f"UPDATE (Mengenabweichung):    {counts['update']:6d}")
+    print(f"Nur in Access (unverändert):  {len(access_only):6d}")
+    print(f"Übersprungen (nicht auflösbar): {len(skipped):4d}")
+    if len(skipped):
+        print(skipped['reason'].value_counts().to_string())
+
+    if len(corrections):
+        delta = (corrections['Usage'] - corrections['old_usage']).sum()
+        print(f"\nUsage-Korrektur gesamt: {delta:+.1f}")
+        print("\nTop 10 Korrekturen:")
+        top = corrections.assign(delta=corrections['Usage'] - corrections['old_usage'])
+        top = top.sort_values('delta', key=abs, ascending=False, kind='stable').head(10)
+        print(top[['action', 'IDUsage', 'IDKunden', 'IDProduct', 'old_usage', 'Usage']].to_string(index=False))
+    if dry_run:
+        print("\nDry Run: alle Änderungen zurückgerollt.")
+
+
+def main():
+    """Hauptfunktion"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workbook', required=True, help='ALSO Workbook (MB_NETWORKS_GmbH_MM-YYYY.xlsx)')
+    parser.add_argument('--target', default=ACCESS_DB, help='Access-Datenbank oder SQLite-Datei (.sqlite/.db)')
+    parser.add_argument('--access-db', default=ACCESS_DB, help='Quelle für tblKunden/tblProduct')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--chunksize', type=int, default=WRITEBACK_CHUNK_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='Ausführen und zurückrollen')
+    parser.add_argument('--init-sqlite', action='store_true',
+                        help='SQLite-Ziel vorher aus der Access-Datenbank anlegen')
+    args = parser.parse_args()
+
+    if args.init_sqlite:
+        if not is_sqlite_target(args.target):
+            parser.error('--init-sqlite nur mit SQLite-Ziel (.sqlite/.db)')
+        init_sqlite_target(args.target, args.access_db)
+
+    corrections, skipped, access_only, counts = writeback_workbook(
+        args.workbook, args.target, args.tolerance, args.chunksize, args.dry_run, args.access_db)
+    print_writeback(args.workbook, corrections, skipped, access_only, counts, args.dry_run)
+
+
+if __name__ == "__main__":
+    with trace_run('usage_writeback'):
+        main()
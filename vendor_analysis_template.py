@@ -2,47 +2,38 @@
 """
 Vendor Analysis Template
 Systematische Analyse aller MSPGenie Vendor-Datenquellen
+
+Alle Dateien aller Vendoren werden über vendor_scanner parallel profiliert;
+pro Vendor werden die neueste Datei im Detail und Schema-Varianten über
+alle Dateien ausgegeben.
 """
 
-import pandas as pd
 import os
-from pathlib import Path
 
-def analyze_vendor_directory(vendor_path: str, vendor_name: str):
-    """Analysiere einen Vendor-Ordner systematisch"""
+from vendor_scanner import DATA_DIR, VENDORS, scan_vendors
+
+def analyze_vendor_directory(vendor_path: str, vendor_name: str, files=None):
+    """Analysiere einen Vendor-Ordner systematisch
+
+    files: bereits profilierte Dateien aus scan_vendors; ohne wird der
+    Ordner hier gescannt.
+    """
     print(f"=== {vendor_name.upper()} VENDOR ANALYSIS ===\n")
     
     if not os.path.exists(vendor_path):
         print(f"❌ Directory {vendor_path} not found")
         return {}
     
-    # 1. File inventory
-    files = []
-    for root, dirs, filenames in os.walk(vendor_path):
-        for filename in filenames:
-            if filename.endswith(('.csv', '.xlsx', '.xls')):
-                full_path = os.path.join(root, filename)
-                rel_path = os.path.relpath(full_path, vendor_path)
-                files.append({
-                    'filename': filename,
-                    'relative_path': rel_path,
-                    'full_path': full_path,
-                    'size': os.path.getsize(full_path),
-                    'extension': filename.split('.')[-1].lower()
-                })
-    
-    files.sort(key=lambda x: x['filename'])
+    # 1. File inventory (alle Dateien profiliert)
+    if files is None:
+        base_path, vendor = os.path.split(os.path.normpath(vendor_path))
+        files = scan_vendors(base_path, [vendor])[vendor]
     
     print(f"📁 File Inventory: {len(files)} files")
     print(f"   Extensions: {set(f['extension'] for f in files)}")
     
-    # Group by year/period
-    periods = set()
-    for f in files:
-        # Extract year/month from filename
-        filename = f['filename']
-        if any(year in filename for year in ['2020', '2021', '2022', '2023', '2024', '2025']):
-            periods.add(filename)
+    # Group by year/period (detected from filename)
+    periods = set(f['filename'] for f in files if f['period'])
     
     print(f"   Time periods: {len(periods)} files")
     print(f"   Total size: {sum(f['size'] for f in files) / (1024*1024):.1f} MB")
@@ -52,37 +43,27 @@ def analyze_vendor_directory(vendor_path: str, vendor_name: str):
         latest_file = max(files, key=lambda x: x['filename'])
         print(f"\n📊 Latest file analysis: {latest_file['filename']}")
         
-        try:
-            if latest_file['extension'] == 'csv':
-                # Try different encodings
-                for encoding in ['utf-8', 'iso-8859-1', 'cp1252']:
-                    try:
-                        df = pd.read_csv(latest_file['full_path'], encoding=encoding, nrows=5)
-                        print(f"   ✅ Successfully read with {encoding}")
-                        print(f"   Columns ({len(df.columns)}): {list(df.columns)}")
-                        print(f"   Rows: {len(df)} (sample)")
-                        break
-                    except:
-                        continue
-                else:
-                    print("   ❌ Could not read CSV file")
-                    
-            elif latest_file['extension'] in ['xlsx', 'xls']:
-                try:
-                    excel_file = pd.ExcelFile(latest_file['full_path'])
-                    print(f"   ✅ Excel sheets: {excel_file.sheet_names}")
-                    
-                    # Analyze first/main sheet
-                    main_sheet = excel_file.sheet_names[0]
-                    df = pd.read_excel(latest_file['full_path'], sheet_name=main_sheet, nrows=5)
-                    print(f"   Main sheet '{main_sheet}': {len(df.columns)} columns")
-                    print(f"   Columns: {list(df.columns)}")
-                    
-                except Exception as e:
-                    print(f"   ❌ Could not read Excel: {e}")
+        profile = latest_file
+        if 'error' in profile:
+            print(f"   ❌ Analysis failed: {profile['error']}")
+        elif latest_file['extension'] == 'csv':
+            print(f"   ✅ Successfully read with {profile['encoding']}")
+            print(f"   Columns ({len(profile['columns'])}): {profile['columns']}")
+            print(f"   Rows: {profile['sample_rows']} (sample)")
+        else:
+            print(f"   ✅ Excel sheets: {profile['sheets']}")
+            print(f"   Main sheet '{profile['sheets'][0]}': {len(profile['columns'])} columns")
+            print(f"   Columns: {profile['columns']}")
         
-        except Exception as e:
-            print(f"   ❌ Analysis failed: {e}")
+        # 3. Schema-Varianten über alle Dateien
+        variants = {}
+        for f in files:
+            key = ('error',) if 'error' in f else tuple(f.get('columns', ()))
+            variants.setdefault(key, []).append(f['filename'])
+        print(f"\n🧩 Schema variants: {len(variants)}")
+        for key, filenames in variants.items():
+            label = 'read errors' if key == ('error',) else f"{len(key)} columns"
+            print(f"   {label}: {len(filenames)} files (e.g. {filenames[0]})")
     
     return {
         'vendor': vendor_name,
@@ -95,18 +76,17 @@ def analyze_vendor_directory(vendor_path: str, vendor_name: str):
 
 def main():
     """Hauptanalyse aller Vendor-Verzeichnisse"""
-    base_path = "/mnt/c/Projekte/MSPGenie/data"
-    
-    vendors = [
-        "Also", "Acronis", "Altaro", "N-Sight", 
-        "Securepoint", "starface", "TrendMicro", "Wasabi"
-    ]
+    base_path = DATA_DIR
+    vendors = VENDORS
     
     vendor_analysis = {}
     
+    # Alle Dateien aller Vendoren parallel inventarisieren und profilieren
+    scan = scan_vendors(base_path, vendors)
+    
     for vendor in vendors:
         vendor_path = os.path.join(base_path, vendor)
-        analysis = analyze_vendor_directory(vendor_path, vendor)
+        analysis = analyze_vendor_directory(vendor_path, vendor, scan[vendor])
         vendor_analysis[vendor] = analysis
         print("\n" + "="*80 + "\n")
     
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Vendor File Manifest
+Inkrementelle Inventur des data/-Baums mit persistentem SQLite-Manifest
+
+Pro Datei werden Pfad, Größe, mtime, Content-Hash, Periode, Encoding und
+Spaltenschema gespeichert. Ein erneuter Lauf profiliert nur neue oder
+geänderte Dateien und meldet hinzugefügte, entfernte und geänderte Dateien
+sowie Schemaänderungen. scan_with_manifest liefert das Ergebnis im Format
+von vendor_scanner.scan_vendors (genutzt von "mspgenie inventory" und dem
+Billing Store).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from access_data import CACHE_DIR
+from vendor_scanner import DATA_DIR, VENDORS, list_vendor_files, profile_file
+
+MANIFEST_PATH = CACHE_DIR / 'vendor_manifest.sqlite'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    vendor TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    period TEXT,
+    encoding TEXT,
+    columns TEXT,
+    sheets TEXT,
+    error TEXT,
+    scanned_at REAL NOT NULL
+)
+"""
+
+
+def file_hash(path):
+    """SHA-256 des Dateiinhalts (blockweise)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def open_manifest(path=MANIFEST_PATH):
+    """Manifest-Datenbank öffnen (und bei Bedarf anlegen)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute(SCHEMA)
+    return conn
+
+
+def _list_tree(base_path, vendors=None):
+    """Alle Vendor-Dateien unterhalb von base_path ({full_path: file_info})
+
+    Ohne vendors werden alle Unterordner als Vendoren behandelt. Ein
+    fehlendes base_path ergibt (wie fehlende Vendor-Ordner im Scanner) eine
+    leere Liste.
+    """
+    if vendors is None:
+        try:
+            with os.scandir(base_path) as entries:
+                vendors = sorted(entry.name for entry in entries if entry.is_dir())
+        except (FileNotFoundError, NotADirectoryError):
+            return {}
+    current = {}
+    for vendor in vendors:
+        for info in list_vendor_files(os.path.join(base_path, vendor)):
+            current[info['full_path']] = dict(info, vendor=vendor)
+    return current
+
+
+def _row(info, content_hash, profile):
+    """Manifest-Zeile aus Datei-Info und Profil"""
+    return (
+        info['full_path'], info['vendor'], info['filename'], info['extension'],
+        info['size'], info['mtime'], content_hash, info['period'],
+        profile.get('encoding'),
+        json.dumps(profile.get('columns')) if 'columns' in profile else None,
+        json.dumps(profile.get('sheets')) if 'sheets' in profile else None,
+        profile.get('error'),
+        time.time(),
+    )
+
+
+def update_manifest(base_path=DATA_DIR, manifest_path=MANIFEST_PATH, workers=8, vendors=None):
+    """Manifest mit dem aktuellen Stand abgleichen
+
+    Liefert ein Dict mit den Pfadlisten added, removed, changed,
+    schema_changed und der Anzahl unveränderter Dateien. Mit vendors werden
+    nur diese Vendor-Ordner abgeglichen.
+    """
+    current = _list_tree(base_path, vendors)
+    report = {'added': [], 'removed': [], 'changed': [], 'schema_changed': [], 'unchanged': 0}
+
+    root = os.path.join(os.path.abspath(base_path), '')
+    conn = open_manifest(manifest_path)
+    try:
+        known = {row['path']: row for row in conn.execute("SELECT * FROM files")
+                 if os.path.abspath(row['path']).startswith(root)
+                 and (vendors is None or row['vendor'] in vendors)}
+
+        report['removed'] = sorted(set(known) - set(current))
+
+        # Größe + mtime unverändert: Datei gilt ohne Lesen als unverändert
+        candidates = []
+        for path, info in current.items():
+            row = known.get(path)
+            if row is not None and row['size'] == info['size'] and row['mtime'] == info['mtime']:
+                report['unchanged'] += 1
+            else:
+                candidates.append(info)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hashes = list(pool.map(lambda info: file_hash(info['full_path']), candidates))
+
+            # Nur angefasst (gleicher Inhalt): mtime nachziehen, nicht neu profilieren
+            to_profile = []
+            for info, content_hash in zip(candidates, hashes):
+                row = known.get(info['full_path'])
+                if row is not None and row['content_hash'] == content_hash:
+                    conn.execute("UPDATE files SET size = ?, mtime = ? WHERE path = ?",
+                                 (info['size'], info['mtime'], info['full_path']))
+                    report['unchanged'] += 1
+                else:
+                    to_profile.append((info, content_hash))
+
+            profiles = list(pool.map(lambda item: profile_file(item[0]), to_profile))
+
+        rows = []
+        for (info, content_hash), profile in zip(to_profile, profiles):
+            path = info['full_path']
+            row = known.get(path)
+            if row is None:
+                report['added'].append(path)
+            else:
+                report['changed'].append(path)
+                new_columns = json.dumps(profile.get('columns')) if 'columns' in profile else None
+                if row['columns'] != new_columns or row['encoding'] != profile.get('encoding'):
+                    report['schema_changed'].append(path)
+            rows.append(_row(info, content_hash, profile))
+
+        with conn:
+            conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in report['removed']])
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    finally:
+        conn.close()
+
+    report['added'].sort()
+    report['changed'].sort()
+    report['schema_changed'].sort()
+    return report
+
+
+def _profile(row, base_path):
+    """Manifest-Zeile als Profil wie vendor_scanner.profile_file"""
+    profile = {
+        'filename': row['filename'],
+        'relative_path': os.path.relpath(row['path'], os.path.join(base_path, row['vendor'])),
+        'full_path': row['path'],
+        'size': row['size'],
+        'mtime': row['mtime'],
+        'extension': row['extension'],
+        'period': row['period'],
+    }
+    if row['encoding'] is not None:
+        profile['encoding'] = row['encoding']
+    for key in ('columns', 'sheets'):
+        if row[key] is not None:
+            profile[key] = json.loads(row[key])
+    if row['error'] is not None:
+        profile['error'] = row['error']
+    return profile
+
+
+def scan_with_manifest(base_path=DATA_DIR, vendors=VENDORS, manifest_path=MANIFEST_PATH, workers=8):
+    """scan_vendors über das Manifest: nur neue oder geänderte Dateien profilieren
+
+    Liefert (scan, report) mit scan im Format {vendor: [file_profile, ...]}.
+    """
+    report = update_manifest(base_path, manifest_path, workers, vendors)
+    current = _list_tree(base_path, vendors)
+    conn = open_manifest(manifest_path)
+    try:
+        rows = {row['path']: row for row in conn.execute("SELECT * FROM files")}
+    finally:
+        conn.close()
+
+    scan = {vendor: [] for vendor in vendors}
+    for path in sorted(current, key=lambda path: current[path]['filename']):
+        scan[current[path]['vendor']].append(_profile(rows[path], base_path))
+    return scan, report
+
+
+def print_report(report):
+    """Änderungsbericht ausgeben"""
+    print("=== VENDOR MANIFEST UPDATE ===\n")
+    print(f"Unverändert:        {report['unchanged']}")
+    for key, label in (('added', 'Neu'), ('changed', 'Geändert'),
+                       ('schema_changed', 'Schema geändert'), ('removed', 'Entfernt')):
+        print(f"{label + ':':19s} {len(report[key])}")
+        for path in report[key]:
+            print(f"  - {path}")
+
+
+def main():
+    """Hauptfunktion"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--manifest', default=str(MANIFEST_PATH))
+    args = parser.parse_args()
+
+    report = update_manifest(args.data_dir, args.manifest)
+    print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Vendor Scanner
+Parallele Inventur und Profilierung aller Vendor-Dateien (CSV/Excel)
+
+- Verzeichnisse werden pro Vendor parallel mit os.scandir durchlaufen
+- CSV-Encoding wird aus einem kleinen Byte-Präfix bestimmt statt durch
+  wiederholtes Parsen; Header-Sample stammt aus demselben Präfix
+- Excel-Dateien werden genau einmal geöffnet (Sheet-Liste + Header-Sample)
+- Jede Datei wird profiliert, nicht nur die "neueste"
+- pandas wird erst beim Profilieren importiert; reines Auflisten bleibt
+  ohne schwere Abhängigkeiten
+"""
+
+import csv
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+DATA_DIR = "/mnt/c/Projekte/MSPGenie/data"
+
+VENDORS = [
+    "Also", "Acronis", "Altaro", "N-Sight",
+    "Securepoint", "starface", "TrendMicro", "Wasabi"
+]
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+SAMPLE_BYTES = 64 * 1024
+SAMPLE_ROWS = 5
+
+BOMS = [
+    (b'\xef\xbb\xbf', 'utf-8-sig'),
+    (b'\xff\xfe', 'utf-16'),
+    (b'\xfe\xff', 'utf-16'),
+]
+
+PERIOD_PATTERNS = [
+    re.compile(r'(?<!\d)(?P<jahr>202[0-5])[-_.](?P<monat>0[1-9]|1[0-2])(?!\d)'),
+    re.compile(r'(?<!\d)(?P<monat>0[1-9]|1[0-2])[-_.](?P<jahr>202[0-5])(?!\d)'),
+    re.compile(r'(?<!\d)(?P<jahr>202[0-5])(?P<monat>0[1-9]|1[0-2])(?!\d)'),
+    re.compile(r'(?<!\d)(?P<jahr>202[0-5])(?!\d)'),
+]
+
+
+def detect_period(filename):
+    """Periode aus dem Dateinamen: 'YYYY-MM', 'YYYY' oder None"""
+    for pattern in PERIOD_PATTERNS:
+        match = pattern.search(filename)
+        if match:
+            groups = match.groupdict()
+            if groups.get('monat'):
+                return f"{groups['jahr']}-{groups['monat']}"
+            return groups['jahr']
+    return None
+
+
+def detect_encoding(prefix):
+    """Encoding aus einem Byte-Präfix bestimmen (BOM, UTF-8, CP1252, ISO-8859-1)"""
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding
+
+    # Ein am Präfixende abgeschnittenes Multibyte-Zeichen ist kein Fehler
+    try:
+        prefix.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        if e.start >= len(prefix) - 3 and e.reason == 'unexpected end of data':
+            return 'utf-8'
+
+    try:
+        prefix.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'iso-8859-1'
+
+
+def sniff_csv(path, sample_bytes=SAMPLE_BYTES):
+    """Encoding, Trennzeichen und Text-Präfix einer CSV (eine Leseoperation)"""
+    with open(path, 'rb') as f:
+        prefix = f.read(sample_bytes)
+        truncated = bool(f.read(1))
+
+    encoding = detect_encoding(prefix)
+    text = prefix.decode(encoding, errors='ignore')
+    if truncated and '\n' in text:
+        text = text[:text.rfind('\n')]  # unvollständige letzte Zeile verwerfen
+
+    first_line = text.split('\n', 1)[0]
+    try:
+        delimiter = csv.Sniffer().sniff(first_line, delimiters=',;\t|').delimiter
+    except csv.Error:
+        delimiter = ','
+    return encoding, delimiter, text
+
+
+def _profile_csv(path):
+    """CSV-Header aus dem Byte-Präfix lesen (eine Leseoperation)"""
+    import pandas as pd
+
+    encoding, delimiter, text = sniff_csv(path)
+    df = pd.read_csv(StringIO(text), sep=delimiter, nrows=SAMPLE_ROWS)
+    return {
+        'encoding': encoding,
+        'delimiter': delimiter,
+        'columns': [str(c) for c in df.columns],
+        'sample_rows': len(df),
+    }
+
+
+def _profile_excel(path):
+    """Workbook einmal öffnen: Sheet-Liste und Header-Sample des ersten Sheets"""
+    import pandas as pd
+
+    with pd.ExcelFile(path) as excel_file:
+        sheets = excel_file.sheet_names
+        df = excel_file.parse(sheets[0], nrows=SAMPLE_ROWS) if sheets else pd.DataFrame()
+    return {
+        'sheets': sheets,
+        'columns': [str(c) for c in df.columns],
+        'sample_rows': len(df),
+    }
+
+
+def profile_file(file_info):
+    """Datei profilieren; Fehler werden im Profil vermerkt statt abzubrechen"""
+    profile = dict(file_info)
+    try:
+        if file_info['extension'] == 'csv':
+            profile.update(_profile_csv(file_info['full_path']))
+        else:
+            profile.update(_profile_excel(file_info['full_path']))
+    except Exception as e:
+        profile['error'] = f"{type(e).__name__}: {e}"
+    return profile
+
+
+def list_vendor_files(vendor_path):
+    """Alle unterstützten Dateien eines Vendors per os.scandir (rekursiv)"""
+    files = []
+    stack = [vendor_path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        stat = entry.stat()
+                        files.append({
+                            'filename': entry.name,
+                            'relative_path': os.path.relpath(entry.path, vendor_path),
+                            'full_path': entry.path,
+                            'size': stat.st_size,
+                            'mtime': stat.st_mtime,
+                            'extension': entry.name.rsplit('.', 1)[-1].lower(),
+                            'period': detect_period(entry.name),
+                        })
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    files.sort(key=lambda x: x['filename'])
+    return files
+
+
+def scan_vendors(base_path=DATA_DIR, vendors=VENDORS, workers=8, profile=True):
+    """Alle Vendor-Ordner parallel inventarisieren und (optional) profilieren
+
+    Liefert {vendor: [file_profile, ...]}; fehlende Ordner ergeben eine
+    leere Liste.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        listings = dict(zip(vendors, pool.map(
+            lambda vendor: list_vendor_files(os.path.join(base_path, vendor)), vendors
+        )))
+        if not profile:
+            return listings
+
+        all_files = [f for vendor in vendors for f in listings[vendor]]
+        profiles = iter(pool.map(profile_file, all_files))
+        return {vendor: [next(profiles) for _ in listings[vendor]] for vendor in vendors}
+
+
+def inventory_frame(scan):
+    """Scan-Ergebnis als flache Tabelle (eine Zeile pro Datei)"""
+    import pandas as pd
+
+    rows = [dict(profile, vendor=vendor) for vendor, profiles in scan.items() for profile in profiles]
+    return pd.DataFrame(rows)
+
+
+def main():
+    """Vollständige Inventur aller Vendor-Dateien ausgeben"""
+    scan = scan_vendors()
+    inventory = inventory_frame(scan)
+
+    print("=== VENDOR FILE INVENTORY ===\n")
+    if inventory.empty:
+        print(f"Keine Dateien unter {DATA_DIR} gefunden.")
+        return inventory
+
+    if 'error' not in inventory:
+        inventory['error'] = None
+
+    summary = inventory.groupby('vendor').agg(
+        files=('filename', 'size'),
+        size_mb=('size', lambda s: s.sum() / (1024 * 1024)),
+        periods=('period', 'nunique'),
+        errors=('error', 'count'),
+    )
+    print(summary.to_string(float_format=lambda x: f"{x:.1f}"))
+    print(f"\nDateien gesamt: {len(inventory)}")
+    return inventory
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Vendor Usage
+Streamende Übernahme der Vendor-CSV-Exporte (Starface Cloud, Acronis, Altaro)
+
+Jede CSV wird in Blöcken fester Größe gelesen (Encoding und Trennzeichen
+wie im vendor_scanner aus dem Byte-Präfix). Die Blöcke laufen durch eine
+Generator-Pipeline und werden sofort auf (Kunde, Produkt, Monat) verdichtet;
+im Speicher liegt je Vendor nur der laufende Zwischenstand, nie die ganze
+Datei. Jede Datei wird zunächst für sich verdichtet und erst nach
+fehlerfreiem Lesen übernommen; Monate, die über mehrere Dateien verteilt
+sind, werden dabei zusammengeführt.
+
+Menge je Kunde/Produkt/Monat:
+- Mengenspalte vorhanden: MAX (Starface Cloud: MAX monatliche User je
+  Domain, Acronis) bzw. laut Layout
+- sonst Benutzerspalte vorhanden (Detail-Export je User/Call): Anzahl
+  verschiedener Benutzer
+- sonst: Anzahl Zeilen (eine Zeile je Objekt)
+
+Altaro-Zeilen mit Invoice = "Free" werden nicht gezählt. Ergebnis ist eine
+normalisierte Usage-Tabelle (VENDOR_USAGE_SCHEMA) mit IDKunden, soweit der
+Kunde über tblKunden auflösbar ist.
+"""
+
+import argparse
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+from customer_resolver import CustomerResolver
+from instrumentation import stage, trace_run
+from schemas import VENDOR_USAGE_SCHEMA, apply_schema
+from vendor_scanner import DATA_DIR, list_vendor_files, sniff_csv
+
+CSV_CHUNK_SIZE = 100_000
+
+KEYS = ['customer', 'product', 'Jahr', 'Monat']
+
+# Spaltenkandidaten je Vendor (erster vorhandener Name gewinnt, ohne Groß-/Kleinschreibung);
+# date_formats in Prüfreihenfolge, damit US-Exporte (11/05/2024) nicht als 11. Mai gelesen werden
+VENDOR_CSV_LAYOUTS = {
+    'starface': {
+        'customer': ('Domain', 'Domainname', 'Cloud-Domain', 'Kunde', 'Customer'),
+        'customer_id': ('Domain-ID', 'DomainID', 'Domain ID', 'ID'),
+        'product': ('Produkt', 'Product', 'Typ', 'Type'),
+        'quantity': ('Anzahl User', 'Users', 'Anzahl', 'Quantity'),
+        'user': ('Benutzer', 'User', 'Login', 'Nutzer'),
+        'date': ('Datum', 'Date', 'Zeitpunkt', 'Timestamp'),
+        'date_formats': ('%d.%m.%Y', '%Y-%m-%d'),
+        'agg': 'max',
+        'default_product': 'Starface Cloud User',
+        'id_column': 'IDStarface',
+    },
+    'Acronis': {
+        'customer': ('Customer', 'Customer name', 'Tenant', 'Tenant name', 'Kunde'),
+        'product': ('Product', 'Edition', 'Service', 'Metric', 'Produkt'),
+        'quantity': ('Usage', 'Quantity', 'Value', 'Menge'),
+        'user': ('Device', 'Resource', 'Machine'),
+        'date': ('Date', 'Period', 'Start date', 'Datum'),
+        'date_formats': ('%Y-%m-%d', '%m/%d/%Y'),
+        'agg': 'max',
+        'default_product': 'Acronis',
+    },
+    'Altaro': {
+        'customer': ('Customer', 'Customer Name', 'Organization', 'Kunde'),
+        'product': ('Product', 'Produkt'),
+        'object_type': ('Object Type', 'ObjectType'),
+        'quantity': ('Quantity', 'Count', 'Anzahl'),
+        'user': ('Object', 'Object Name', 'User', 'Mailbox'),
+        'date': ('Date', 'Month', 'Datum'),
+        'invoice': ('Invoice',),
+        'date_formats': ('%Y-%m-%d', '%m/%d/%Y', '%Y-%m', '%m/%Y'),
+        'agg': 'max',
+        'default_product': 'Altaro',
+    },
+}
+
+FREE_INVOICE_VALUES = ('free',)
+
+
+def _pick(columns, candidates):
+    """Ersten vorhandenen Spaltennamen aus den Kandidaten (case-insensitive)"""
+    lookup = {column.strip().casefold(): column for column in columns}
+    for candidate in candidates or ():
+        if candidate.casefold() in lookup:
+            return lookup[candidate.casefold()]
+    return None
+
+
+def resolve_layout(columns, layout):
+    """Tatsächliche Spaltennamen einer Datei zum Vendor-Layout"""
+    fields = ('customer', 'customer_id', 'product', 'object_type', 'quantity', 'user', 'date', 'invoice')
+    resolved = {field: _pick(columns, layout.get(field)) for field in fields}
+    if resolved['customer'] is None and resolved['customer_id'] is None:
+        raise KeyError(f"keine Kundenspalte gefunden (Spalten: {list(columns)})")
+    return resolved
+
+
+def _period(file_info):
+    """(Jahr, Monat) aus dem Dateinamen, falls dort ein Monat steht"""
+    period = file_info.get('period') or ''
+    if len(period) == 7:
+        return int(period[:4]), int(period[5:])
+    return None, None
+
+
+def _numbers(values):
+    """Mengen aus Text (Dezimalkomma erlaubt)"""
+    return pd.to_numeric(values.str.strip().str.replace(',', '.', regex=False), errors='coerce')
+
+
+def _dates(values, formats):
+    """Datumswerte mit den Formaten des Layouts (erstes passendes gewinnt, sonst NaT)"""
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    dates = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+    for date_format in formats:
+        missing = dates.isna()
+        if not missing.any():
+            break
+        # exact=False: Uhrzeiten hinter dem Datum werden ignoriert
+        dates[missing] = pd.to_datetime(uniques[missing], format=date_format, exact=False, errors='coerce')
+    return pd.Series(np.append(dates.to_numpy(), np.datetime64('NaT'))[codes], index=values.index)
+
+
+def read_csv_chunks(file_info, layout, chunksize=CSV_CHUNK_SIZE):
+    """Eine Vendor-CSV blockweise lesen; liefert (mode, Block)
+
+    Jeder Block hat customer, customer_id, product, Jahr, Monat, quantity
+    und user; mode ist 'quantity', 'users' oder 'rows' (siehe oben). Es
+    werden nur die benötigten Spalten geparst.
+    """
+    path = file_info['full_path']
+    encoding, delimiter, text = sniff_csv(path)
+    header = next(csv.reader([text.split('\n', 1)[0]], delimiter=delimiter), [])
+    columns = resolve_layout([column.strip() for column in header], layout)
+    usecols = sorted({column for column in columns.values() if column is not None})
+    jahr, monat = _period(file_info)
+    mode = ('quantity' if columns['quantity'] is not None else
+            'users' if columns['user'] is not None else 'rows')
+
+    reader = pd.read_csv(path, sep=delimiter, encoding=encoding, usecols=lambda c: c.strip() in usecols,
+                         dtype=str, chunksize=chunksize, skipinitialspace=True)
+    for chunk in reader:
+        chunk.columns = [column.strip() for column in chunk.columns]
+        if columns['invoice'] is not None:
+            chunk = chunk[~chunk[columns['invoice']].str.strip().str.casefold().isin(FREE_INVOICE_VALUES)]
+
+        def column(field):
+            name = columns[field]
+            if name is None:
+                return pd.Series(None, index=chunk.index, dtype=object)
+            return chunk[name].str.strip()
+
+        product = column('product').fillna(layout.get('default_product', file_info.get('vendor')))
+        if columns['object_type'] is not None:
+            product = product + ' / ' + column('object_type').fillna('')
+
+        if columns['date'] is not None:
+            dates = _dates(column('date'), layout.get('date_formats', ('%Y-%m-%d',)))
+            years, months = dates.dt.year, dates.dt.month
+        else:
+            years = pd.Series(jahr, index=chunk.index, dtype='Int64')
+            months = pd.Series(monat, index=chunk.index, dtype='Int64')
+
+        yield mode, pd.DataFrame({
+            'customer': column('customer').fillna(column('customer_id')),
+            'customer_id': column('customer_id'),
+            'product': product,
+            'Jahr': years,
+            'Monat': months,
+            'quantity': _numbers(column('quantity')) if columns['quantity'] is not None else 1.0,
+            'user': column('user'),
+        })
+
+
+class UsageAggregator:
+    """Laufender Zwischenstand je (Kunde, Produkt, Monat), blockweise fortgeschrieben
+
+    Der Speicherbedarf wächst mit der Anzahl Gruppen (bzw. verschiedener
+    Benutzer je Gruppe), nicht mit der Anzahl Zeilen.
+    """
+
+    def __init__(self, agg='max'):
+        self.agg = agg
+        self.totals = None   # customer, customer_id, product, Jahr, Monat, Usage, rows
+        self.users = None    # eindeutige (Gruppe, Benutzer)-Paare
+        self.how = agg       # Verdichtung der Usage-Spalte ('sum' bei Benutzern/Zeilen)
+        self.skipped = 0
+
+    def _combine(self, partial, how):
+        if self.totals is not None:
+            partial = pd.concat([self.totals, partial], ignore_index=True)
+        return partial.groupby(KEYS, sort=False, dropna=False).agg(
+            customer_id=('customer_id', 'first'),
+            Usage=('Usage', how),
+            rows=('rows', 'sum'),
+        ).reset_index()
+
+    def add(self, mode, chunk):
+        """Einen normalisierten Block einarbeiten"""
+        valid = chunk['customer'].notna() & chunk['Jahr'].notna() & chunk['Monat'].notna()
+        self.skipped += int((~valid).sum())
+        chunk = chunk[valid]
+        if chunk.empty:
+            return
+
+        grouped = chunk.groupby(KEYS, sort=False)
+        partial = grouped.agg(customer_id=('customer_id', 'first'), rows=('quantity', 'size'))
+        if mode == 'quantity':
+            partial['Usage'] = grouped['quantity'].agg(self.agg)
+            self.totals = self._combine(partial.reset_index(), self.agg)
+            return
+
+        self.how = 'sum'
+
+        if mode == 'users':
+            pairs = chunk.loc[chunk['user'].notna(), KEYS + ['user']].drop_duplicates()
+            self.users = pairs if self.users is None else pd.concat(
+                [self.users, pairs], ignore_index=True).drop_duplicates()
+        partial['Usage'] = grouped['quantity'].sum()
+        self.totals = self._combine(partial.reset_index(), 'sum')
+
+    def merge(self, other):
+        """Zwischenstand einer vollständig gelesenen Datei übernehmen"""
+        self.skipped += other.skipped
+        if other.users is not None:
+            self.users = other.users if self.users is None else pd.concat(
+                [self.users, other.users], ignore_index=True).drop_duplicates()
+        if other.totals is not None:
+            self.totals = self._combine(other.totals, other.how)
+
+    def result(self):
+        """Verdichtete Usage-Tabelle"""
+        if self.totals is None:
+            return pd.DataFrame(columns=KEYS + ['customer_id', 'Usage', 'rows'])
+        totals = self.totals
+        if self.users is not None:
+            distinct = self.users.groupby(KEYS, sort=False).size().rename('distinct_users').reset_index()
+            totals = totals.merge(distinct, on=KEYS, how='left')
+            totals['Usage'] = totals.pop('distinct_users').fillna(totals['Usage'])
+        return totals
+
+
+def iter_vendor_csvs(base_path=DATA_DIR, vendors=tuple(VENDOR_CSV_LAYOUTS)):
+    """CSV-Dateien der Vendoren (file_info-Dicts wie list_vendor_files)"""
+    for vendor in vendors:
+        for file_info in list_vendor_files(os.path.join(base_path, vendor)):
+            if file_info['extension'] == 'csv':
+                yield dict(file_info, vendor=vendor)
+
+
+def _vendor_files(files, layout, chunksize, problems):
+    """Je Datei verdichteter Zwischenstand; fehlerhafte Dateien werden vermerkt
+
+    Eine Datei wird erst nach fehlerfreiem Lesen geliefert: bricht sie mitten
+    im Lesen ab (z.B. Decode-Fehler nach dem Präfix), fließen auch ihre
+    bereits gelesenen Blöcke nicht in den Vendor-Stand ein.
+    """
+    for file_info in files:
+        part = UsageAggregator(layout.get('agg', 'max'))
+        rows, error = 0, None
+        try:
+            for mode, chunk in read_csv_chunks(file_info, layout, chunksize):
+                rows += len(chunk)
+                part.add(mode, chunk)
+        except (KeyError, ValueError, pd.errors.ParserError) as e:
+            error = f"{type(e).__name__}: {e}"
+        problems.append({'vendor': file_info['vendor'], 'file': file_info['relative_path'],
+                         'rows': rows, 'skipped': part.skipped, 'error': error})
+        if error is None:
+            yield part
+
+
+def map_customer_ids(usage, customers_df, id_column=None):
+    """IDKunden über Vendor-ID (z.B. tblKunden.IDStarface) bzw. Kundennamen"""
+    resolver = CustomerResolver(customers_df)
+    ids = resolver.resolve(usage['customer'].astype(object))['IDKunden']
+
+    if id_column and id_column in customers_df:
+        vendor_ids = pd.to_numeric(customers_df[id_column], errors='coerce')
+        by_vendor_id = dict(zip(vendor_ids[vendor_ids.notna()].astype('int64'),
+                                customers_df.loc[vendor_ids.notna(), 'IDKunden']))
+        keys = pd.to_numeric(usage['customer_id'], errors='coerce').astype('Int64')
+        ids = keys.map(by_vendor_id).astype('Int64').fillna(ids)
+    return ids
+
+
+def ingest_vendor_usage(base_path=DATA_DIR, vendors=tuple(VENDOR_CSV_LAYOUTS),
+                        chunksize=CSV_CHUNK_SIZE, customers_df=None):
+    """Alle Vendor-CSVs streamend verdichten
+
+    Liefert (usage, files): usage im VENDOR_USAGE_SCHEMA, files mit
+    Zeilenanzahl, verworfenen Zeilen (ohne Kunde/Monat) bzw. Fehler je
+    Datei. Fehlerhafte Dateien tragen nichts zur Usage bei.
+    """
+    frames, problems = [], []
+    for vendor in vendors:
+        layout = VENDOR_CSV_LAYOUTS[vendor]
+        with stage(f"vendor csv {vendor}") as s:
+            aggregator = UsageAggregator(layout.get('agg', 'max'))
+            files = iter_vendor_csvs(base_path, [vendor])
+            for part in _vendor_files(files, layout, chunksize, problems):
+                aggregator.merge(part)
+            usage = aggregator.result()
+            s['rows'] = len(usage)
+
+        if customers_df is not None and len(usage):
+            usage['IDKunden'] = map_customer_ids(usage, customers_df, layout.get('id_column'))
+        frames.append(usage.assign(vendor=vendor))
+
+    # Vendoren ohne Zeilen auslassen (leere Frames im concat sind deprecated)
+    columns = list(VENDOR_USAGE_SCHEMA)
+    frames = [frame.reindex(columns=columns) for frame in frames if len(frame)]
+    usage = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    usage = apply_schema(usage, VENDOR_USAGE_SCHEMA).sort_values(
+        ['vendor', 'Jahr', 'Monat', 'customer'], kind='stable', ignore_index=True)
+    return usage, pd.DataFrame(problems, columns=['vendor', 'file', 'rows', 'skipped', 'error'])
+
+
+def print_vendor_usage(usage, files):
+    """Zusammenfassung je Vendor ausgeben"""
+    print("=== VENDOR USAGE (CSV) ===\n")
+    if files.empty:
+        print("Keine Vendor-CSVs gefunden.")
+        return
+
+    per_file = files.groupby('vendor').agg(files=('file', 'size'), rows=('rows', 'sum'),
+                                           skipped=('skipped', 'sum'), errors=('error', 'count'))
+    per_usage = usage.groupby('vendor', observed=True).agg(
+        customers=('customer', 'nunique'),
+        resolved=('IDKunden', 'count'),
+        entries=('Monat', 'size'),
+        usage=('Usage', 'sum'),
+    )
+    print(per_file.join(per_usage, how='left').fillna(0).to_string(float_format=lambda x: f"{x:.0f}"))
+
+    failed = files[files['error'].notna()]
+    if len(failed):
+        print(f"\nFehlerhafte Dateien: {len(failed)}")
+        for vendor, file, error in zip(failed['vendor'], failed['file'], failed['error']):
+            print(f"  - {vendor}/{file}: {error}")
+
+
+def main():
+    """Hauptfunktion"""
+    from access_data import load_table
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--vendor', action='append', choices=list(VENDOR_CSV_LAYOUTS),
+                        help='Nur diesen Vendor (mehrfach möglich)')
+    parser.add_argument('--chunksize', type=int, default=CSV_CHUNK_SIZE)
+    parser.add_argument('--no-resolve', action='store_true', help='Kunden nicht über tblKunden auflösen')
+    parser.add_argument('--output', help='Usage-Tabelle als .parquet/.feather/.csv schreiben')
+    args = parser.parse_args()
+
+    customers_df = None if args.no_resolve else load_table('tblKunden')
+    usage, files = ingest_vendor_usage(args.data_dir, args.vendor or tuple(VENDOR_CSV_LAYOUTS),
+                                       args.chunksize, customers_df)
+    print_vendor_usage(usage, files)
+
+    if args.output:
+        from reconciliation import write_diff
+
+        print(f"\nGeschrieben: {write_diff(usage, args.output)}")
+    return usage
+
+
+if __name__ == "__main__":
+    with trace_run('vendor_usage'):
+        main()